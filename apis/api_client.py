@@ -1,19 +1,309 @@
+import json
 import os
 import requests
 import logging
-from typing import Dict, List, Optional, Any
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Any
+from urllib.parse import urlsplit
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# GET responses kept for If-None-Match revalidation
+ETAG_CACHE_SIZE = 512
+# Remaining budget sent with each call; the API caps its queries to it.
+# Same value as constants.REQUEST_BUDGET_HEADER on the server side
+REQUEST_BUDGET_HEADER = 'X-Request-Budget-Ms'
+
+
+# Consecutive failures that open the circuit, and seconds it stays open before a probe
+API_BREAKER_FAILURES = int(os.getenv('API_BREAKER_FAILURES', '5'))
+API_BREAKER_RESET_SECONDS = float(os.getenv('API_BREAKER_RESET_SECONDS', '30'))
+# Extra attempts for GETs after a transient failure. Calls block the bot's
+# event loop, so the full-jitter backoff between them stays short
+API_GET_RETRIES = int(os.getenv('API_GET_RETRIES', '2'))
+RETRY_BACKOFF_BASE = 0.05
+RETRY_BACKOFF_MAX = 0.5
+# Gateway errors worth another try; other statuses are the API's real answer
+RETRYABLE_STATUSES = (502, 503, 504)
+# http (default) talks to LINKUP_API_URL; inprocess runs the API's routes in
+# this process, for when the bot and the API share a container
+API_TRANSPORT = os.getenv('LINKUP_API_TRANSPORT', 'http')
+
+
+class APIUnavailable(Exception):
+    """The API cannot answer this interaction; handlers tell the user rather than guess"""
+
+
+class DeadlineExceeded(APIUnavailable):
+    """The interaction's time budget ran out before the API answered"""
+
+
+class ServiceBusy(APIUnavailable):
+    """The circuit is open: the API keeps failing, so calls are refused until it recovers"""
+
+
+class CircuitBreaker:
+    """Stops calling the API after repeated failures.
+
+    Closed: calls go through and consecutive failures are counted. Open:
+    calls are refused at once for reset_timeout seconds. Half-open: a single
+    probe call is let through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = API_BREAKER_FAILURES,
+                 reset_timeout: float = API_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+        self.probes = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go out now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                logger.info("API circuit half-open, probing")
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                self.probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("API circuit closed, the API is answering again")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.opened += 1
+                logger.warning(f"API circuit open after {self.failures} consecutive failures, "
+                               f"refusing calls for {self.reset_timeout:.0f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'probes': self.probes,
+            }
+
+
+class Deadline:
+    """A point in time by which every API call of one interaction must finish"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+# Set per bot update; each handler task sees only its own deadline
+_deadline: ContextVar[Optional[Deadline]] = ContextVar('linkup_api_deadline', default=None)
+
+
+def _with_fields(params: Dict, fields: Optional[List[str]]) -> Dict:
+    # ?fields= projection: the API returns only these user columns
+    if fields:
+        params['fields'] = ','.join(fields)
+    return params
+
+
+def _preview(response) -> str:
+    # Decode only what gets logged, not the whole body
+    return response.content[:200].decode('utf-8', 'replace')
+
+
+def _loads(content: bytes) -> Any:
+    """Decode a JSON body, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _decode(response) -> Any:
+    return _loads(response.content)
+
+
+class InProcessResponse:
+    """The parts of a requests.Response the client reads"""
+
+    def __init__(self, status_code: int, headers, content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self) -> Any:
+        return _loads(self.content)
+
+
+class InProcessTransport:
+    """Serves requests from the API's Flask app in this process.
+
+    Requests go through the same routes, caches and connection pool as the
+    HTTP server, so responses are identical, minus the socket round trip and
+    HTTP parsing. The app is imported on first use, so bots on the HTTP
+    transport never load it.
+    """
+
+    def __init__(self, app=None):
+        self._app = app
+        self._lock = threading.Lock()
+
+    def _flask_app(self):
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    # linkup_api imports its siblings by bare name
+                    apis_dir = os.path.dirname(os.path.abspath(__file__))
+                    if apis_dir not in sys.path:
+                        sys.path.insert(0, apis_dir)
+                    # The webapp is still served by the HTTP API, another
+                    # process with its own user cache
+                    os.environ.setdefault('API_PROCESSES', '2')
+                    from linkup_api import app
+                    self._app = app
+        return self._app
+
+    def warm_up(self) -> None:
+        """Import the app now rather than on the first request"""
+        self._flask_app()
+
+    def request(self, method: str, url: str, json: Dict = None, params: Dict = None,
+                headers: Dict = None, timeout: float = None) -> InProcessResponse:
+        # No socket to time out; the budget header still caps the API's queries
+        client = self._flask_app().test_client(use_cookies=False)
+        response = client.open(urlsplit(url).path, method=method, json=json,
+                               query_string=params, headers=headers)
+        return InProcessResponse(response.status_code, response.headers, response.get_data())
+
+
 class LinkUpAPIClient:
     """Client for interacting with LinkUp API"""
     
-    def __init__(self, base_url: str = None):
+    def __init__(self, base_url: str = None, transport: Optional[InProcessTransport] = None):
         self.base_url = base_url or os.getenv('LINKUP_API_URL', 'http://localhost:8000')
+        # None sends requests over HTTP
+        if transport is None and API_TRANSPORT == 'inprocess':
+            transport = InProcessTransport()
+        self.transport = transport
+        # Per-call ceiling; an active deadline() only shortens it
         self.timeout = 30
+        self.retries = API_GET_RETRIES
+        self.breaker = CircuitBreaker()
+        self.retried = 0
+        # (endpoint, params) -> (etag, body) for conditional GETs
+        self._etag_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._etag_lock = threading.Lock()
+        
+    def _cached_etag(self, key: tuple) -> Optional[tuple]:
+        with self._etag_lock:
+            entry = self._etag_cache.get(key)
+            if entry is not None:
+                self._etag_cache.move_to_end(key)
+            return entry
+    
+    def _remember_etag(self, key: tuple, response) -> None:
+        etag = response.headers.get('ETag')
+        with self._etag_lock:
+            if not etag:
+                self._etag_cache.pop(key, None)
+                return
+            self._etag_cache[key] = (etag, response.content)
+            self._etag_cache.move_to_end(key)
+            while len(self._etag_cache) > ETAG_CACHE_SIZE:
+                self._etag_cache.popitem(last=False)
         
+    def warm_up(self) -> None:
+        """Load whatever the first request would otherwise wait for (a no-op over HTTP)"""
+        if self.transport is not None:
+            self.transport.warm_up()
+
+    @contextmanager
+    def deadline(self, seconds: float) -> Iterator[Deadline]:
+        """Share one time budget across the calls made inside the block.
+
+        Each call waits at most for what is left of it, and once it is spent
+        calls raise DeadlineExceeded instead of returning None, so a chain of
+        calls fails fast as a whole. A nested deadline never extends the outer one.
+        """
+        outer = _deadline.get()
+        deadline = Deadline(seconds)
+        if outer is not None and outer.expires_at < deadline.expires_at:
+            deadline = outer
+        token = _deadline.set(deadline)
+        try:
+            yield deadline
+        finally:
+            _deadline.reset(token)
+
+    def stats(self) -> Dict[str, Any]:
+        """Circuit breaker state and retry count, for monitoring"""
+        return {'circuit': self.breaker.stats(), 'retried': self.retried}
+
+    def _send(self, **kwargs):
+        if self.transport is not None:
+            return self.transport.request(**kwargs)
+        return requests.request(**kwargs)
+
+    def _budget(self, method: str, endpoint: str, deadline: Optional[Deadline], headers: Dict) -> float:
+        # Timeout for the next attempt, and the budget header the API caps its queries to
+        if deadline is None:
+            return self.timeout
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            logger.warning(f"Skipping API call, deadline exceeded: {method} {endpoint}")
+            raise DeadlineExceeded(endpoint)
+        headers[REQUEST_BUDGET_HEADER] = str(int(remaining * 1000))
+        return min(self.timeout, remaining)
+
     def _make_request(self, method: str, endpoint: str, data: Dict = None, params: Dict = None) -> Optional[Dict]:
-        """Make HTTP request to API"""
+        """Make HTTP request to API.
+
+        Raises ServiceBusy while the circuit is open and DeadlineExceeded once
+        the interaction's budget is spent; otherwise failures return None.
+        Only GETs are retried, as repeating a write could apply it twice.
+        """
+        deadline = _deadline.get()
         url = f"{self.base_url}{endpoint}"
         logger.info(f"API Request: {method} {url}")
         if data:
@@ -21,41 +311,101 @@ class LinkUpAPIClient:
         if params:
             logger.info(f"Request params: {params}")
         
+        # Revalidate GETs we already hold a body for instead of downloading it again
+        cache_key = (endpoint, tuple(sorted(params.items())) if params else ()) if method == 'GET' else None
+        cached = self._cached_etag(cache_key) if cache_key else None
+        
+        # Without an interaction deadline, retries still share one call's timeout
+        budget = deadline or Deadline(self.timeout)
+        if deadline is not None and deadline.remaining() <= 0:
+            logger.warning(f"Skipping API call, deadline exceeded: {method} {endpoint}")
+            raise DeadlineExceeded(endpoint)
+        # One outcome per call, whatever the retries: N failed calls open a breaker
+        # set to N, and a half-open probe is one call
+        if not self.breaker.allow():
+            logger.warning(f"API circuit open, not calling {method} {endpoint}")
+            raise ServiceBusy(endpoint)
+        succeeded = False
         try:
-            response = requests.request(
-                method=method,
-                url=url,
-                json=data,
-                params=params,
-                timeout=self.timeout
-            )
-            
-            logger.info(f"API Response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                logger.info(f"API Response success: {response.text[:200]}...")
-                return response.json()
-            elif response.status_code == 201:
-                logger.info(f"API Response created: {response.text[:200]}...")
-                return response.json()
-            elif response.status_code == 404:
-                logger.warning(f"Resource not found: {endpoint}")
-                return None
-            elif response.status_code == 409:
-                logger.warning(f"Conflict: {response.json().get('error', 'Unknown conflict')}")
-                return {"error": "already_exists"}
-            else:
-                logger.error(f"API request failed: {response.status_code} - {response.text}")
-                return None
+            attempts = 1 + (self.retries if method == 'GET' else 0)
+            for attempt in range(attempts):
+                if attempt:
+                    # Full jitter keeps retries from many handlers from arriving together
+                    delay = random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+                    if budget.remaining() <= delay:
+                        break
+                    self.retried += 1
+                    logger.info(f"Retrying {method} {endpoint} in {delay:.2f}s")
+                    time.sleep(delay)
                 
-        except requests.exceptions.ConnectionError as e:
-            logger.warning(f"API server not available: {e}")
-            return None
-        except requests.exceptions.Timeout as e:
-            logger.error(f"API request timeout: {e}")
+                headers = {'If-None-Match': cached[0]} if cached else {}
+                timeout = self._budget(method, endpoint, deadline, headers)
+                if attempt:
+                    timeout = min(timeout, budget.remaining())
+                
+                try:
+                    response = self._send(
+                        method=method,
+                        url=url,
+                        json=data,
+                        params=params,
+                        headers=headers,
+                        timeout=timeout
+                    )
+                except requests.exceptions.ConnectionError as e:
+                    logger.warning(f"API server not available: {e}")
+                    continue
+                except requests.exceptions.Timeout as e:
+                    # The API already had the whole wait; another one would only double it
+                    logger.error(f"API request timeout: {e}")
+                    break
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"API request error: {e}")
+                    break
+                
+                logger.info(f"API Response status: {response.status_code}")
+                if response.status_code >= 500:
+                    logger.error(f"API request failed: {response.status_code} - {response.text}")
+                    if response.status_code in RETRYABLE_STATUSES:
+                        continue
+                    break
+                self.breaker.record_success()
+                succeeded = True
+                return self._handle_response(response, endpoint, cache_key, cached)
+        finally:
+            # Also covers exceptions from outside requests, so a probe never stays out
+            if not succeeded:
+                self.breaker.record_failure()
+        
+        # A failure that used up the budget (our timeout, or a query the API
+        # cut short) ends the interaction rather than looking like "no data"
+        if deadline is not None and deadline.remaining() <= 0:
+            raise DeadlineExceeded(endpoint)
+        return None
+    
+    def _handle_response(self, response, endpoint: str, cache_key: Optional[tuple], cached: Optional[tuple]) -> Optional[Dict]:
+        if response.status_code == 304 and cached:
+            logger.info(f"API Response not modified: {endpoint}")
+            return _loads(cached[1])
+        elif response.status_code == 200:
+            logger.info(f"API Response success: {_preview(response)}...")
+            if cache_key:
+                self._remember_etag(cache_key, response)
+            return _decode(response)
+        elif response.status_code == 201:
+            logger.info(f"API Response created: {_preview(response)}...")
+            return _decode(response)
+        elif response.status_code == 404:
+            logger.warning(f"Resource not found: {endpoint}")
+            if cache_key:
+                with self._etag_lock:
+                    self._etag_cache.pop(cache_key, None)
             return None
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API request error: {e}")
+        elif response.status_code == 409:
+            logger.warning(f"Conflict: {response.json().get('error', 'Unknown conflict')}")
+            return {"error": "already_exists"}
+        else:
+            logger.error(f"API request failed: {response.status_code} - {response.text}")
             return None
     
     def create_user(self, tg_id: int, username: str = None, display_name: str = None, 
@@ -99,13 +449,13 @@ class LinkUpAPIClient:
         """Delete a user"""
         return self._make_request('DELETE', f'/delete-user/{user_id}')
     
-    def get_user_details(self, user_id: int) -> Optional[Dict]:
-        """Get user details by user_id"""
-        return self._make_request('GET', '/get-user-details', params={'user_id': user_id})
+    def get_user_details(self, user_id: int, fields: List[str] = None) -> Optional[Dict]:
+        """Get user details by user_id, optionally only the given columns"""
+        return self._make_request('GET', '/get-user-details', params=_with_fields({'user_id': user_id}, fields))
     
-    def get_user_by_tg_id(self, tg_id: int) -> Optional[Dict]:
-        """Get user details by telegram ID"""
-        return self._make_request('GET', '/get-user-by-tg-id', params={'tg_id': tg_id})
+    def get_user_by_tg_id(self, tg_id: int, fields: List[str] = None) -> Optional[Dict]:
+        """Get user details by telegram ID, optionally only the given columns"""
+        return self._make_request('GET', '/get-user-by-tg-id', params=_with_fields({'tg_id': tg_id}, fields))
     
     def create_group(self, group_link: str, user1_id: int, user2_id: int,
                     event_name: str = None, meeting_location: str = None,
@@ -130,17 +480,17 @@ class LinkUpAPIClient:
         
         return response
     
-    def get_group_details(self, group_id: int) -> Optional[Dict]:
-        """Get group details with participants"""
-        return self._make_request('GET', f'/group-details/{group_id}')
+    def get_group_details(self, group_id: int, fields: List[str] = None) -> Optional[Dict]:
+        """Get group details with participants, optionally only the given participant columns"""
+        return self._make_request('GET', f'/group-details/{group_id}', params=_with_fields({}, fields) or None)
     
     def check_participants(self, group_id: int) -> Optional[Dict]:
         """Get participants for a group"""
         return self._make_request('GET', '/check-participants', params={'group_id': group_id})
 
-    def get_user_groups(self, user_id: int) -> Optional[Dict]:
-        """Get all groups for a user (their connections)"""
-        return self._make_request('GET', '/get-user-groups', params={'user_id': user_id})
+    def get_user_groups(self, user_id: int, fields: List[str] = None) -> Optional[Dict]:
+        """Get all groups for a user (their connections), optionally only the given other_user columns"""
+        return self._make_request('GET', '/get-user-groups', params=_with_fields({'user_id': user_id}, fields))
         
     def update_group(self, group_id: int, group_link: str = None, 
                     event_name: str = None, meeting_location: str = None, 
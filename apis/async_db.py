@@ -0,0 +1,93 @@
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+import aiomysql
+
+from constants import SET_MAX_EXECUTION_TIME_QUERY
+from db import connection_config, keeps_statement_timeout, statement_timeout_ms, statement_stats
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[aiomysql.Pool] = None
+
+
+async def init_pool(size: int = None) -> aiomysql.Pool:
+    """Create the async connection pool for the running event loop"""
+    global _pool
+    size = size or int(os.getenv('MYSQL_POOL_SIZE', '5'))
+    config = connection_config()
+    _pool = await aiomysql.create_pool(
+        host=config['host'],
+        port=int(config['port'] or 3306),
+        user=config['user'],
+        password=config['password'],
+        db=config['database'],
+        # Connections are opened on demand, so the server starts while MySQL is still coming up
+        minsize=0,
+        maxsize=size,
+        # Pool.release closes a connection still inside a transaction, and
+        # reads would otherwise leave one open on every connection
+        autocommit=True,
+        pool_recycle=3600,
+    )
+    logger.info(f"Async MySQL pool initialized with up to {size} connections")
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+def get_pool() -> aiomysql.Pool:
+    if _pool is None:
+        raise RuntimeError("Async MySQL pool is not initialized")
+    return _pool
+
+
+@asynccontextmanager
+async def connection() -> AsyncIterator[aiomysql.Connection]:
+    """Borrow a pooled connection with the request's statement budget applied"""
+    async with get_pool().acquire() as conn:
+        await _apply_statement_timeout(conn)
+        yield conn
+
+
+async def _apply_statement_timeout(conn) -> None:
+    # Same per-session bookkeeping as db._apply_statement_timeout
+    ms = statement_timeout_ms()
+    session = (conn.thread_id(), ms)
+    thread_id, current_ms = getattr(conn, '_linkup_max_execution_time', (conn.thread_id(), 0))
+    if thread_id == conn.thread_id() and keeps_statement_timeout(current_ms, ms):
+        return
+    async with conn.cursor() as cursor:
+        await cursor.execute(SET_MAX_EXECUTION_TIME_QUERY.format(ms=ms))
+    conn._linkup_max_execution_time = session
+    if ms:
+        statement_stats['budgeted_connections'] += 1
+
+
+async def fetch_one(conn, sql: str, params: Sequence = (), dictionary: bool = False):
+    """Run a query and return its first row"""
+    rows = await fetch_all(conn, sql, params, dictionary)
+    return rows[0] if rows else None
+
+
+async def fetch_all(conn, sql: str, params: Sequence = (), dictionary: bool = False) -> List:
+    """Run a query and return every row"""
+    cursor_class = aiomysql.DictCursor if dictionary else aiomysql.Cursor
+    async with conn.cursor(cursor_class) as cursor:
+        await cursor.execute(sql, tuple(params))
+        return list(await cursor.fetchall())
+
+
+async def run_statement(conn, sql: str, params: Sequence = ()) -> Dict[str, int]:
+    """Run an INSERT/UPDATE/DELETE and return its lastrowid and rowcount"""
+    async with conn.cursor() as cursor:
+        await cursor.execute(sql, tuple(params))
+        return {'lastrowid': cursor.lastrowid, 'rowcount': cursor.rowcount}
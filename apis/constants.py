@@ -1,25 +1,69 @@
-CHECK_USER_EXISTS_QUERY = """
-SELECT user_id 
-FROM users 
-{where_condition}
+CHECK_USER_EXISTS_BY_ID_QUERY = """
+SELECT user_id, tg_id
+FROM users
+WHERE user_id = %s
+"""
+
+CHECK_USER_EXISTS_BY_TG_ID_QUERY = """
+SELECT user_id, tg_id
+FROM users
+WHERE tg_id = %s
+"""
+
+GET_USER_BY_ID_QUERY = """
+SELECT *
+FROM users
+WHERE user_id = %s
+"""
+
+GET_USER_BY_TG_ID_QUERY = """
+SELECT *
+FROM users
+WHERE tg_id = %s
+"""
+
+# Create the user on first webapp open; an existing row is left untouched
+UPSERT_USER_QUERY = """
+INSERT INTO users
+(tg_id, username, display_name, profile_image_url)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE tg_id = tg_id
+"""
+
+# Columns of the users table that ?fields= may select, in table order. Selected
+# columns are always emitted in this order so each field set has one stable text
+USER_COLUMNS = ['user_id', 'tg_id', 'username', 'display_name', 'project_name', 'role', 'description',
+                'profile_image_url', 'created_at', 'updated_at']
+
+GET_USER_COLUMNS_BY_ID_QUERY = """
+SELECT {columns}
+FROM users
+WHERE user_id = %s
 """
 
-GET_USERS_DETAILS_QUERY = """
-SELECT * 
-FROM users 
-{where_condition}
+GET_GROUP_PARTICIPANT_USER_COLUMNS_QUERY = """
+SELECT {columns}
+FROM users u
+WHERE EXISTS (
+    SELECT 1 FROM group_participants gp
+    WHERE gp.group_id = %s AND u.user_id IN (gp.user1_id, gp.user2_id)
+)
 """
 
 INSERT_USER_QUERY = """
-INSERT INTO users 
+INSERT INTO users
 (tg_id, username, display_name, project_name, role, description, profile_image_url)
 VALUES (%s, %s, %s, %s, %s, %s, %s)
 """
 
+# Columns that /update-user and /api/update-profile may change, in the order
+# they appear in UPDATE_USER_QUERY so each field combination has one stable text
+UPDATABLE_USER_FIELDS = ['username', 'display_name', 'project_name', 'role', 'description', 'profile_image_url']
+
 UPDATE_USER_QUERY = """
-UPDATE users 
+UPDATE users
 SET {set_fields},
-updated_at = CURRENT_TIMESTAMP 
+updated_at = CURRENT_TIMESTAMP
 WHERE user_id = %s
 """
 
@@ -29,14 +73,14 @@ WHERE user_id = %s
 """
 
 CREATE_GROUP_QUERY = """
-INSERT INTO `groups` 
+INSERT INTO `groups`
 (group_link, event_name, meeting_location, meeting_time)
 VALUES (%s, %s, %s, %s)
 """
 
 GET_PARTICIPANT_QUERY = """
 SELECT user1_id, user2_id, created_at, updated_at
-FROM group_participants 
+FROM group_participants
 WHERE group_id = %s
 """
 
@@ -46,8 +90,8 @@ VALUES (%s, %s, %s)
 """
 
 GET_GROUP_DETAILS_QUERY = """
-SELECT * 
-FROM `groups` 
+SELECT *
+FROM `groups`
 WHERE group_id = %s
 """
 
@@ -56,4 +100,75 @@ SELECT g.*, gp.user1_id, gp.user2_id
 FROM `groups` g
 JOIN group_participants gp ON g.group_id = gp.group_id
 WHERE gp.user1_id = %s OR gp.user2_id = %s
-"""
\ No newline at end of file
+"""
+
+# Compact row layout of /api/user-connections, one array per connection
+CONNECTION_COLUMNS = ['user_id', 'tg_id', 'username', 'display_name', 'role', 'project_name', 'description',
+                      'profile_image_url', 'group_id', 'group_link', 'event_name', 'connected_at']
+
+# A user's connections, newest first, one keyset page at a time. Each branch of
+# the UNION walks one of the (user1_id, group_id) / (user2_id, group_id) indexes
+# from the user's tg_id, so no OR across columns defeats the index.
+GET_USER_CONNECTIONS_PAGE_QUERY = """
+SELECT u.user_id, u.tg_id, u.username, u.display_name, u.role, u.project_name, u.description,
+       u.profile_image_url, g.group_id, g.group_link, g.event_name, g.created_at,
+       u.updated_at, g.updated_at
+FROM (
+    SELECT gp.group_id, gp.user2_id AS other_id
+    FROM users me
+    JOIN group_participants gp ON gp.user1_id = me.user_id
+    WHERE me.tg_id = %s AND gp.group_id < %s
+    UNION ALL
+    SELECT gp.group_id, gp.user1_id AS other_id
+    FROM users me
+    JOIN group_participants gp ON gp.user2_id = me.user_id
+    WHERE me.tg_id = %s AND gp.group_id < %s
+) c
+JOIN `groups` g ON g.group_id = c.group_id
+JOIN users u ON u.user_id = c.other_id
+ORDER BY c.group_id DESC
+LIMIT %s
+"""
+
+# Groups recorded after a given id, with both participants' tg_ids, for the
+# connection event poller
+GET_NEW_CONNECTIONS_QUERY = """
+SELECT gp.group_id, u1.tg_id, u2.tg_id
+FROM group_participants gp
+JOIN users u1 ON u1.user_id = gp.user1_id
+JOIN users u2 ON u2.user_id = gp.user2_id
+WHERE gp.group_id > %s
+ORDER BY gp.group_id
+LIMIT %s
+"""
+
+GET_LATEST_GROUP_ID_QUERY = "SELECT COALESCE(MAX(group_id), 0) FROM group_participants"
+
+# Caps SELECTs on a session to the caller's remaining budget (0 = no limit).
+# Run as plain text, not prepared: it changes with every budget
+SET_MAX_EXECUTION_TIME_QUERY = "SET SESSION max_execution_time = {ms}"
+
+# Milliseconds the caller can still wait, sent by api_client
+REQUEST_BUDGET_HEADER = 'X-Request-Budget-Ms'
+
+# Statement registry: every fixed statement the API executes. Each text is
+# prepared once per pooled connection and reused across requests. Projected
+# ({columns}) and partial-update ({set_fields}) templates yield one stable
+# text per field set and are cached the same way.
+STATEMENTS = {
+    'check_user_exists_by_id': CHECK_USER_EXISTS_BY_ID_QUERY,
+    'check_user_exists_by_tg_id': CHECK_USER_EXISTS_BY_TG_ID_QUERY,
+    'get_user_by_id': GET_USER_BY_ID_QUERY,
+    'get_user_by_tg_id': GET_USER_BY_TG_ID_QUERY,
+    'insert_user': INSERT_USER_QUERY,
+    'upsert_user': UPSERT_USER_QUERY,
+    'delete_user': DELETE_USER_QUERY,
+    'create_group': CREATE_GROUP_QUERY,
+    'get_participants': GET_PARTICIPANT_QUERY,
+    'insert_group_participants': INSERT_GROUP_PARTICIPANTS_QUERY,
+    'get_group_details': GET_GROUP_DETAILS_QUERY,
+    'get_user_groups': GET_USER_GROUPS_QUERY,
+    'get_user_connections_page': GET_USER_CONNECTIONS_PAGE_QUERY,
+    'get_new_connections': GET_NEW_CONNECTIONS_QUERY,
+    'get_latest_group_id': GET_LATEST_GROUP_ID_QUERY,
+}
@@ -0,0 +1,346 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool
+
+from constants import UPDATE_USER_QUERY, UPDATABLE_USER_FIELDS, USER_COLUMNS, CONNECTION_COLUMNS, \
+    SET_MAX_EXECUTION_TIME_QUERY
+
+logger = logging.getLogger(__name__)
+
+# Prepared statements kept open per connection before the least recently used is closed
+MAX_STATEMENTS_PER_CONNECTION = 64
+
+_pool: Optional[MySQLConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_size: Optional[int] = None
+_pool_lock = threading.Lock()
+_init_lock = threading.Lock()
+
+statement_stats = {'prepared': 0, 'reused': 0, 'evicted': 0, 'direct_connections': 0, 'budgeted_connections': 0}
+
+# Longest budget honoured from a request header, in seconds
+MAX_REQUEST_BUDGET = 60
+# Budget of requests that send no header. gunicorn's gthread workers cannot
+# kill a hung request thread, so this is what bounds a request's queries.
+DEFAULT_REQUEST_BUDGET = float(os.getenv('API_REQUEST_TIMEOUT', '30'))
+# A session's limit is kept while it lies between this fraction of the
+# remaining budget and the budget itself, so back-to-back requests on the
+# default budget do not each pay for a SET
+STATEMENT_TIMEOUT_REUSE = 0.9
+# monotonic() time by which the current request's queries must finish
+_statement_deadline: ContextVar[Optional[float]] = ContextVar('statement_deadline', default=None)
+
+
+def _use_prepared_statements() -> bool:
+    return os.getenv('MYSQL_PREPARED_STATEMENTS', '1') != '0'
+
+
+def connection_config() -> Dict[str, Any]:
+    # Connections go back to the pool without a reset, so each statement
+    # commits on its own; otherwise a connection that only read would keep
+    # its REPEATABLE READ snapshot and serve stale rows to later requests
+    return {
+        'host': os.getenv('MYSQL_HOST'),
+        'port': os.getenv('MYSQL_PORT', '3306'),
+        'user': os.getenv('MYSQL_USER'),
+        'password': os.getenv('MYSQL_PASSWORD'),
+        'database': os.getenv('MYSQL_DATABASE'),
+        'autocommit': True,
+    }
+
+
+def init_pool(size: int = None) -> MySQLConnectionPool:
+    """Create this process's connection pool.
+
+    Sessions are not reset when connections go back to the pool, so the
+    statements prepared on them survive between requests.
+    """
+    global _pool, _pool_pid, _pool_size
+    size = size or _pool_size or int(os.getenv('MYSQL_POOL_SIZE', '5'))
+    with _pool_lock:
+        # Remember the size even if connecting fails, so the lazy retry uses it
+        _pool_size = size
+        _pool = MySQLConnectionPool(
+            pool_name=f"linkup_{os.getpid()}",
+            pool_size=size,
+            pool_reset_session=False,
+            **connection_config()
+        )
+        _pool_pid = os.getpid()
+        logger.info(f"MySQL pool initialized with {size} connections (pid {_pool_pid})")
+    return _pool
+
+
+def close_pool() -> None:
+    """Close this process's idle pooled connections"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool._remove_connections()
+        _pool = None
+
+
+def get_db_connection():
+    """Borrow a connection from the pool, or open a direct one if it is exhausted"""
+    if _pool is None or _pool_pid != os.getpid():
+        with _init_lock:
+            # Threads of one worker may race here; only the first creates the pool
+            if _pool is None or _pool_pid != os.getpid():
+                init_pool()
+    try:
+        conn = _pool.get_connection()
+    except PoolError:
+        statement_stats['direct_connections'] += 1
+        logger.warning("MySQL pool exhausted, opening a direct connection")
+        conn = mysql.connector.connect(**connection_config())
+    _apply_statement_timeout(conn)
+    return conn
+
+
+def parse_request_budget(value: Optional[str]) -> Optional[float]:
+    """Seconds from an X-Request-Budget-Ms header; None when absent or invalid"""
+    if not value or not value.isdigit():
+        return None
+    return min(int(value) / 1000, MAX_REQUEST_BUDGET)
+
+
+def request_budget(header: Optional[str]) -> float:
+    """Seconds the current request's queries may take: the header's budget, else the default"""
+    budget = parse_request_budget(header)
+    return budget if budget is not None else DEFAULT_REQUEST_BUDGET
+
+
+def set_statement_budget(seconds: Optional[float]) -> None:
+    """Limit queries on connections borrowed from now on to this many seconds in total"""
+    _statement_deadline.set(time.monotonic() + seconds if seconds is not None else None)
+
+
+def statement_timeout_ms() -> int:
+    """max_execution_time for the current request's queries; 0 means unlimited"""
+    deadline = _statement_deadline.get()
+    return 0 if deadline is None else max(int((deadline - time.monotonic()) * 1000), 1)
+
+
+def keeps_statement_timeout(current_ms: int, ms: int) -> bool:
+    """Whether a session limited to current_ms already suits a query budgeted ms"""
+    if current_ms == 0 or ms == 0:
+        return current_ms == ms
+    return ms * STATEMENT_TIMEOUT_REUSE <= current_ms <= ms
+
+
+def _apply_statement_timeout(conn) -> None:
+    # max_execution_time is per session and survives in the pool, so it is
+    # set on a borrow whose budget the session's limit does not fit
+    ms = statement_timeout_ms()
+    cnx = getattr(conn, '_cnx', None) or conn
+    session = (cnx.connection_id, ms)
+    connection_id, current_ms = getattr(cnx, '_linkup_max_execution_time', (cnx.connection_id, 0))
+    if connection_id == cnx.connection_id and keeps_statement_timeout(current_ms, ms):
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SET_MAX_EXECUTION_TIME_QUERY.format(ms=ms))
+    finally:
+        cursor.close()
+    cnx._linkup_max_execution_time = session
+    if ms:
+        statement_stats['budgeted_connections'] += 1
+
+
+class _StatementCache:
+    """Prepared cursors owned by one server session"""
+
+    def __init__(self, connection_id: int):
+        self.connection_id = connection_id
+        self.cursors: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+def _statement_cache(conn) -> _StatementCache:
+    # Pooled connections are thin wrappers; cache on the underlying connection
+    cnx = getattr(conn, '_cnx', None) or conn
+    cache = getattr(cnx, '_linkup_statements', None)
+    connection_id = cnx.connection_id
+    if cache is None or cache.connection_id != connection_id:
+        # New or reconnected session: statements from the old one are gone
+        cache = _StatementCache(connection_id)
+        cnx._linkup_statements = cache
+    return cache
+
+
+def _cursor_for(conn, sql: str, dictionary: bool):
+    if not _use_prepared_statements():
+        return conn.cursor(dictionary=dictionary), sql
+
+    cache = _statement_cache(conn)
+    key = (sql, dictionary)
+    entry = cache.cursors.get(key)
+    if entry is not None:
+        cache.cursors.move_to_end(key)
+        statement_stats['reused'] += 1
+        return entry
+
+    # The prepared cursor only skips re-preparing when it is handed the
+    # identical string object, so keep the first one seen for this text
+    entry = (conn.cursor(prepared=True, dictionary=dictionary), sql)
+    cache.cursors[key] = entry
+    statement_stats['prepared'] += 1
+    while len(cache.cursors) > MAX_STATEMENTS_PER_CONNECTION:
+        _, (old_cursor, _) = cache.cursors.popitem(last=False)
+        statement_stats['evicted'] += 1
+        try:
+            old_cursor.close()
+        except Error:
+            pass
+    return entry
+
+
+def _execute(conn, sql: str, params: Sequence, dictionary: bool):
+    cursor, statement = _cursor_for(conn, sql, dictionary)
+    try:
+        cursor.execute(statement, tuple(params))
+    except Error:
+        if _use_prepared_statements():
+            _statement_cache(conn).cursors.pop((sql, dictionary), None)
+        raise
+    return cursor
+
+
+def _release(cursor) -> None:
+    # Prepared cursors stay open for reuse; plain ones are closed right away
+    if not _use_prepared_statements():
+        cursor.close()
+
+
+def fetch_one(conn, sql: str, params: Sequence = (), dictionary: bool = False):
+    """Run a query and return its first row"""
+    rows = fetch_all(conn, sql, params, dictionary)
+    return rows[0] if rows else None
+
+
+def fetch_all(conn, sql: str, params: Sequence = (), dictionary: bool = False) -> List:
+    """Run a query and return every row"""
+    cursor = _execute(conn, sql, params, dictionary)
+    try:
+        return cursor.fetchall()
+    finally:
+        _release(cursor)
+
+
+def run_statement(conn, sql: str, params: Sequence = ()) -> Dict[str, int]:
+    """Run an INSERT/UPDATE/DELETE and return its lastrowid and rowcount"""
+    cursor = _execute(conn, sql, params, dictionary=False)
+    try:
+        return {'lastrowid': cursor.lastrowid, 'rowcount': cursor.rowcount}
+    finally:
+        _release(cursor)
+
+
+def build_user_update(data, allowed_fields):
+    """Return the UPDATE text and values for the fields present in data.
+
+    Fields are emitted in UPDATABLE_USER_FIELDS order so a given set of fields
+    always produces the same statement text.
+    """
+    fields = []
+    values = []
+    for key in UPDATABLE_USER_FIELDS:
+        if key in allowed_fields and key in data:
+            fields.append(f"{key} = %s")
+            values.append(data[key])
+    if not fields:
+        return None, None
+    return UPDATE_USER_QUERY.format(set_fields=', '.join(fields)), values
+
+
+def parse_user_fields(raw: Optional[str]) -> Optional[List[str]]:
+    """Parse a ?fields= value into user columns in USER_COLUMNS order.
+
+    Returns None when no projection was requested. Raises ValueError naming
+    the first unknown field.
+    """
+    if not raw:
+        return None
+    requested = {field.strip() for field in raw.split(',') if field.strip()}
+    unknown = sorted(requested - set(USER_COLUMNS))
+    if unknown:
+        raise ValueError(f"Unknown field: {unknown[0]}")
+    return [column for column in USER_COLUMNS if column in requested] or None
+
+
+def user_columns_sql(fields: Optional[List[str]], alias: str = None) -> str:
+    """Column list for a projected users SELECT"""
+    prefix = f"{alias}." if alias else ''
+    return ', '.join(f"{prefix}{column}" for column in (fields or USER_COLUMNS))
+
+
+# Page sizes for keyset-paginated lists
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Cursor meaning "from the newest row"
+FIRST_PAGE = 2 ** 31 - 1
+
+
+def parse_page_args(args) -> tuple:
+    """Read limit and before (a keyset cursor) from query args.
+
+    Raises ValueError for values that are not positive integers.
+    """
+    limit = args.get('limit', str(DEFAULT_PAGE_SIZE))
+    before = args.get('before', str(FIRST_PAGE))
+    if not limit.isdigit() or not before.isdigit() or int(limit) == 0:
+        raise ValueError('limit and before must be positive integers')
+    return min(int(limit), MAX_PAGE_SIZE), int(before)
+
+
+_CONNECTION_WIDTH = len(CONNECTION_COLUMNS)
+_CONNECTION_GROUP_ID = CONNECTION_COLUMNS.index('group_id')
+
+
+def connections_page(rows: List, limit: int) -> Dict[str, Any]:
+    """Shape rows of GET_USER_CONNECTIONS_PAGE_QUERY as compact arrays.
+
+    rows holds up to limit + 1 rows; the extra one only signals another page.
+    The trailing updated_at columns are only used for the ETag.
+    """
+    page = rows[:limit]
+    return {
+        'columns': CONNECTION_COLUMNS,
+        'rows': [list(row[:_CONNECTION_WIDTH]) for row in page],
+        'next_before': page[-1][_CONNECTION_GROUP_ID] if len(rows) > limit else None,
+    }
+
+
+def connections_since(rows: List, after: int) -> Dict[str, Any]:
+    """Rows of GET_USER_CONNECTIONS_PAGE_QUERY newer than group id after, compact like a page"""
+    return {
+        'columns': CONNECTION_COLUMNS,
+        'rows': [list(row[:_CONNECTION_WIDTH]) for row in rows if row[_CONNECTION_GROUP_ID] > after],
+    }
+
+
+def connection_versions(rows: List, limit: int) -> List[tuple]:
+    """(group_id, user updated_at, group updated_at) of each row on the page"""
+    return [(row[_CONNECTION_GROUP_ID],) + tuple(row[_CONNECTION_WIDTH:]) for row in rows[:limit]]
+
+
+def versioned_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    """Requested fields plus the columns a row's ETag is derived from"""
+    if not fields:
+        return None
+    return [column for column in USER_COLUMNS if column in fields or column in ('user_id', 'updated_at')]
+
+
+def project_row(row: Optional[Dict], fields: Optional[List[str]]) -> Optional[Dict]:
+    """Keep only the requested fields of a user row"""
+    if row is None or not fields:
+        return row
+    return {field: row[field] for field in fields if field in row}
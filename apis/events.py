@@ -0,0 +1,211 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How often each API process checks for connections recorded by other processes
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', '2'))
+# Comment lines keep idle streams open through proxies
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv('EVENTS_HEARTBEAT_SECONDS', '25'))
+# Each stream holds a request thread on the threaded (Flask/gunicorn) server;
+# beyond this many per process clients get their backlog and poll instead
+EVENTS_MAX_SYNC_STREAMS = int(os.getenv('EVENTS_MAX_SYNC_STREAMS', '2'))
+# Client reconnect delay sent in the stream, in milliseconds
+EVENTS_RETRY_MS = 5000
+# Reconnect delay for clients answered without a stream
+EVENTS_POLL_RETRY_MS = int(os.getenv('EVENTS_POLL_RETRY_MS', '15000'))
+# Public base URL of an async server (start.sh EVENTS_PORT) that serves the
+# streams instead of the threaded API; empty keeps them on the API itself
+EVENTS_URL = os.getenv('EVENTS_URL', '').rstrip('/')
+# Re-read this many ids below the cursor: group ids are allocated before their
+# participants commit, so a lower id can become visible after a higher one
+EVENTS_LOOKBACK = 100
+EVENTS_POLL_LIMIT = 500
+RECENT_GROUPS = 10000
+# How long one polling client keeps this process's poller running, in retry periods
+EVENTS_WATCH_PERIODS = 3
+
+# load_since(after_group_id, limit) -> [(group_id, tg_id, tg_id), ...]
+SinceLoader = Callable[[int, int], List[Tuple[int, int, int]]]
+
+
+class ConnectionEventHub:
+    """Per-process fan-out of new-connection notices to webapp streams.
+
+    Subscribers register a callback for one tg_id, so a publish only touches
+    the two users involved no matter how many streams are open. Groups
+    created in this process are published directly by /create-group; a single
+    background poller per process picks up groups recorded by other workers,
+    and only queries while someone is subscribed or watching.
+
+    The hub also remembers each user's newest group, so clients that poll
+    instead of streaming can be told "nothing new" without a query.
+    """
+
+    def __init__(self, poll_interval: float = EVENTS_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._subscribers: Dict[int, Dict[int, Callable[[int], None]]] = {}
+        self._tokens = itertools.count(1)
+        self._recent: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_since: Optional[SinceLoader] = None
+        self._load_latest: Optional[Callable[[], int]] = None
+        self._poller_pid: Optional[int] = None
+        self._cursor: Optional[int] = None
+        # tg_id -> newest group id published here; complete above _known_from
+        self._latest: "OrderedDict[int, int]" = OrderedDict()
+        self._known_from: Optional[int] = None
+        self._watch_until = 0.0
+        self.published = 0
+        self.delivered = 0
+        self.polls = 0
+        self.answered_from_memory = 0
+
+    def subscribe(self, tg_id: int, notify: Callable[[int], None]) -> Tuple[int, int]:
+        """Call notify(group_id) for each new connection of tg_id; returns an unsubscribe token"""
+        token = next(self._tokens)
+        with self._lock:
+            self._subscribers.setdefault(int(tg_id), {})[token] = notify
+        self._ensure_poller()
+        return int(tg_id), token
+
+    def unsubscribe(self, subscription: Tuple[int, int]) -> None:
+        tg_id, token = subscription
+        with self._lock:
+            subscribers = self._subscribers.get(tg_id)
+            if subscribers is not None:
+                subscribers.pop(token, None)
+                if not subscribers:
+                    del self._subscribers[tg_id]
+
+    def publish(self, group_id: int, tg_ids: Iterable[int]) -> None:
+        """Notify both participants of a new group, once per group per process"""
+        tg_ids = [int(tg_id) for tg_id in tg_ids]
+        with self._lock:
+            if group_id in self._recent:
+                return
+            self._recent[group_id] = None
+            while len(self._recent) > RECENT_GROUPS:
+                self._recent.popitem(last=False)
+            self.published += 1
+            for tg_id in tg_ids:
+                self._remember_latest(tg_id, group_id)
+            callbacks = [notify for tg_id in tg_ids for notify in self._subscribers.get(tg_id, {}).values()]
+            self.delivered += len(callbacks)
+        for notify in callbacks:
+            try:
+                notify(group_id)
+            except Exception as e:
+                logger.warning(f"Dropping connection event for a closed stream: {e}")
+
+    def _remember_latest(self, tg_id: int, group_id: int) -> None:
+        if group_id > self._latest.get(tg_id, 0):
+            self._latest[tg_id] = group_id
+        self._latest.move_to_end(tg_id)
+        while len(self._latest) > RECENT_GROUPS:
+            _, forgotten = self._latest.popitem(last=False)
+            # Below the forgotten id this user's answer is no longer known
+            if self._known_from is not None:
+                self._known_from = max(self._known_from, forgotten)
+
+    def watch(self, seconds: float) -> None:
+        """Keep the poller, and so has_news(), current for a polling client"""
+        with self._lock:
+            self._watch_until = max(self._watch_until, time.monotonic() + seconds)
+        self._ensure_poller()
+
+    def position(self) -> Optional[int]:
+        """Newest group id this process has seen, while that is being kept current"""
+        with self._lock:
+            return self._cursor if self._known_from is not None else None
+
+    def has_news(self, tg_id: int, after: int) -> Optional[bool]:
+        """Whether tg_id has a group newer than after; None when only the database can tell"""
+        with self._lock:
+            if self._known_from is None or after < self._known_from:
+                return None
+            news = self._latest.get(int(tg_id), 0) > after
+            if not news:
+                self.answered_from_memory += 1
+            return news
+
+    def set_loaders(self, load_since: SinceLoader, load_latest: Callable[[], int]) -> None:
+        """Source for groups recorded by other processes; enables the poller"""
+        self._load_since = load_since
+        self._load_latest = load_latest
+
+    def _ensure_poller(self) -> None:
+        # Threads do not survive a fork, so each gunicorn worker starts its own
+        if self._load_since is None or self._poller_pid == os.getpid():
+            return
+        with self._lock:
+            if self._poller_pid == os.getpid():
+                return
+            self._poller_pid = os.getpid()
+            self._cursor = None
+            self._known_from = None
+        threading.Thread(target=self._poll_forever, name='connection-events', daemon=True).start()
+
+    def _poll_forever(self) -> None:
+        while True:
+            with self._lock:
+                idle = not self._subscribers and time.monotonic() >= self._watch_until
+                if idle:
+                    # Groups recorded while idle are missed, so answers need the database again
+                    self._known_from = None
+            if not idle:
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    logger.warning(f"Connection event poll failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def poll_once(self) -> None:
+        """Publish groups recorded since the last poll"""
+        self.polls += 1
+        if self._cursor is None:
+            # Start from now: streams replay older connections from Last-Event-ID
+            self._cursor = self._load_latest()
+            return
+        rows = self._load_since(max(self._cursor - EVENTS_LOOKBACK, 0), EVENTS_POLL_LIMIT)
+        for group_id, tg_id1, tg_id2 in rows:
+            self.publish(group_id, (tg_id1, tg_id2))
+            self._cursor = max(self._cursor, group_id)
+        with self._lock:
+            if self._known_from is None:
+                # Every group from here on is seen by the following polls
+                self._known_from = self._cursor
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'tg_ids': len(self._subscribers),
+                'streams': sum(len(subscribers) for subscribers in self._subscribers.values()),
+                'published': self.published,
+                'delivered': self.delivered,
+                'polls': self.polls,
+                'answered_from_memory': self.answered_from_memory,
+            }
+
+
+def sse_message(data: str, event: Optional[str] = None, event_id: Optional[Any] = None) -> str:
+    """One text/event-stream message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """Group id the client last saw, from Last-Event-ID or ?after="""
+    if value and value.isdigit():
+        return int(value)
+    return None
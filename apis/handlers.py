@@ -0,0 +1,349 @@
+"""
+Request handling shared by the Flask (linkup_api.py) and Quart (linkup_api_async.py) apps.
+
+Handlers validate the request, run its queries and shape the reply without
+doing any I/O themselves. Each is a generator that yields a Query or a
+CachedUser and is sent back the result; the app drives it on its own kind of
+connection (mysql-connector or aiomysql) and turns the returned Reply into a
+response. Routes therefore behave the same on both servers.
+"""
+from typing import Any, NamedTuple, Optional, Sequence
+
+from constants import CHECK_USER_EXISTS_BY_ID_QUERY, CHECK_USER_EXISTS_BY_TG_ID_QUERY, INSERT_USER_QUERY, \
+    UPDATABLE_USER_FIELDS, DELETE_USER_QUERY, CREATE_GROUP_QUERY, INSERT_GROUP_PARTICIPANTS_QUERY, \
+    GET_GROUP_DETAILS_QUERY, GET_PARTICIPANT_QUERY, GET_GROUP_PARTICIPANT_USER_COLUMNS_QUERY, GET_USER_BY_ID_QUERY, \
+    GET_USER_COLUMNS_BY_ID_QUERY, GET_USER_GROUPS_QUERY, GET_USER_CONNECTIONS_PAGE_QUERY, UPSERT_USER_QUERY, \
+    GET_NEW_CONNECTIONS_QUERY, GET_LATEST_GROUP_ID_QUERY, CONNECTION_COLUMNS
+from db import build_user_update, parse_user_fields, user_columns_sql, project_row, versioned_fields, \
+    parse_page_args, connections_page, connection_versions, connections_since, FIRST_PAGE
+from events import sse_message, parse_last_event_id, EVENTS_URL
+from http_cache import make_etag, row_versions
+from qr_cache import parse_qr_args, NAMED_THEMES
+
+CONNECTION_GROUP_ID = CONNECTION_COLUMNS.index('group_id')
+# Fields the webapp may change through /api/update-profile
+PROFILE_FIELDS = ['display_name', 'role', 'project_name', 'description']
+
+
+class Query(NamedTuple):
+    """A statement for the app to run on the request's connection"""
+    method: str  # 'one', 'all' or 'run', like fetch_one/fetch_all/run_statement
+    sql: str
+    params: Sequence = ()
+    dictionary: bool = False
+
+
+class CachedUser(NamedTuple):
+    """A user row read through the app's user cache"""
+    by: str  # 'tg_id' or 'user_id'
+    value: int
+
+
+class Reply(NamedTuple):
+    """A JSON response; one with an etag is answered with 304 when the client has it"""
+    payload: Any
+    status: int = 200
+    etag: Optional[str] = None
+
+
+def fetch_one(sql, params=(), dictionary=False) -> Query:
+    return Query('one', sql, params, dictionary)
+
+
+def fetch_all(sql, params=(), dictionary=False) -> Query:
+    return Query('all', sql, params, dictionary)
+
+
+def run_statement(sql, params=()) -> Query:
+    return Query('run', sql, params)
+
+
+def error(message: str, status: int) -> Reply:
+    return Reply({'error': message}, status)
+
+
+def _missing_field(data, required_fields) -> Optional[Reply]:
+    for field in required_fields:
+        if field not in data:
+            return error(f'Missing required field: {field}', 400)
+    return None
+
+
+def _id_arg(args, name, signed=False):
+    """The integer query arg name, or an error Reply"""
+    value = args.get(name)
+    if not value:
+        return error(f'Missing {name} parameter', 400)
+    if not (value.lstrip('-') if signed else value).isdigit():
+        return error(f'Invalid {name} parameter', 400)
+    return int(value)
+
+
+def create_user(data, user_cache):
+    missing = _missing_field(data, ['tg_id'])
+    if missing:
+        return missing
+    # Check if tg_id already exists
+    if (yield fetch_one(CHECK_USER_EXISTS_BY_TG_ID_QUERY, (data['tg_id'],))):
+        return error('User with this tg_id already exists', 409)
+    result = yield run_statement(INSERT_USER_QUERY, (
+        data['tg_id'],
+        data.get('username'),
+        data.get('display_name'),
+        data.get('project_name'),
+        data.get('role'),
+        data.get('description'),
+        data.get('profile_image_url')
+    ))
+    user_id = result['lastrowid']
+    user_cache.invalidate(user_id=user_id, tg_id=data['tg_id'])
+    return Reply({'message': 'User created', 'user_id': user_id}, 201)
+
+
+def update_user(user_id, data, user_cache):
+    if not data:
+        return error('No data provided', 400)
+    # Check if user exists
+    existing = yield fetch_one(CHECK_USER_EXISTS_BY_ID_QUERY, (user_id,))
+    if not existing:
+        return error('User not found', 404)
+    query, values = build_user_update(data, UPDATABLE_USER_FIELDS)
+    if not query:
+        return error('No updatable fields provided', 400)
+    values.append(user_id)
+    yield run_statement(query, values)
+    user_cache.invalidate(user_id=user_id, tg_id=existing[1])
+    return Reply({'message': 'User updated'})
+
+
+def delete_user(user_id, user_cache):
+    # Check if user exists
+    existing = yield fetch_one(CHECK_USER_EXISTS_BY_ID_QUERY, (user_id,))
+    if not existing:
+        return error('User not found', 404)
+    yield run_statement(DELETE_USER_QUERY, (user_id,))
+    user_cache.invalidate(user_id=user_id, tg_id=existing[1])
+    return Reply({'message': 'User deleted'})
+
+
+def get_user(args, by):
+    """/get-user-details (by user_id) and /get-user-by-tg-id (by tg_id)"""
+    value = _id_arg(args, by, signed=by == 'tg_id')
+    if isinstance(value, Reply):
+        return value
+    try:
+        fields = parse_user_fields(args.get('fields'))
+    except ValueError as e:
+        return error(str(e), 400)
+    # Full rows are cached, so projecting a cached row costs no query
+    user = yield CachedUser(by, value)
+    if not user:
+        return error('User not found', 404)
+    etag = make_etag('user', user['user_id'], user.get('updated_at'), fields)
+    return Reply({'user': project_row(user, fields)}, etag=etag)
+
+
+def create_group(data, connection_events):
+    missing = _missing_field(data, ['group_link', 'user1_id', 'user2_id'])
+    if missing:
+        return missing
+    # Validate user1_id and user2_id exist
+    tg_ids = []
+    for uid in [data.get('user1_id'), data.get('user2_id')]:
+        user = yield fetch_one(CHECK_USER_EXISTS_BY_ID_QUERY, (uid,))
+        if not user:
+            return error(f'User with user_id {uid} not found', 404)
+        tg_ids.append(user[1])
+    result = yield run_statement(CREATE_GROUP_QUERY, (
+        data.get('group_link'),
+        data.get('event_name'),
+        data.get('meeting_location'),
+        data.get('meeting_time')
+    ))
+    group_id = result['lastrowid']
+    yield run_statement(INSERT_GROUP_PARTICIPANTS_QUERY, (group_id, data.get('user1_id'), data.get('user2_id')))
+    connection_events.publish(group_id, tg_ids)
+    return Reply({'message': 'Group and participants created', 'group_id': group_id}, 201)
+
+
+def check_participants(args):
+    group_id = args.get('group_id')
+    if not group_id:
+        return error('Missing group_id parameter', 400)
+    participants = yield fetch_all(GET_PARTICIPANT_QUERY, (group_id,), dictionary=True)
+    return Reply({'participants': participants})
+
+
+def group_details(group_id, args):
+    try:
+        fields = parse_user_fields(args.get('fields'))
+    except ValueError as e:
+        return error(str(e), 400)
+    group = yield fetch_one(GET_GROUP_DETAILS_QUERY, (group_id,), dictionary=True)
+    if not group:
+        return error('Group not found', 404)
+    # Participants in one statement instead of an IN list of varying length
+    query = GET_GROUP_PARTICIPANT_USER_COLUMNS_QUERY.format(columns=user_columns_sql(versioned_fields(fields), 'u'))
+    participants = yield fetch_all(query, (group_id,), dictionary=True)
+    etag = make_etag('group', group_id, group.get('updated_at'), fields, row_versions(participants, 'user_id'))
+    participants = [project_row(participant, fields) for participant in participants]
+    return Reply({'group': group, 'participants': participants}, etag=etag)
+
+
+def get_user_groups(args):
+    user_id = _id_arg(args, 'user_id')
+    if isinstance(user_id, Reply):
+        return user_id
+    try:
+        # Projects other_user; the group columns are always returned
+        fields = parse_user_fields(args.get('fields'))
+    except ValueError as e:
+        return error(str(e), 400)
+    other_user_query = GET_USER_COLUMNS_BY_ID_QUERY.format(columns=user_columns_sql(versioned_fields(fields))) \
+        if fields else GET_USER_BY_ID_QUERY
+
+    groups = yield fetch_all(GET_USER_GROUPS_QUERY, (user_id, user_id), dictionary=True)
+    processed_groups = []
+    for group in groups:
+        # Determine the other user in the connection
+        other_user_id = group['user2_id'] if group['user1_id'] == user_id else group['user1_id']
+        other_user = yield fetch_one(other_user_query, (other_user_id,), dictionary=True)
+        processed_groups.append({
+            'group_id': group['group_id'],
+            'group_link': group['group_link'],
+            'event_name': group['event_name'],
+            'meeting_location': group['meeting_location'],
+            'meeting_time': group['meeting_time'],
+            'created_at': group['created_at'],
+            'updated_at': group['updated_at'],
+            'other_user_id': other_user_id,
+            'other_user': other_user
+        })
+
+    etag = make_etag('groups', user_id, fields, row_versions(processed_groups, 'group_id'),
+                     row_versions([group['other_user'] for group in processed_groups], 'user_id'))
+    for group in processed_groups:
+        group['other_user'] = project_row(group['other_user'], fields)
+    return Reply({'groups': processed_groups}, etag=etag)
+
+
+def qr_request(args):
+    """(QRRequest, username) to render for /api/generate-qr, or an error Reply"""
+    try:
+        qr = parse_qr_args(args)
+    except ValueError as e:
+        return error(str(e), 400)
+    username = None
+    if qr.theme in NAMED_THEMES:
+        user = yield CachedUser('tg_id', qr.tg_id)
+        if not user:
+            return error('User not found', 404)
+        username = user.get('username')
+    return qr, username
+
+
+def user_connections(args):
+    """A page of the user's connections for the webapp"""
+    tg_id = _id_arg(args, 'tg_id', signed=True)
+    if isinstance(tg_id, Reply):
+        return tg_id
+    try:
+        limit, before = parse_page_args(args)
+    except ValueError as e:
+        return error(str(e), 400)
+    # One extra row tells us whether another page follows
+    rows = yield fetch_all(GET_USER_CONNECTIONS_PAGE_QUERY, (tg_id, before, tg_id, before, limit + 1))
+    etag = make_etag('connections', tg_id, limit, before, len(rows) > limit, connection_versions(rows, limit))
+    return Reply(connections_page(rows, limit), etag=etag)
+
+
+def event_stream_args(args, headers):
+    """(tg_id, after) for /api/connection-events, or an error Reply"""
+    tg_id = _id_arg(args, 'tg_id', signed=True)
+    if isinstance(tg_id, Reply):
+        return tg_id
+    # Last group id the client has, so nothing recorded in between is missed
+    return tg_id, parse_last_event_id(headers.get('Last-Event-ID') or args.get('after'))
+
+
+def connection_event_message(tg_id, after, upto, limit, dumps):
+    """SSE message with the user's connections in (after, upto], or None if there are none"""
+    rows = yield fetch_all(GET_USER_CONNECTIONS_PAGE_QUERY, (tg_id, upto + 1, tg_id, upto + 1, limit))
+    page = connections_since(rows, after)
+    if not page['rows']:
+        return None
+    # Newest first, so the first row's group id is what the client has seen
+    return sse_message(dumps(page), event='connection', event_id=page['rows'][0][CONNECTION_GROUP_ID])
+
+
+def new_connections(after, limit):
+    """Rows for the ConnectionEventHub poller"""
+    return (yield fetch_all(GET_NEW_CONNECTIONS_QUERY, (after, limit)))
+
+
+def latest_group_id():
+    return (yield fetch_one(GET_LATEST_GROUP_ID_QUERY))[0]
+
+
+def bootstrap_qr(tg_id):
+    """How the webapp should load the user's QR code"""
+    return {
+        'url': f"/api/generate-qr?tg_id={tg_id}",
+        'svg_url': f"/api/generate-qr?tg_id={tg_id}&format=svg",
+    }
+
+
+def bootstrap(data, user_cache):
+    """Profile, first page of connections and QR for the webapp's first render"""
+    data = data or {}
+    tg_id = str(data.get('tg_id', ''))
+    if not tg_id.lstrip('-').isdigit():
+        return error('Missing or invalid tg_id', 400)
+    tg_id = int(tg_id)
+    try:
+        limit, _ = parse_page_args({'limit': str(data['limit'])} if 'limit' in data else {})
+    except ValueError as e:
+        return error(str(e), 400)
+
+    created = False
+    if data.get('upsert', True):
+        result = yield run_statement(UPSERT_USER_QUERY, (
+            tg_id,
+            data.get('username'),
+            data.get('display_name'),
+            data.get('profile_image_url')
+        ))
+        created = result['rowcount'] == 1
+        if created:
+            user_cache.invalidate(tg_id=tg_id)
+
+    user = yield CachedUser('tg_id', tg_id)
+    if not user:
+        return error('User not found', 404)
+    rows = yield fetch_all(GET_USER_CONNECTIONS_PAGE_QUERY, (tg_id, FIRST_PAGE, tg_id, FIRST_PAGE, limit + 1))
+    return Reply({
+        'created': created,
+        'user': user,
+        'connections': connections_page(rows, limit),
+        'qr': bootstrap_qr(tg_id),
+        # Where to open /api/connection-events; None means this API
+        'events_url': EVENTS_URL or None,
+    })
+
+
+def update_profile(data, user_cache):
+    """Update user profile for webapp"""
+    tg_id = data.get('tg_id')
+    if not tg_id:
+        return error('Missing tg_id parameter', 400)
+    user = yield fetch_one(CHECK_USER_EXISTS_BY_TG_ID_QUERY, (tg_id,))
+    if not user:
+        return error('User not found', 404)
+    user_id = user[0]
+    query, values = build_user_update(data, PROFILE_FIELDS)
+    if not query:
+        return error('No updatable fields provided', 400)
+    values.append(user_id)
+    yield run_statement(query, values)
+    user_cache.invalidate(user_id=user_id, tg_id=tg_id)
+    return Reply({'message': 'Profile updated successfully'})
@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import logging
+import os
+from typing import Any, Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESS_MIN_SIZE = int(os.getenv('API_COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'text/javascript', 'text/css', 'text/html',
+    'text/plain', 'image/svg+xml',
+}
+
+
+def choose_encoding(accept_encoding) -> Optional[str]:
+    """Pick br or gzip from a parsed Accept-Encoding header"""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def _should_compress(response) -> bool:
+    return (
+        response.status_code == 200
+        and not getattr(response, 'direct_passthrough', False)
+        and 'Content-Encoding' not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def _apply(response, body: bytes, accept_encoding) -> None:
+    encoding = choose_encoding(accept_encoding)
+    response.vary.add('Accept-Encoding')
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+
+
+def init_compression(app) -> None:
+    """Compress Flask responses above COMPRESS_MIN_SIZE with br or gzip"""
+    from flask import request
+
+    @app.after_request
+    def compress_response(response):
+        if _should_compress(response) and not response.is_streamed:
+            _apply(response, response.get_data(), request.accept_encodings)
+        return response
+
+
+def init_async_compression(app) -> None:
+    """Compress Quart responses above COMPRESS_MIN_SIZE with br or gzip"""
+    from quart import request
+    from quart.wrappers.response import DataBody
+
+    @app.after_request
+    async def compress_response(response):
+        # Only in-memory bodies; files and streams are left alone
+        if _should_compress(response) and isinstance(response.response, DataBody):
+            _apply(response, await response.get_data(), request.accept_encodings)
+        return response
+
+
+def make_etag(*parts: Any) -> str:
+    """Validator derived from row versions (ids and updated_at values).
+
+    Callers include everything that changes the representation, such as the
+    fields= projection, so a different body never shares a tag.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def row_versions(rows: Iterable[Optional[dict]], *keys: str):
+    """(key values..., updated_at) for each row, for use in make_etag"""
+    return [tuple(row.get(key) for key in keys) + (row.get('updated_at'),) if row else None for row in rows]
+
+
+def is_not_modified(request, etag: str) -> bool:
+    # Weak comparison: compressed and identity bodies share the validator
+    return request.if_none_match.contains_weak(etag)
+
+
+def tag_response(response, etag: str):
+    """Attach a weak ETag and ask clients to revalidate before reusing the body"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,82 @@
+import decimal
+import logging
+import os
+from typing import Any, Callable, Dict
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj: Any) -> Any:
+    # orjson handles datetime, date, UUID and dataclasses itself
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProviderMixin:
+    """JSON provider methods backed by orjson.
+
+    Mixed into the framework's DefaultJSONProvider so Flask and Quart share it.
+    datetime and date values are written natively as ISO 8601 strings.
+    Calls with json.dumps options orjson has no equivalent for fall back to
+    the stdlib implementation.
+    """
+
+    # json.dumps options that only affect whitespace/escaping, or map onto orjson options
+    _SUPPORTED_OPTIONS = {'indent', 'sort_keys', 'separators', 'ensure_ascii'}
+
+    def dump_bytes(self, obj: Any, **kwargs: Any) -> bytes:
+        if not self._SUPPORTED_OPTIONS.issuperset(kwargs):
+            return super().dumps(obj, **kwargs).encode('utf-8')
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self.dump_bytes(obj, **kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # Hand the encoded bytes straight to the response, skipping a str round trip
+        body = self.dump_bytes(obj, indent=indent) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def _providers(base) -> Dict[str, Callable]:
+    providers = {'std': base}
+    if orjson is not None:
+        providers['orjson'] = type('OrjsonProvider', (OrjsonProviderMixin, base), {})
+    return providers
+
+
+def init_json_provider(app, base=None) -> str:
+    """Install the JSON provider selected by API_JSON_PROVIDER on the app.
+
+    base is the framework's DefaultJSONProvider (Flask's by default).
+    Returns the name of the provider in use.
+    """
+    if base is None:
+        from flask.json.provider import DefaultJSONProvider as base
+    providers = _providers(base)
+    name = os.getenv('API_JSON_PROVIDER', 'orjson')
+    if name not in providers:
+        logger.warning(f"JSON provider '{name}' is not available, using std")
+        name = 'std'
+    app.json = providers[name](app)
+    return name
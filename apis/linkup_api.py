@@ -1,396 +1,330 @@
-import os
+import queue
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
-import mysql.connector
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, Response, request, jsonify, send_from_directory, send_file
 from mysql.connector import Error
-
-from constants import CHECK_USER_EXISTS_QUERY, INSERT_USER_QUERY, UPDATE_USER_QUERY, DELETE_USER_QUERY, \
-    CREATE_GROUP_QUERY, INSERT_GROUP_PARTICIPANTS_QUERY, GET_GROUP_DETAILS_QUERY, GET_PARTICIPANT_QUERY, \
-    GET_USERS_DETAILS_QUERY, GET_USER_GROUPS_QUERY
+from werkzeug.exceptions import NotFound
+
+from constants import GET_USER_BY_ID_QUERY, GET_USER_BY_TG_ID_QUERY, REQUEST_BUDGET_HEADER
+from json_provider import init_json_provider
+from db import get_db_connection, fetch_one, fetch_all, run_statement, statement_stats, FIRST_PAGE, \
+    DEFAULT_PAGE_SIZE, request_budget, set_statement_budget, DEFAULT_REQUEST_BUDGET
+from events import ConnectionEventHub, EVENTS_HEARTBEAT_SECONDS, EVENTS_MAX_SYNC_STREAMS, EVENTS_RETRY_MS, \
+    EVENTS_POLL_RETRY_MS, EVENTS_WATCH_PERIODS
+import handlers
+from handlers import Reply, CachedUser
+from http_cache import init_compression, is_not_modified, tag_response
+from qr_cache import QRImageCache, render_qr, QR_CACHE_MAX_AGE
+from qr_render import render_admission
+from user_cache import UserCache
+from webapp_assets import WebappAssets, finish_webapp_response
 
 load_dotenv()
 
 app = Flask(__name__)
+init_json_provider(app)
+init_compression(app)
 
+# Read-through cache for user rows served by /get-user-by-tg-id and /get-user-details
+user_cache = UserCache()
+# Rendered QR images for /api/generate-qr
+qr_cache = QRImageCache()
+# Built webapp in webapp/dist when present, else the source files
+webapp_assets = WebappAssets()
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv('MYSQL_HOST'),
-        port=os.getenv('MYSQL_PORT'),
-        user=os.getenv('MYSQL_USER'),
-        password=os.getenv('MYSQL_PASSWORD'),
-        database=os.getenv('MYSQL_DATABASE')
-    )
 
+def _load_user(query, value, conn=None):
+    if conn is not None:
+        return fetch_one(conn, query, (value,), dictionary=True)
+    conn = get_db_connection()
+    try:
+        return fetch_one(conn, query, (value,), dictionary=True)
+    finally:
+        conn.close()
 
-@app.route('/create-user', methods=['POST'])
-def create_user():
-    data = request.json
-    required_fields = ['tg_id']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def load_user_by_user_id(user_id, conn=None):
+    return _load_user(GET_USER_BY_ID_QUERY, int(user_id), conn)
+
+
+def load_user_by_tg_id(tg_id, conn=None):
+    return _load_user(GET_USER_BY_TG_ID_QUERY, int(tg_id), conn)
+
+
+def execute(conn, query):
+    if query.method == 'one':
+        return fetch_one(conn, query.sql, query.params, query.dictionary)
+    if query.method == 'all':
+        return fetch_all(conn, query.sql, query.params, query.dictionary)
+    return run_statement(conn, query.sql, query.params)
+
+
+def cached_user(lookup, conn):
+    # Misses load on the request's connection when it already holds one
+    if lookup.by == 'tg_id':
+        return user_cache.get_by_tg_id(lookup.value, lambda value: load_user_by_tg_id(value, conn))
+    return user_cache.get_by_user_id(lookup.value, lambda value: load_user_by_user_id(value, conn))
+
+
+def run_handler(handler):
+    """Drive a handlers.py generator on one pooled connection, borrowed at its first query"""
+    conn = None
+    result = None
     try:
-        # Check if tg_id already exists
-        where_condition = 'WHERE tg_id = %s'
-        query = CHECK_USER_EXISTS_QUERY.format(where_condition=where_condition)
-        cursor.execute(query, (data['tg_id'],))
-        if cursor.fetchone():
-            return jsonify({'error': 'User with this tg_id already exists'}), 409
-        cursor.execute(INSERT_USER_QUERY, (
-            data['tg_id'],
-            data.get('username'),
-            data.get('display_name'),
-            data.get('project_name'),
-            data.get('role'),
-            data.get('description'),
-            data.get('profile_image_url')
-        ))
-        conn.commit()
-        user_id = cursor.lastrowid
-        return jsonify({'message': 'User created', 'user_id': user_id}), 201
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
+        while True:
+            try:
+                step = handler.send(result)
+            except StopIteration as stop:
+                return stop.value
+            if isinstance(step, CachedUser):
+                result = cached_user(step, conn)
+            else:
+                if conn is None:
+                    conn = get_db_connection()
+                result = execute(conn, step)
     finally:
-        if cursor: cursor.close()
         if conn: conn.close()
 
 
-@app.route('/update-user/<int:user_id>', methods=['PUT'])
-def update_user(user_id):
-    data = request.json
-    if not data:
-        return jsonify({'error': 'No data provided'}), 400
+def load_new_connections(after, limit):
+    return run_handler(handlers.new_connections(after, limit))
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+
+def load_latest_group_id():
+    return run_handler(handlers.latest_group_id())
+
+
+# New-connection notices for /api/connection-events streams
+connection_events = ConnectionEventHub()
+connection_events.set_loaders(load_new_connections, load_latest_group_id)
+# Each open stream holds a request thread here; the async server has no such limit
+stream_slots = threading.BoundedSemaphore(EVENTS_MAX_SYNC_STREAMS)
+
+
+@app.before_request
+def apply_request_budget():
+    # The bot's remaining budget for this interaction, or API_REQUEST_TIMEOUT,
+    # bounds our queries
+    set_statement_budget(request_budget(request.headers.get(REQUEST_BUDGET_HEADER)))
+
+
+@app.teardown_request
+def clear_request_budget(exc):
+    # Worker threads are reused; the next request starts unbudgeted
+    set_statement_budget(None)
+
+
+def respond(reply):
+    """JSON response for a Reply; 304 when it has an ETag the client already holds"""
+    if reply.etag is None:
+        return jsonify(reply.payload), reply.status
+    if is_not_modified(request, reply.etag):
+        return tag_response(app.response_class(status=304), reply.etag)
+    return tag_response(jsonify(reply.payload), reply.etag)
+
+
+def handle(handler):
     try:
-        # Check if user exists
-        where_condition = 'WHERE user_id = %s'
-        query = CHECK_USER_EXISTS_QUERY.format(where_condition=where_condition)
-        cursor.execute(query, (user_id,))
-        if not cursor.fetchone():
-            return jsonify({'error': 'User not found'}), 404
-        # Build update query
-        fields = []
-        values = []
-        for key in ['username', 'display_name', 'project_name', 'role', 'description', 'profile_image_url']:
-            if key in data:
-                fields.append(f"{key} = %s")
-                values.append(data[key])
-        if not fields:
-            return jsonify({'error': 'No updatable fields provided'}), 400
-        values.append(user_id)
-        query = UPDATE_USER_QUERY.format(set_fields=', '.join(fields))
-        cursor.execute(query, tuple(values))
-        conn.commit()
-        return jsonify({'message': 'User updated'}), 200
+        return respond(run_handler(handler))
     except Error as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+
+
+@app.route('/create-user', methods=['POST'])
+def create_user():
+    return handle(handlers.create_user(request.json, user_cache))
+
+
+@app.route('/update-user/<int:user_id>', methods=['PUT'])
+def update_user(user_id):
+    return handle(handlers.update_user(user_id, request.json, user_cache))
 
 
 @app.route('/delete-user/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        # Check if user exists
-        where_condition = 'WHERE user_id = %s'
-        query = CHECK_USER_EXISTS_QUERY.format(where_condition=where_condition)
-        cursor.execute(query, (user_id,))
-        if not cursor.fetchone():
-            return jsonify({'error': 'User not found'}), 404
-        cursor.execute(DELETE_USER_QUERY, (user_id,))
-        conn.commit()
-        return jsonify({'message': 'User deleted'}), 200
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+    return handle(handlers.delete_user(user_id, user_cache))
+
 
 @app.route('/get-user-details', methods=['GET'])
 def get_user_details():
-    user_id = request.args.get('user_id')
-    if not user_id:
-        return jsonify({'error': 'Missing user_id parameter'}), 400
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        query = GET_USERS_DETAILS_QUERY.format(where_condition=f'WHERE user_id = {user_id}')
-        cursor.execute(query)
-        user = cursor.fetchone()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        return jsonify({'user': user}), 200
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+    return handle(handlers.get_user(request.args, 'user_id'))
 
 
 @app.route('/get-user-by-tg-id', methods=['GET'])
 def get_user_by_tg_id():
-    tg_id = request.args.get('tg_id')
-    if not tg_id:
-        return jsonify({'error': 'Missing tg_id parameter'}), 400
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        query = GET_USERS_DETAILS_QUERY.format(where_condition=f'WHERE tg_id = {tg_id}')
-        cursor.execute(query)
-        user = cursor.fetchone()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        return jsonify({'user': user}), 200
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+    return handle(handlers.get_user(request.args, 'tg_id'))
+
+
+@app.route('/internal/cache-stats', methods=['GET'])
+def cache_stats():
+    """Expose user cache and prepared statement counters for monitoring"""
+    return jsonify({
+        'user_cache': user_cache.stats(),
+        'statements': dict(statement_stats),
+        'qr_cache': qr_cache.stats(),
+        'qr_render': render_admission.stats(),
+        'connection_events': connection_events.stats(),
+    }), 200
+
 
 @app.route('/create-group', methods=['POST'])
 def create_group():
-    data = request.json
-    required_fields = ['group_link', 'user1_id', 'user2_id']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        # Validate user1_id and user2_id exist
-        for uid in [data.get('user1_id'), data.get('user2_id')]:
-            where_condition = 'WHERE user_id = %s'
-            query = CHECK_USER_EXISTS_QUERY.format(where_condition=where_condition)
-            cursor.execute(query, (uid,))
-            if not cursor.fetchone():
-                return jsonify({'error': f'User with user_id {uid} not found'}), 404
-        # Create group
-        # print(CREATE_GROUP_QUERY)
-        cursor.execute(CREATE_GROUP_QUERY, (
-            data.get('group_link'),
-            data.get('event_name'),
-            data.get('meeting_location'),
-            data.get('meeting_time')
-        ))
-        conn.commit()
-        group_id = cursor.lastrowid
-        # Insert into group_participants
-        cursor.execute(INSERT_GROUP_PARTICIPANTS_QUERY, (group_id, data.get('user1_id'), data.get('user2_id')))
-        conn.commit()
-        return jsonify({'message': 'Group and participants created', 'group_id': group_id}), 201
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+    return handle(handlers.create_group(request.json, connection_events))
 
 
 @app.route('/check-participants', methods=['GET'])
 def check_participants():
-    group_id = request.args.get('group_id')
-    if not group_id:
-        return jsonify({'error': 'Missing group_id parameter'}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute(GET_PARTICIPANT_QUERY, (group_id,))
-        participants = cursor.fetchall()
-        return jsonify({'participants': participants}), 200
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+    return handle(handlers.check_participants(request.args))
 
 
 @app.route('/group-details/<int:group_id>', methods=['GET'])
 def group_details(group_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Get group details
-        cursor.execute(GET_GROUP_DETAILS_QUERY, (group_id,))
-        group = cursor.fetchone()
-        if not group:
-            return jsonify({'error': 'Group not found'}), 404
-        # Get participants
-        cursor.execute(GET_PARTICIPANT_QUERY, (group_id,))
-        participants_rows = cursor.fetchall()
-        participant_ids = set()
-        for row in participants_rows:
-            if row['user1_id']:
-                participant_ids.add(row['user1_id'])
-            if row['user2_id']:
-                participant_ids.add(row['user2_id'])
-        participants = []
-        if participant_ids:
-            format_strings = ','.join(['%s'] * len(participant_ids))
-            query = GET_USERS_DETAILS_QUERY.format(where_condition=f'WHERE user_id IN ({format_strings})')
-            cursor.execute(query, tuple(participant_ids))
-            participants = cursor.fetchall()
-        return jsonify({'group': group, 'participants': participants}), 200
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+    return handle(handlers.group_details(group_id, request.args))
 
 
 @app.route('/get-user-groups', methods=['GET'])
 def get_user_groups():
-    user_id = request.args.get('user_id')
-    if not user_id:
-        return jsonify({'error': 'Missing user_id parameter'}), 400
-    
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute(GET_USER_GROUPS_QUERY, (user_id, user_id))
-        groups = cursor.fetchall()
-        
-        # Process groups to include connection information
-        processed_groups = []
-        for group in groups:
-            # Determine the other user in the connection
-            other_user_id = group['user2_id'] if group['user1_id'] == int(user_id) else group['user1_id']
-            
-            # Get other user details
-            other_user_query = GET_USERS_DETAILS_QUERY.format(where_condition=f'WHERE user_id = {other_user_id}')
-            cursor.execute(other_user_query)
-            other_user = cursor.fetchone()
-            
-            processed_group = {
-                'group_id': group['group_id'],
-                'group_link': group['group_link'],
-                'event_name': group['event_name'],
-                'meeting_location': group['meeting_location'],
-                'meeting_time': group['meeting_time'],
-                'created_at': group['created_at'],
-                'updated_at': group['updated_at'],
-                'other_user_id': other_user_id,
-                'other_user': other_user
-            }
-            processed_groups.append(processed_group)
-        
-        return jsonify({'groups': processed_groups}), 200
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+    return handle(handlers.get_user_groups(request.args))
 
 
 # Webapp serving routes
+def send_webapp_file(filename):
+    """Send a webapp file, precompressed and cached according to webapp_assets"""
+    try:
+        webapp_file = webapp_assets.resolve(filename, request.accept_encodings)
+    except NotFound:
+        return jsonify({'error': f'Asset not found: {filename}'}), 404
+    response = send_from_directory(webapp_file.directory, webapp_file.filename, mimetype=webapp_file.mimetype)
+    return finish_webapp_response(response, webapp_file)
+
 @app.route('/webapp/')
 @app.route('/webapp')
 def serve_webapp():
     """Serve the main webapp index.html"""
-    try:
-        webapp_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'webapp')
-        return send_from_directory(webapp_dir, 'index.html')
-    except Exception as e:
-        return jsonify({'error': f'Webapp not found: {str(e)}'}), 404
+    return send_webapp_file('index.html')
 
 @app.route('/webapp/<path:filename>')
 def serve_webapp_assets(filename):
     """Serve webapp static assets (CSS, JS, images)"""
-    try:
-        webapp_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'webapp')
-        return send_from_directory(webapp_dir, filename)
-    except Exception as e:
-        return jsonify({'error': f'Asset not found: {str(e)}'}), 404
+    return send_webapp_file(filename)
 
 # API endpoints for the webapp
 @app.route('/api/generate-qr', methods=['GET'])
 def generate_qr_api():
-    """Generate QR code for webapp"""
-    from bot import generate_qr_code_image
-    import io
-    
-    tg_id = request.args.get('tg_id')
-    if not tg_id:
-        return jsonify({'error': 'Missing tg_id parameter'}), 400
-    
+    """Themed PNG or plain SVG QR code, rendered once per parameter set and served from disk"""
     try:
-        # Generate QR code image
-        qr_img = generate_qr_code_image(tg_id)
-        
-        # Convert to bytes
-        img_buffer = io.BytesIO()
-        qr_img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        return send_file(img_buffer, mimetype='image/png')
+        parsed = run_handler(handlers.qr_request(request.args))
+    except Error as e:
+        return jsonify({'error': str(e)}), 500
+    if isinstance(parsed, Reply):
+        return respond(parsed)
+    qr, username = parsed
+
+    try:
+        path, etag = qr_cache.get(qr.key(username), lambda: render_qr(qr, username))
+    except FuturesTimeoutError:
+        return jsonify({'error': 'QR renderer is busy, try again shortly'}), 503
     except Exception as e:
         return jsonify({'error': f'Failed to generate QR: {str(e)}'}), 500
 
+    response = send_file(path, mimetype=qr.mimetype, etag=etag, max_age=QR_CACHE_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    return response
+
 @app.route('/api/user-connections', methods=['GET'])
 def get_user_connections_api():
-    """Get user connections for webapp"""
-    tg_id = request.args.get('tg_id')
-    if not tg_id:
-        return jsonify({'error': 'Missing tg_id parameter'}), 400
-    
-    # For now, return empty connections - this would need to be implemented
-    # based on your connection tracking system
-    return jsonify([])
+    """Get a page of the user's connections for the webapp"""
+    return handle(handlers.user_connections(request.args))
+
+def connection_event_message(tg_id, after, upto, limit):
+    """SSE message with the user's connections in (after, upto], or None if there are none"""
+    # Streams outlive the request's budget, so each message's query gets a fresh one
+    set_statement_budget(DEFAULT_REQUEST_BUDGET)
+    return run_handler(handlers.connection_event_message(tg_id, after, upto, limit, app.json.dumps))
+
+def connection_events_poll(tg_id, after):
+    """One poll's worth of events, from the hub's memory unless the user has news"""
+    connection_events.watch(EVENTS_WATCH_PERIODS * EVENTS_POLL_RETRY_MS / 1000)
+    body = f"retry: {EVENTS_POLL_RETRY_MS}\n\n"
+    if after is not None and connection_events.has_news(tg_id, after) is False:
+        return body
+    # Read before the query, so the answer covers every group up to it. An id
+    # with no data moves Last-Event-ID without firing an event, so the next poll
+    # starts where the hub's memory does and needs no query; a message below
+    # moves it again to its own group
+    position = connection_events.position()
+    if position is not None and (after is None or position > after):
+        body += f"id: {position}\n\n"
+    if after is not None:
+        body += connection_event_message(tg_id, after, FIRST_PAGE - 1, DEFAULT_PAGE_SIZE) or ''
+    return body
+
+@app.route('/api/connection-events', methods=['GET'])
+def connection_events_api():
+    """Stream the user's new connections as Server-Sent Events"""
+    parsed = handlers.event_stream_args(request.args, request.headers)
+    if isinstance(parsed, Reply):
+        return respond(parsed)
+    tg_id, after = parsed
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        # Stop nginx-style proxies from buffering the stream
+        'X-Accel-Buffering': 'no',
+    }
+    if not stream_slots.acquire(blocking=False):
+        # No thread to spare: send what is new and end the response. EventSource
+        # reconnects after the retry delay with Last-Event-ID, so the client polls
+        # (a 503 would make it give up for good)
+        return Response(connection_events_poll(tg_id, after), mimetype='text/event-stream', headers=headers)
+
+    notices = queue.Queue()
+    subscription = connection_events.subscribe(tg_id, notices.put_nowait)
+    closed = threading.Event()
+
+    def close():
+        # Runs from the generator or the response, whichever closes first
+        if not closed.is_set():
+            closed.set()
+            connection_events.unsubscribe(subscription)
+            stream_slots.release()
+
+    def stream():
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            if after is not None:
+                message = connection_event_message(tg_id, after, FIRST_PAGE - 1, DEFAULT_PAGE_SIZE)
+                if message:
+                    yield message
+            while True:
+                try:
+                    group_id = notices.get(timeout=EVENTS_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                message = connection_event_message(tg_id, group_id - 1, group_id, 1)
+                if message:
+                    yield message
+        finally:
+            close()
+
+    response = Response(stream(), mimetype='text/event-stream', headers=headers)
+    response.call_on_close(close)
+    return response
+
+
+@app.route('/api/bootstrap', methods=['POST'])
+def bootstrap_api():
+    """Profile, first page of connections and QR for the webapp's first render"""
+    # One connection for the whole bootstrap instead of one per webapp request
+    return handle(handlers.bootstrap(request.get_json(silent=True), user_cache))
 
 @app.route('/api/update-profile', methods=['PUT'])
 def update_profile_api():
     """Update user profile for webapp"""
-    data = request.json
-    tg_id = data.get('tg_id')
-    
-    if not tg_id:
-        return jsonify({'error': 'Missing tg_id parameter'}), 400
-    
-    # Update user profile in database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        # Find user by tg_id
-        cursor.execute("SELECT user_id FROM users WHERE tg_id = %s", (tg_id,))
-        user = cursor.fetchone()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        user_id = user[0]
-        
-        # Build update query
-        fields = []
-        values = []
-        for key in ['display_name', 'role', 'project_name', 'description']:
-            if key in data:
-                fields.append(f"{key} = %s")
-                values.append(data[key])
-        
-        if not fields:
-            return jsonify({'error': 'No updatable fields provided'}), 400
-        
-        values.append(user_id)
-        query = f"UPDATE users SET {', '.join(fields)} WHERE user_id = %s"
-        cursor.execute(query, tuple(values))
-        conn.commit()
-        
-        return jsonify({'message': 'Profile updated successfully'}), 200
-    except Error as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
-
+    return handle(handlers.update_profile(request.json, user_cache))
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000)
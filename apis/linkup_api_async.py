@@ -0,0 +1,341 @@
+"""
+ASGI variant of the LinkUp API.
+
+Serves the same routes as linkup_api.py, on Quart with an aiomysql pool so a
+single process keeps many requests in flight while they wait on MySQL. Both
+apps run the request handlers in handlers.py; this module only drives them
+on async connections. Selected with API_SERVER=async (see start.sh).
+"""
+import asyncio
+import os
+from contextlib import AsyncExitStack
+
+import aiomysql
+from dotenv import load_dotenv
+from quart import Quart, request, jsonify, make_response, send_from_directory, send_file
+from quart.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import NotFound
+
+from constants import GET_USER_BY_ID_QUERY, GET_USER_BY_TG_ID_QUERY, REQUEST_BUDGET_HEADER
+from db import FIRST_PAGE, DEFAULT_PAGE_SIZE, request_budget, set_statement_budget, DEFAULT_REQUEST_BUDGET
+from events import ConnectionEventHub, EVENTS_HEARTBEAT_SECONDS, EVENTS_RETRY_MS
+import handlers
+from handlers import Reply, CachedUser
+from http_cache import init_async_compression, is_not_modified, tag_response
+from json_provider import init_json_provider
+import async_db
+from async_db import fetch_one, fetch_all, run_statement
+from qr_cache import QRImageCache, render_qr, QR_CACHE_MAX_AGE, QR_RENDER_TIMEOUT
+from qr_render import render_admission
+from user_cache import UserCache
+from webapp_assets import WebappAssets, finish_webapp_response
+
+load_dotenv()
+
+app = Quart(__name__)
+init_json_provider(app, DefaultJSONProvider)
+init_async_compression(app)
+
+# Read-through cache for user rows served by /get-user-by-tg-id and /get-user-details
+user_cache = UserCache()
+# Rendered QR images for /api/generate-qr
+qr_cache = QRImageCache()
+# Built webapp in webapp/dist when present, else the source files
+webapp_assets = WebappAssets()
+# New-connection notices for /api/connection-events streams
+connection_events = ConnectionEventHub()
+# Poller queries run on the event loop from the hub's thread
+LOADER_TIMEOUT = 10
+
+
+async def _load_user(query, value, conn=None):
+    if conn is not None:
+        return await fetch_one(conn, query, (value,), dictionary=True)
+    async with async_db.connection() as conn:
+        return await fetch_one(conn, query, (value,), dictionary=True)
+
+
+async def load_user_by_user_id(user_id, conn=None):
+    return await _load_user(GET_USER_BY_ID_QUERY, int(user_id), conn)
+
+
+async def load_user_by_tg_id(tg_id, conn=None):
+    return await _load_user(GET_USER_BY_TG_ID_QUERY, int(tg_id), conn)
+
+
+async def execute(conn, query):
+    if query.method == 'one':
+        return await fetch_one(conn, query.sql, query.params, query.dictionary)
+    if query.method == 'all':
+        return await fetch_all(conn, query.sql, query.params, query.dictionary)
+    return await run_statement(conn, query.sql, query.params)
+
+
+async def cached_user(lookup, conn):
+    # Misses load on the request's connection when it already holds one
+    if lookup.by == 'tg_id':
+        return await user_cache.aget_by_tg_id(lookup.value, lambda value: load_user_by_tg_id(value, conn))
+    return await user_cache.aget_by_user_id(lookup.value, lambda value: load_user_by_user_id(value, conn))
+
+
+async def run_handler(handler):
+    """Drive a handlers.py generator on one pooled connection, borrowed at its first query"""
+    async with AsyncExitStack() as stack:
+        conn = None
+        result = None
+        while True:
+            try:
+                step = handler.send(result)
+            except StopIteration as stop:
+                return stop.value
+            if isinstance(step, CachedUser):
+                result = await cached_user(step, conn)
+            else:
+                if conn is None:
+                    conn = await stack.enter_async_context(async_db.connection())
+                result = await execute(conn, step)
+
+
+async def load_new_connections(after, limit):
+    return await run_handler(handlers.new_connections(after, limit))
+
+
+async def load_latest_group_id():
+    return await run_handler(handlers.latest_group_id())
+
+
+@app.before_serving
+async def startup():
+    await async_db.init_pool()
+    loop = asyncio.get_running_loop()
+    connection_events.set_loaders(
+        lambda after, limit: asyncio.run_coroutine_threadsafe(
+            load_new_connections(after, limit), loop).result(LOADER_TIMEOUT),
+        lambda: asyncio.run_coroutine_threadsafe(load_latest_group_id(), loop).result(LOADER_TIMEOUT),
+    )
+
+
+@app.after_serving
+async def shutdown():
+    await async_db.close_pool()
+
+
+@app.before_request
+async def apply_request_budget():
+    # The bot's remaining budget for this interaction, or API_REQUEST_TIMEOUT,
+    # bounds our queries. Each request runs in its own task, so the budget ends with it.
+    set_statement_budget(request_budget(request.headers.get(REQUEST_BUDGET_HEADER)))
+
+
+async def respond(reply):
+    """JSON response for a Reply; 304 when it has an ETag the client already holds"""
+    if reply.etag is None:
+        return jsonify(reply.payload), reply.status
+    if is_not_modified(request, reply.etag):
+        return tag_response(app.response_class('', status=304), reply.etag)
+    return tag_response(await make_response(jsonify(reply.payload)), reply.etag)
+
+
+async def handle(handler):
+    try:
+        return await respond(await run_handler(handler))
+    except aiomysql.Error as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/create-user', methods=['POST'])
+async def create_user():
+    return await handle(handlers.create_user(await request.get_json(), user_cache))
+
+
+@app.route('/update-user/<int:user_id>', methods=['PUT'])
+async def update_user(user_id):
+    return await handle(handlers.update_user(user_id, await request.get_json(), user_cache))
+
+
+@app.route('/delete-user/<int:user_id>', methods=['DELETE'])
+async def delete_user(user_id):
+    return await handle(handlers.delete_user(user_id, user_cache))
+
+
+@app.route('/get-user-details', methods=['GET'])
+async def get_user_details():
+    return await handle(handlers.get_user(request.args, 'user_id'))
+
+
+@app.route('/get-user-by-tg-id', methods=['GET'])
+async def get_user_by_tg_id():
+    return await handle(handlers.get_user(request.args, 'tg_id'))
+
+
+@app.route('/internal/cache-stats', methods=['GET'])
+async def cache_stats():
+    """Expose user cache and pool counters for monitoring"""
+    pool = async_db._pool
+    pool_stats = {'size': pool.size, 'free': pool.freesize, 'maxsize': pool.maxsize} if pool else {}
+    return jsonify({
+        'user_cache': user_cache.stats(),
+        'pool': pool_stats,
+        'qr_cache': qr_cache.stats(),
+        'qr_render': render_admission.stats(),
+        'connection_events': connection_events.stats(),
+    }), 200
+
+
+@app.route('/create-group', methods=['POST'])
+async def create_group():
+    return await handle(handlers.create_group(await request.get_json(), connection_events))
+
+
+@app.route('/check-participants', methods=['GET'])
+async def check_participants():
+    return await handle(handlers.check_participants(request.args))
+
+
+@app.route('/group-details/<int:group_id>', methods=['GET'])
+async def group_details(group_id):
+    return await handle(handlers.group_details(group_id, request.args))
+
+
+@app.route('/get-user-groups', methods=['GET'])
+async def get_user_groups():
+    return await handle(handlers.get_user_groups(request.args))
+
+
+# Webapp serving routes
+async def send_webapp_file(filename):
+    """Send a webapp file, precompressed and cached according to webapp_assets"""
+    try:
+        webapp_file = webapp_assets.resolve(filename, request.accept_encodings)
+    except NotFound:
+        return jsonify({'error': f'Asset not found: {filename}'}), 404
+    response = await send_from_directory(webapp_file.directory, webapp_file.filename, mimetype=webapp_file.mimetype)
+    return finish_webapp_response(response, webapp_file)
+
+
+@app.route('/webapp/')
+@app.route('/webapp')
+async def serve_webapp():
+    """Serve the main webapp index.html"""
+    return await send_webapp_file('index.html')
+
+
+@app.route('/webapp/<path:filename>')
+async def serve_webapp_assets(filename):
+    """Serve webapp static assets (CSS, JS, images)"""
+    return await send_webapp_file(filename)
+
+
+# API endpoints for the webapp
+@app.route('/api/generate-qr', methods=['GET'])
+async def generate_qr_api():
+    """Themed PNG or plain SVG QR code, rendered once per parameter set and served from disk"""
+    try:
+        parsed = await run_handler(handlers.qr_request(request.args))
+    except aiomysql.Error as e:
+        return jsonify({'error': str(e)}), 500
+    if isinstance(parsed, Reply):
+        return await respond(parsed)
+    qr, username = parsed
+
+    key = qr.key(username)
+    try:
+        # Rendering is CPU-bound; misses go to the render executor, off the event loop
+        cached = qr_cache.lookup(key)
+        if cached is None:
+            future = qr_cache.submit(key, lambda: render_qr(qr, username))
+            # Shielded: a timed-out request must not cancel a render other requests share
+            cached = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), QR_RENDER_TIMEOUT)
+        path, etag = cached
+    except asyncio.TimeoutError:
+        return jsonify({'error': 'QR renderer is busy, try again shortly'}), 503
+    except Exception as e:
+        return jsonify({'error': f'Failed to generate QR: {str(e)}'}), 500
+
+    if request.if_none_match.contains(etag):
+        response = await make_response('', 304)
+    else:
+        response = await send_file(path, mimetype=qr.mimetype, add_etags=False)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = QR_CACHE_MAX_AGE
+    return response
+
+
+@app.route('/api/user-connections', methods=['GET'])
+async def get_user_connections_api():
+    """Get a page of the user's connections for the webapp"""
+    return await handle(handlers.user_connections(request.args))
+
+
+async def connection_event_message(tg_id, after, upto, limit):
+    """SSE message with the user's connections in (after, upto], or None if there are none"""
+    # Streams outlive the request's budget, so each message's query gets a fresh one
+    set_statement_budget(DEFAULT_REQUEST_BUDGET)
+    return await run_handler(handlers.connection_event_message(tg_id, after, upto, limit, app.json.dumps))
+
+
+@app.route('/api/connection-events', methods=['GET'])
+async def connection_events_api():
+    """Stream the user's new connections as Server-Sent Events"""
+    parsed = handlers.event_stream_args(request.args, request.headers)
+    if isinstance(parsed, Reply):
+        return await respond(parsed)
+    tg_id, after = parsed
+
+    # An idle stream is one suspended coroutine and an empty queue
+    notices = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    subscription = connection_events.subscribe(
+        tg_id, lambda group_id: loop.call_soon_threadsafe(notices.put_nowait, group_id))
+
+    async def stream():
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            if after is not None:
+                message = await connection_event_message(tg_id, after, FIRST_PAGE - 1, DEFAULT_PAGE_SIZE)
+                if message:
+                    yield message
+            while True:
+                try:
+                    group_id = await asyncio.wait_for(notices.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                message = await connection_event_message(tg_id, group_id - 1, group_id, 1)
+                if message:
+                    yield message
+        finally:
+            connection_events.unsubscribe(subscription)
+
+    response = await make_response(stream(), 200, {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        # Served from its own origin when it runs beside gunicorn (EVENTS_URL)
+        'Access-Control-Allow-Origin': '*',
+    })
+    # Streams stay open until the client goes away
+    response.timeout = None
+    return response
+
+
+@app.route('/api/bootstrap', methods=['POST'])
+async def bootstrap_api():
+    """Profile, first page of connections and QR for the webapp's first render"""
+    return await handle(handlers.bootstrap(await request.get_json(silent=True), user_cache))
+
+
+@app.route('/api/update-profile', methods=['PUT'])
+async def update_profile_api():
+    """Update user profile for webapp"""
+    return await handle(handlers.update_profile(await request.get_json(), user_cache))
+
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"0.0.0.0:{os.getenv('API_PORT', '8000')}"]
+    asyncio.run(serve(app, config))
@@ -0,0 +1,284 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from qr_render import generate_qr_code_image, generate_qr_code_svg, create_card_style_qr, create_themed_qr, \
+    deep_link, start_payload
+
+logger = logging.getLogger(__name__)
+
+QR_CACHE_DIR = os.getenv('QR_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'linkup-qr'))
+QR_CACHE_MAX_FILES = int(os.getenv('QR_CACHE_MAX_FILES', '10000'))
+# Seconds browsers may reuse an image without revalidating
+QR_CACHE_MAX_AGE = int(os.getenv('QR_CACHE_MAX_AGE', '86400'))
+QR_RENDER_WORKERS = int(os.getenv('QR_RENDER_WORKERS', '2'))
+QR_RENDER_TIMEOUT = float(os.getenv('QR_RENDER_TIMEOUT', '10'))
+
+# Bump when rendering changes so stale files are not served under new keys
+RENDER_VERSION = 7
+
+QR_THEMES = ('default', 'card', 'ethcc')
+QR_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+# Themes that print the user's @username on the card
+NAMED_THEMES = ('card', 'ethcc')
+
+_HEX_COLOR = re.compile(r'^#?([0-9a-fA-F]{6})$')
+
+
+class QRRequest(NamedTuple):
+    tg_id: int
+    theme: str
+    color: Optional[Tuple[int, int, int]]
+    format: str = 'png'
+
+    @property
+    def mimetype(self) -> str:
+        return QR_FORMATS[self.format]
+
+    def key(self, username: Optional[str] = None) -> str:
+        """Cache key (and file name) covering everything that changes the rendered image"""
+        digest = hashlib.blake2b(digest_size=16)
+        # The themed cards encode the bot's deep link, so a renamed bot needs new images
+        parts = (RENDER_VERSION, self.tg_id, self.theme, self.color, username, os.getenv('BOT_USERNAME'))
+        digest.update(repr(parts).encode('utf-8'))
+        return f"{digest.hexdigest()}.{self.format}"
+
+
+def parse_color(value: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """'#rrggbb' as an RGB tuple; None when not given"""
+    if not value:
+        return None
+    match = _HEX_COLOR.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid color: {value}")
+    hex_value = match.group(1)
+    return tuple(int(hex_value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def parse_qr_args(args) -> QRRequest:
+    """QRRequest from /api/generate-qr query args; raises ValueError on bad input"""
+    tg_id = args.get('tg_id') or ''
+    if not tg_id.lstrip('-').isdigit():
+        raise ValueError('Missing or invalid tg_id parameter')
+    theme = args.get('theme') or 'default'
+    if theme not in QR_THEMES:
+        raise ValueError(f"Unknown theme: {theme}")
+    color = parse_color(args.get('color'))
+    if theme == 'ethcc':
+        # The ETHCC theme has its own palette
+        color = None
+    qr_format = args.get('format') or 'png'
+    if qr_format not in QR_FORMATS:
+        raise ValueError(f"Unknown format: {qr_format}")
+    if qr_format == 'svg' and theme != 'default':
+        raise ValueError('SVG is only available for the default theme')
+    return QRRequest(int(tg_id), theme, color, qr_format)
+
+
+def qr_payload(tg_id: int) -> str:
+    """What the code encodes: the bot's deep link when BOT_USERNAME is known"""
+    bot_username = os.getenv('BOT_USERNAME')
+    if bot_username:
+        return deep_link(bot_username, tg_id)
+    return start_payload(tg_id)
+
+
+def render_qr(qr: QRRequest, username: Optional[str] = None) -> bytes:
+    """Render the same images the bot sends, as PNG or SVG bytes"""
+    from PIL import ImageOps
+
+    if qr.format == 'svg':
+        fill_color = '#%02x%02x%02x' % qr.color if qr.color else '#000000'
+        svg = generate_qr_code_svg(qr.tg_id, fill_color=fill_color)
+        if svg is None:
+            raise RuntimeError('QR rendering failed')
+        return svg.encode('utf-8')
+
+    if qr.theme == 'card':
+        image = create_card_style_qr(qr_payload(qr.tg_id), username, qr_color=qr.color or (0, 0, 0))
+    elif qr.theme == 'ethcc':
+        image = create_themed_qr(qr_payload(qr.tg_id), username, theme='ethcc')
+    else:
+        image = generate_qr_code_image(qr.tg_id)
+        if image is not None and qr.color:
+            image = ImageOps.colorize(image.get_image().convert('L'), black=qr.color, white='white')
+    if image is None:
+        raise RuntimeError('QR rendering failed')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class QRImageCache:
+    """Rendered QR images on disk, keyed by render parameters.
+
+    Misses are rendered on a small executor so a burst of cold requests
+    cannot tie up every request thread, and concurrent requests for the same
+    key share one render. Tags are content hashes, so they stay strong even
+    if a later render of the same key differs.
+
+    The directory is shared by every worker, so eviction works from the
+    files themselves: hits refresh a file's mtime and the oldest files are
+    removed once there are more than max_files.
+    """
+
+    def __init__(self, directory: str = QR_CACHE_DIR, workers: int = QR_RENDER_WORKERS,
+                 max_files: int = QR_CACHE_MAX_FILES):
+        self.directory = directory
+        self.workers = workers
+        self.max_files = max_files
+        # Known etags, so hits do not re-hash the file
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._renders_since_prune: Optional[int] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+        self.evictions = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _executor_for_process(self) -> ThreadPoolExecutor:
+        # Worker threads do not survive a fork; gunicorn workers build their own
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='qr-render')
+            self._executor_pid = os.getpid()
+            self._inflight.clear()
+        return self._executor
+
+    def lookup(self, key: str) -> Optional[Tuple[str, str]]:
+        """(path, etag) if the image is already rendered"""
+        path = self.path_for(key)
+        with self._lock:
+            etag = self._entries.get(key)
+        if etag is not None:
+            try:
+                # Marks the file as recently used, and checks another worker has not evicted it
+                os.utime(path)
+            except FileNotFoundError:
+                with self._lock:
+                    self._entries.pop(key, None)
+                return None
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+            return path, etag
+        try:
+            with open(path, 'rb') as f:
+                etag = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, etag)
+        return path, etag
+
+    def submit(self, key: str, render: Callable[[], bytes]) -> Future:
+        """Future for (path, etag), rendering at most once per key at a time"""
+        with self._lock:
+            executor = self._executor_for_process()
+            future = self._inflight.get(key)
+            if future is None:
+                future = executor.submit(self._render, key, render)
+                self._inflight[key] = future
+            return future
+
+    def get(self, key: str, render: Callable[[], bytes], timeout: float = QR_RENDER_TIMEOUT) -> Tuple[str, str]:
+        """(path, etag), rendering on a miss; raises TimeoutError if the renderer is backed up"""
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+        return self.submit(key, render).result(timeout=timeout)
+
+    def _render(self, key: str, render: Callable[[], bytes]) -> Tuple[str, str]:
+        try:
+            data = render()
+            path = self.path_for(key)
+            os.makedirs(self.directory, exist_ok=True)
+            # Write then rename so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            etag = hashlib.blake2b(data, digest_size=16).hexdigest()
+            with self._lock:
+                self.renders += 1
+                self._remember(key, etag)
+                prune = self._prune_due()
+            if prune:
+                self._prune()
+            return path, etag
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _remember(self, key: str, etag: str) -> None:
+        self._entries[key] = etag
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_files:
+            self._entries.popitem(last=False)
+
+    def _prune_due(self) -> bool:
+        # Scanning the directory costs a stat per file, so each process does it
+        # on its first render and then every tenth of max_files renders
+        if self._renders_since_prune is not None:
+            self._renders_since_prune += 1
+            if self._renders_since_prune < max(1, self.max_files // 10):
+                return False
+        self._renders_since_prune = 0
+        return True
+
+    def _prune(self) -> None:
+        """Remove the least recently used files beyond max_files"""
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.tmp'):
+                        continue
+                    try:
+                        files.append((entry.stat().st_mtime, entry.name))
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            return
+        if len(files) <= self.max_files:
+            return
+        files.sort()
+        removed = 0
+        for _, name in files[:len(files) - self.max_files]:
+            try:
+                os.remove(self.path_for(name))
+                removed += 1
+            except FileNotFoundError:
+                # Another worker got there first
+                continue
+        with self._lock:
+            self.evictions += removed
+            for _, name in files[:len(files) - self.max_files]:
+                self._entries.pop(name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'renders': self.renders,
+                'evictions': self.evictions,
+                'inflight': len(self._inflight),
+            }
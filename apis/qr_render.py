@@ -0,0 +1,1049 @@
+"""
+QR code and card rendering shared by the bot and the API
+
+Only the standard library is imported at module load; Pillow and qrcode are
+imported by the functions that draw, so importing this module (for example
+from the API's QR cache) costs nothing until an image is rendered.
+"""
+import functools
+import logging
+import math
+import os
+import random
+import string
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Background photo for card-style QR codes
+CARD_BACKGROUND_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ethglobal.jpg')
+
+# Deep-link start parameters: "u" and the tg_id in base 62, so a 10-digit id
+# takes 6 characters. Telegram allows [A-Za-z0-9_-] in start parameters.
+# Codes printed before the switch carry "user_<tg_id>" or "LinkUp://user/<tg_id>".
+PAYLOAD_PREFIX = 'u'
+LEGACY_PAYLOAD_PREFIX = 'user_'
+LEGACY_URI_PREFIX = 'LinkUp://user/'
+START_PAYLOAD_PREFIXES = (PAYLOAD_PREFIX, LEGACY_PAYLOAD_PREFIX)
+_BASE62 = string.digits + string.ascii_uppercase + string.ascii_lowercase
+_BASE62_VALUES = {char: value for value, char in enumerate(_BASE62)}
+
+
+def encode_tg_id(tg_id):
+    """tg_id in base 62"""
+    tg_id = int(tg_id)
+    if tg_id < 0:
+        raise ValueError(f"Invalid tg_id: {tg_id}")
+    digits = []
+    while True:
+        tg_id, remainder = divmod(tg_id, 62)
+        digits.append(_BASE62[remainder])
+        if not tg_id:
+            return ''.join(reversed(digits))
+
+
+def decode_tg_id(encoded):
+    """Inverse of encode_tg_id; ValueError for anything else"""
+    if not encoded:
+        raise ValueError("Empty tg_id")
+    tg_id = 0
+    for char in encoded:
+        if char not in _BASE62_VALUES:
+            raise ValueError(f"Invalid base-62 tg_id: {encoded}")
+        tg_id = tg_id * 62 + _BASE62_VALUES[char]
+    return tg_id
+
+
+def start_payload(tg_id):
+    """The /start parameter a user's QR code carries"""
+    return PAYLOAD_PREFIX + encode_tg_id(tg_id)
+
+
+def deep_link(bot_username, tg_id):
+    """t.me link that opens the bot with the user's start parameter"""
+    return f"https://t.me/{bot_username}?start={start_payload(tg_id)}"
+
+
+def parse_qr_payload(text):
+    """tg_id from anything a LinkUp QR code has encoded; ValueError otherwise
+
+    Accepts t.me deep links and bare start parameters in both the compact and
+    the legacy form, LinkUp://user/ URIs and plain numeric ids.
+    """
+    text = text.strip()
+    if '?start=' in text:
+        text = text.split('?start=', 1)[1].split('&', 1)[0]
+    if text.startswith(LEGACY_URI_PREFIX):
+        return int(text[len(LEGACY_URI_PREFIX):])
+    if text.startswith(LEGACY_PAYLOAD_PREFIX):
+        return int(text[len(LEGACY_PAYLOAD_PREFIX):])
+    if text.startswith(PAYLOAD_PREFIX):
+        return decode_tg_id(text[len(PAYLOAD_PREFIX):])
+    return int(text)
+
+
+# Encoded matrices by (payload, error correction level); a user's code is
+# drawn once per theme and colour, but encoded only once
+QR_MATRIX_CACHE_SIZE = int(os.getenv('QR_MATRIX_CACHE_SIZE', '1024'))
+_matrix_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_matrix_lock = threading.Lock()
+
+
+def qr_matrix(qr_data, error_correction='H'):
+    """Module matrix for qr_data as a tuple of rows of bools, without a quiet zone
+
+    error_correction is one of 'L', 'M', 'Q' or 'H'. The smallest version
+    that fits is used.
+    """
+    key = (qr_data, error_correction)
+    with _matrix_lock:
+        modules = _matrix_cache.get(key)
+        if modules is not None:
+            _matrix_cache.move_to_end(key)
+            return modules
+
+    import qrcode
+
+    qr = qrcode.QRCode(
+        error_correction=getattr(qrcode.constants, f'ERROR_CORRECT_{error_correction}'),
+        border=0,
+    )
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    modules = tuple(tuple(bool(module) for module in row) for row in qr.modules)
+    with _matrix_lock:
+        _matrix_cache[key] = modules
+        while len(_matrix_cache) > QR_MATRIX_CACHE_SIZE:
+            _matrix_cache.popitem(last=False)
+    return modules
+
+
+def rasterize_qr(modules, size, fill_color='black', back_color='white'):
+    """size x size RGB image of the matrix, every module a whole number of pixels
+
+    The modules are scaled with nearest-neighbour sampling, so edges stay hard
+    with no grey fringe. Pixels left over after the largest whole module size
+    are split evenly as margin in back_color.
+    """
+    from PIL import Image, ImageColor
+
+    count = len(modules)
+    module_size = max(1, size // count)
+    fill = ImageColor.getrgb(fill_color) if isinstance(fill_color, str) else tuple(fill_color)
+    back = ImageColor.getrgb(back_color) if isinstance(back_color, str) else tuple(back_color)
+
+    # One byte per module indexing a two-colour palette
+    matrix = Image.frombytes('P', (count, count), bytes(0 if dark else 1 for row in modules for dark in row))
+    matrix.putpalette(fill + back)
+    code = matrix.resize((count * module_size, count * module_size), Image.Resampling.NEAREST).convert('RGB')
+    if code.width == size:
+        return code
+    image = Image.new('RGB', (size, size), back)
+    offset = (size - code.width) // 2
+    image.paste(code, (offset, offset))
+    return image
+
+
+# QR Code Themes - Enhanced with more vibrant colors
+QR_THEMES = {
+    'ethcc': {
+        'bg_colors': [(0, 155, 208), (42, 206, 204)],  # ETHCC blue/teal
+        'pattern': 'ethcc',
+        'qr_colors': [(255, 255, 255), (255, 147, 91)]  # White and light orange
+    }
+}
+
+
+def create_gradient_background(width, height, colors):
+    """Create a gradient background"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(image)
+    
+    color1, color2 = colors
+    for y in range(height):
+        ratio = y / height
+        r = int(color1[0] * (1 - ratio) + color2[0] * ratio)
+        g = int(color1[1] * (1 - ratio) + color2[1] * ratio)
+        b = int(color1[2] * (1 - ratio) + color2[2] * ratio)
+        draw.line([(0, y), (width, y)], fill=(r, g, b))
+    
+    return image
+
+
+def add_pattern_overlay(image, pattern_type, opacity=30):
+    """Add decorative patterns to background"""
+    from PIL import Image, ImageDraw
+
+    width, height = image.size
+    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    
+    if pattern_type == 'tech':
+        # Add circuit-like patterns
+        for _ in range(20):
+            x = random.randint(0, width)
+            y = random.randint(0, height)
+            size = random.randint(10, 30)
+            draw.ellipse([x, y, x+size, y+size], outline=(255, 255, 255, opacity))
+    
+    elif pattern_type == 'crypto':
+        # Add diamond/crystal patterns
+        for _ in range(15):
+            x = random.randint(0, width-40)
+            y = random.randint(0, height-40)
+            points = [(x+20, y), (x+40, y+20), (x+20, y+40), (x, y+20)]
+            draw.polygon(points, outline=(255, 255, 255, opacity))
+    
+    elif pattern_type == 'waves':
+        # Add wave patterns
+        for i in range(0, width, 50):
+            points = []
+            for x in range(i, min(i+100, width), 10):
+                y = height//2 + 30 * math.sin(x * 0.1)
+                points.append((x, int(y)))
+            if len(points) > 1:
+                for j in range(len(points)-1):
+                    draw.line([points[j], points[j+1]], fill=(255, 255, 255, opacity), width=2)
+    
+    elif pattern_type == 'geometric':
+        # Add geometric shapes
+        for _ in range(25):
+            x = random.randint(0, width-30)
+            y = random.randint(0, height-30)
+            if random.choice([True, False]):
+                draw.rectangle([x, y, x+20, y+20], outline=(255, 255, 255, opacity))
+            else:
+                draw.ellipse([x, y, x+20, y+20], outline=(255, 255, 255, opacity))
+    
+    image = Image.alpha_composite(image.convert('RGBA'), overlay)
+    return image.convert('RGB')
+
+
+def create_enhanced_gradient_background(width, height, colors, rng=random):
+    """Create an enhanced gradient background with multiple layers"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(image)
+    
+    # Create multiple gradient layers for richer colors
+    color1, color2 = colors
+    
+    # Main gradient
+    for y in range(height):
+        ratio = y / height
+        # Add some curve to the gradient for more visual interest
+        curve_ratio = 0.5 * (1 + math.sin(math.pi * (ratio - 0.5)))
+        
+        r = int(color1[0] * (1 - curve_ratio) + color2[0] * curve_ratio)
+        g = int(color1[1] * (1 - curve_ratio) + color2[1] * curve_ratio)
+        b = int(color1[2] * (1 - curve_ratio) + color2[2] * curve_ratio)
+        
+        # Add slight variation for depth
+        r = max(0, min(255, r + rng.randint(-10, 10)))
+        g = max(0, min(255, g + rng.randint(-10, 10)))
+        b = max(0, min(255, b + rng.randint(-10, 10)))
+        
+        draw.line([(0, y), (width, y)], fill=(r, g, b))
+    
+    # Add diagonal gradient overlay for more depth
+    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    overlay_draw = ImageDraw.Draw(overlay)
+    
+    for x in range(width):
+        ratio = x / width
+        alpha = int(30 * math.sin(math.pi * ratio))  # Subtle overlay
+        overlay_draw.line([(x, 0), (x, height)], fill=(255, 255, 255, alpha))
+    
+    image = Image.alpha_composite(image.convert('RGBA'), overlay)
+    return image.convert('RGB')
+
+
+def add_enhanced_pattern_overlay(image, pattern_type, opacity=40, rng=random):
+    """Add enhanced decorative patterns to background"""
+    from PIL import Image, ImageDraw
+
+    width, height = image.size
+    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    
+    if pattern_type == 'tech':
+        # Enhanced tech patterns with circuit-like designs
+        for _ in range(30):
+            x = rng.randint(0, width-60)
+            y = rng.randint(0, height-60)
+            size = rng.randint(15, 40)
+            
+            # Circuit nodes
+            draw.ellipse([x, y, x+size, y+size], outline=(255, 255, 255, opacity))
+            
+            # Connecting lines
+            if rng.choice([True, False]):
+                line_length = rng.randint(30, 80)
+                if rng.choice([True, False]):  # Horizontal
+                    draw.line([(x+size, y+size//2), (x+size+line_length, y+size//2)], 
+                             fill=(255, 255, 255, opacity//2), width=2)
+                else:  # Vertical
+                    draw.line([(x+size//2, y+size), (x+size//2, y+size+line_length)], 
+                             fill=(255, 255, 255, opacity//2), width=2)
+    
+    elif pattern_type == 'ethcc':
+        # ETHCC inspired pattern with triangular elements like the logo
+        for _ in range(25):
+            x = rng.randint(0, width-70)
+            y = rng.randint(0, height-70)
+            size = rng.randint(30, 60)
+            
+            # Create triangular shapes inspired by ETHCC logo
+            if rng.choice([True, False]):
+                # Upward pointing triangle (like top of logo)
+                points = [(x+size//2, y), (x+size, y+size), (x, y+size)]
+                draw.polygon(points, outline=(255, 255, 255, opacity), width=2)
+            else:
+                # Downward pointing triangle (like bottom of logo)
+                points = [(x, y), (x+size, y), (x+size//2, y+size)]
+                draw.polygon(points, outline=(255, 255, 255, opacity), width=2)
+                
+            # Add secondary shape for more complex pattern
+            x_offset = rng.randint(-20, 20)
+            y_offset = rng.randint(-20, 20)
+            smaller_size = size // 2
+            
+            if rng.choice([True, False, False]):  # Less frequently
+                # Add hexagon shape (inspired by Ethereum)
+                hex_size = smaller_size
+                hex_points = [
+                    (x+x_offset+hex_size//2, y+y_offset),
+                    (x+x_offset+hex_size, y+y_offset+hex_size//4),
+                    (x+x_offset+hex_size, y+y_offset+3*hex_size//4),
+                    (x+x_offset+hex_size//2, y+y_offset+hex_size),
+                    (x+x_offset, y+y_offset+3*hex_size//4),
+                    (x+x_offset, y+y_offset+hex_size//4)
+                ]
+                draw.polygon(hex_points, outline=(255, 255, 255, opacity//2), width=1)
+    
+    elif pattern_type == 'crypto':
+        # Enhanced crypto patterns with diamond crystals
+        for _ in range(20):
+            x = rng.randint(0, width-60)
+            y = rng.randint(0, height-60)
+            size = rng.randint(20, 50)
+            
+            # Diamond shape
+            points = [(x+size//2, y), (x+size, y+size//2), (x+size//2, y+size), (x, y+size//2)]
+            draw.polygon(points, outline=(255, 255, 255, opacity), width=2)
+            
+            # Inner diamond
+            inner_offset = size // 4
+            inner_points = [(x+size//2, y+inner_offset), (x+size-inner_offset, y+size//2), 
+                          (x+size//2, y+size-inner_offset), (x+inner_offset, y+size//2)]
+            draw.polygon(inner_points, outline=(255, 255, 255, opacity//2))
+    
+    elif pattern_type == 'waves':
+        # Enhanced wave patterns
+        wave_count = 8
+        for i in range(wave_count):
+            amplitude = rng.randint(20, 40)
+            frequency = rng.uniform(0.02, 0.05)
+            phase = rng.uniform(0, 2 * math.pi)
+            y_offset = (height // wave_count) * i
+            
+            points = []
+            for x in range(0, width, 5):
+                y = y_offset + amplitude * math.sin(frequency * x + phase)
+                points.append((x, int(y)))
+            
+            for j in range(len(points)-1):
+                draw.line([points[j], points[j+1]], fill=(255, 255, 255, opacity//2), width=3)
+    
+    elif pattern_type == 'geometric':
+        # Enhanced geometric patterns
+        for _ in range(35):
+            x = rng.randint(0, width-40)
+            y = rng.randint(0, height-40)
+            size = rng.randint(15, 35)
+            shape_type = rng.choice(['rect', 'circle', 'triangle'])
+            
+            if shape_type == 'rect':
+                draw.rectangle([x, y, x+size, y+size], outline=(255, 255, 255, opacity), width=2)
+            elif shape_type == 'circle':
+                draw.ellipse([x, y, x+size, y+size], outline=(255, 255, 255, opacity), width=2)
+            else:  # triangle
+                points = [(x+size//2, y), (x+size, y+size), (x, y+size)]
+                draw.polygon(points, outline=(255, 255, 255, opacity), width=2)
+    
+    elif pattern_type == 'nature':
+        # Nature-inspired patterns for forest theme
+        for _ in range(25):
+            x = rng.randint(0, width-50)
+            y = rng.randint(0, height-50)
+            
+            # Draw leaf-like shapes
+            size = rng.randint(20, 40)
+            # Leaf outline
+            points = [(x, y+size//2), (x+size//4, y), (x+size//2, y+size//4), 
+                     (x+3*size//4, y), (x+size, y+size//2), (x+3*size//4, y+size),
+                     (x+size//2, y+3*size//4), (x+size//4, y+size)]
+            
+            draw.polygon(points, outline=(255, 255, 255, opacity//2))
+    
+    else:  # clean/minimal
+        # Subtle dot pattern for minimal theme
+        for _ in range(40):
+            x = rng.randint(0, width)
+            y = rng.randint(0, height)
+            size = rng.randint(2, 6)
+            draw.ellipse([x, y, x+size, y+size], fill=(255, 255, 255, opacity//3))
+    
+    image = Image.alpha_composite(image.convert('RGBA'), overlay)
+    return image.convert('RGB')
+
+
+def add_decorative_elements(draw, size, theme_config):
+    """Add sophisticated decorative elements to the QR code"""
+    # Enhanced corner decorations with theme-specific styling
+    corner_size = int(size * 0.06)  # Proportional to canvas size
+    line_width = max(3, int(size * 0.004))
+    
+    # Corner positions with better spacing
+    margin = int(size * 0.03)
+    corners = [
+        (margin, margin),  # Top-left
+        (size - margin - corner_size, margin),  # Top-right
+        (margin, size - margin - corner_size),  # Bottom-left
+        (size - margin - corner_size, size - margin - corner_size)  # Bottom-right
+    ]
+    
+    for i, (x, y) in enumerate(corners):
+        # Create different corner styles based on theme
+        if theme_config.get('pattern') == 'ethcc':
+            # ETHCC style corners with triangular elements
+            if i == 0:  # Top-left
+                # Create a triangular corner decoration
+                triangle_points = [
+                    (x, y),
+                    (x + corner_size, y),
+                    (x, y + corner_size)
+                ]
+                draw.polygon(triangle_points, outline=(255, 255, 255, 200), width=line_width)
+                # Inner detail
+                smaller_size = corner_size // 2
+                smaller_triangle = [
+                    (x + 4, y + 4),
+                    (x + smaller_size, y + 4),
+                    (x + 4, y + smaller_size)
+                ]
+                draw.polygon(smaller_triangle, outline=(255, 255, 255, 150), width=line_width//2)
+            elif i == 1:  # Top-right
+                # Create a triangular corner decoration
+                triangle_points = [
+                    (x + corner_size, y),
+                    (x + corner_size, y + corner_size),
+                    (x, y)
+                ]
+                draw.polygon(triangle_points, outline=(255, 255, 255, 200), width=line_width)
+                # Inner detail
+                smaller_size = corner_size // 2
+                smaller_triangle = [
+                    (x + corner_size - 4, y + 4),
+                    (x + corner_size - 4, y + smaller_size),
+                    (x + corner_size - smaller_size, y + 4)
+                ]
+                draw.polygon(smaller_triangle, outline=(255, 255, 255, 150), width=line_width//2)
+            elif i == 2:  # Bottom-left
+                # Create a triangular corner decoration
+                triangle_points = [
+                    (x, y + corner_size),
+                    (x + corner_size, y + corner_size),
+                    (x, y)
+                ]
+                draw.polygon(triangle_points, outline=(255, 255, 255, 200), width=line_width)
+                # Inner detail
+                smaller_size = corner_size // 2
+                smaller_triangle = [
+                    (x + 4, y + corner_size - 4),
+                    (x + smaller_size, y + corner_size - 4),
+                    (x + 4, y + corner_size - smaller_size)
+                ]
+                draw.polygon(smaller_triangle, outline=(255, 255, 255, 150), width=line_width//2)
+            else:  # Bottom-right
+                # Create a triangular corner decoration
+                triangle_points = [
+                    (x + corner_size, y),
+                    (x + corner_size, y + corner_size),
+                    (x, y + corner_size)
+                ]
+                draw.polygon(triangle_points, outline=(255, 255, 255, 200), width=line_width)
+                # Inner detail
+                smaller_size = corner_size // 2
+                smaller_triangle = [
+                    (x + corner_size - 4, y + corner_size - 4),
+                    (x + corner_size - 4, y + corner_size - smaller_size),
+                    (x + corner_size - smaller_size, y + corner_size - 4)
+                ]
+                draw.polygon(smaller_triangle, outline=(255, 255, 255, 150), width=line_width//2)
+        elif theme_config.get('pattern') in ['tech', 'crypto']:
+            # Tech/crypto: Square corners with inner details
+            draw.rectangle([x, y, x + corner_size, y + corner_size], 
+                         outline=(255, 255, 255, 200), width=line_width)
+            # Inner square
+            inner_margin = corner_size // 4
+            draw.rectangle([x + inner_margin, y + inner_margin, 
+                          x + corner_size - inner_margin, y + corner_size - inner_margin], 
+                         outline=(255, 255, 255, 150), width=line_width//2)
+        else:
+            # Other themes: Circular corners
+            draw.ellipse([x, y, x + corner_size, y + corner_size], 
+                        outline=(255, 255, 255, 200), width=line_width)
+            # Inner circle
+            inner_margin = corner_size // 4
+            draw.ellipse([x + inner_margin, y + inner_margin, 
+                         x + corner_size - inner_margin, y + corner_size - inner_margin], 
+                        outline=(255, 255, 255, 150), width=line_width//2)
+    
+    # Add subtle border frame - customized by theme
+    frame_margin = int(size * 0.01)
+    if theme_config.get('pattern') == 'ethcc':
+        # For ETHCC, add a border frame with triangular corners
+        # Draw border lines
+        line_width = 3
+        # Top line
+        draw.line([(frame_margin + corner_size, frame_margin), 
+                  (size - frame_margin - corner_size, frame_margin)], 
+                 fill=(255, 255, 255, 100), width=line_width)
+        # Right line
+        draw.line([(size - frame_margin, frame_margin + corner_size), 
+                  (size - frame_margin, size - frame_margin - corner_size)], 
+                 fill=(255, 255, 255, 100), width=line_width)
+        # Bottom line
+        draw.line([(frame_margin + corner_size, size - frame_margin), 
+                  (size - frame_margin - corner_size, size - frame_margin)], 
+                 fill=(255, 255, 255, 100), width=line_width)
+        # Left line
+        draw.line([(frame_margin, frame_margin + corner_size), 
+                  (frame_margin, size - frame_margin - corner_size)], 
+                 fill=(255, 255, 255, 100), width=line_width)
+    else:
+        # Standard border for other themes
+        draw.rectangle([frame_margin, frame_margin, size - frame_margin, size - frame_margin], 
+                      outline=(255, 255, 255, 100), width=2)
+
+
+# Pixel memory the renders in one process may hold at once. The bot and each
+# API worker get their own budget; together they share the container's memory
+QR_RENDER_MEMORY_MB = int(os.getenv('QR_RENDER_MEMORY_MB', '64'))
+# Seconds a render waits for memory before giving up
+QR_RENDER_ADMISSION_TIMEOUT = float(os.getenv('QR_RENDER_ADMISSION_TIMEOUT', '30'))
+
+
+class RenderAdmission:
+    """Admits renders while their estimated pixel memory fits the budget.
+
+    Renders past the budget wait for earlier ones to finish, so a burst of
+    requests queues instead of spiking RSS. A single render larger than the
+    whole budget is admitted once it would run alone.
+    """
+
+    def __init__(self, budget_bytes: int = QR_RENDER_MEMORY_MB * 1024 * 1024,
+                 timeout: float = QR_RENDER_ADMISSION_TIMEOUT):
+        self.budget = budget_bytes
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self.in_use = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.admitted = 0
+        self.waited = 0
+        self.timed_out = 0
+
+    @contextmanager
+    def admit(self, nbytes: int) -> Iterator[None]:
+        nbytes = min(nbytes, self.budget)
+        with self._condition:
+            if self.in_use + nbytes > self.budget:
+                self.waited += 1
+                if not self._condition.wait_for(lambda: self.in_use + nbytes <= self.budget, self.timeout):
+                    self.timed_out += 1
+                    raise TimeoutError(f"No render memory free after {self.timeout}s")
+            self.in_use += nbytes
+            self.in_flight += 1
+            self.admitted += 1
+            self.peak = max(self.peak, self.in_use)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_use -= nbytes
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'budget_mb': round(self.budget / 1024 / 1024, 1),
+                'in_use_mb': round(self.in_use / 1024 / 1024, 1),
+                'peak_mb': round(self.peak / 1024 / 1024, 1),
+                'in_flight': self.in_flight,
+                'admitted': self.admitted,
+                'waited': self.waited,
+                'timed_out': self.timed_out,
+            }
+
+
+render_admission = RenderAdmission()
+
+
+def render_bytes(width, height):
+    """Estimated peak pixel memory of one render at width x height
+
+    The RGB output (Pillow keeps 4 bytes per pixel) plus as much again for
+    the code, text sprites and the caller's copy while encoding. Templates
+    compile once per process, inside the first render's allowance.
+    """
+    return width * height * 4 * 2
+
+
+# Themed backgrounds are jittered and patterned at random; a fixed seed makes
+# every template of a theme (and every process's copy) look the same
+THEME_TEMPLATE_SEED = 2025
+# (theme, size, with_event) variants kept; each is one full-size RGBA canvas
+THEME_TEMPLATE_CACHE_SIZE = 8
+# Shipped with the API so cards look the same everywhere, including the
+# Alpine image, which has no system fonts
+BUNDLED_FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts', 'DejaVuSans-Bold.ttf')
+FONT_PATHS = [
+    BUNDLED_FONT_PATH,
+    "/System/Library/Fonts/Helvetica.ttc",  # macOS
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",  # Linux
+    "arial.ttf",  # Windows
+]
+_template_cache: "OrderedDict[tuple, ThemeTemplate]" = OrderedDict()
+_template_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size):
+    """First available bold font from FONT_PATHS at size, or Pillow's default"""
+    from PIL import ImageFont
+
+    for font_path in FONT_PATHS:
+        try:
+            return ImageFont.truetype(font_path, size)
+        except (OSError, IOError):
+            continue
+    return ImageFont.load_default()
+
+
+# Rendered strings with their shadows; usernames repeat across themes and
+# re-renders, and labels such as "ETHCC" on every code
+TEXT_SPRITE_CACHE_SIZE = int(os.getenv('TEXT_SPRITE_CACHE_SIZE', '512'))
+_sprite_cache: "OrderedDict[tuple, TextSprite]" = OrderedDict()
+_sprite_lock = threading.Lock()
+
+
+class TextSprite(NamedTuple):
+    """A string rasterized once as masks, to be stamped onto cards"""
+    mask: Any  # L mask of the text
+    shadow: Any  # L mask of its drop shadow, or None
+    origin: Tuple[int, int]  # where the masks go relative to the ImageDraw.text() position
+    width: int  # text width, as textbbox() measures it
+
+
+def text_sprite(text, font, shadow_depth=0, shadow_opacity=160, shadow_blur=1):
+    """Masks for text in font, with a shadow extruded shadow_depth pixels down and right
+
+    The text goes through FreeType once. The shadow is the text mask offset
+    1..shadow_depth pixels, blurred and scaled to shadow_opacity.
+    """
+    key = (text, getattr(font, 'path', None) or id(font), getattr(font, 'size', None),
+           shadow_depth, shadow_opacity, shadow_blur)
+    with _sprite_lock:
+        sprite = _sprite_cache.get(key)
+        if sprite is not None:
+            _sprite_cache.move_to_end(key)
+            return sprite
+
+    from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+    left, top, right, bottom = font.getbbox(text)
+    # Room for the blur on all sides and the extrusion below and right
+    pad = 3 * shadow_blur if shadow_depth else 0
+    width = right - left + shadow_depth + 2 * pad
+    height = bottom - top + shadow_depth + 2 * pad
+    mask = Image.new('L', (width, height), 0)
+    ImageDraw.Draw(mask).text((pad - left, pad - top), text, font=font, fill=255)
+
+    shadow = None
+    if shadow_depth:
+        shadow = mask
+        for offset in range(1, shadow_depth + 1):
+            # The padding keeps the wrap-around of offset() empty
+            shadow = ImageChops.lighter(shadow, ImageChops.offset(mask, offset, offset))
+        if shadow_blur:
+            shadow = shadow.filter(ImageFilter.GaussianBlur(shadow_blur))
+        if shadow_opacity < 255:
+            shadow = shadow.point(lambda value: value * shadow_opacity // 255)
+
+    sprite = TextSprite(mask, shadow, (left - pad, top - pad), right - left)
+    with _sprite_lock:
+        _sprite_cache[key] = sprite
+        while len(_sprite_cache) > TEXT_SPRITE_CACHE_SIZE:
+            _sprite_cache.popitem(last=False)
+    return sprite
+
+
+def draw_text(image, xy, sprite, fill, shadow_color=(0, 0, 0)):
+    """Stamp a text_sprite() onto image where ImageDraw.text(xy) would have drawn it"""
+    box = (xy[0] + sprite.origin[0], xy[1] + sprite.origin[1])
+    alpha = (255,) if image.mode == 'RGBA' else ()
+    if sprite.shadow is not None:
+        image.paste(tuple(shadow_color[:3]) + alpha, box, sprite.shadow)
+    image.paste(tuple(fill[:3]) + alpha, box, sprite.mask)
+
+
+class ThemeTemplate(NamedTuple):
+    """A theme's static layers, ready for a user's code and name"""
+    image: Any  # RGB canvas; copy before drawing on it
+    qr_box: Tuple[int, int, int]  # x, y and size of the code on the backplate
+    username_font: Any
+    event_font: Any
+
+
+def compile_theme_template(theme='ethcc', size=1000, with_event=False):
+    """Render everything of a themed code that does not depend on the user
+
+    The gradient, pattern, QR backplate, corner decorations and the ETHCC
+    logo are drawn once, with a RNG seeded from THEME_TEMPLATE_SEED. The
+    backplate sits lower when an event name is printed above it.
+    """
+    from PIL import Image, ImageDraw
+
+    theme_config = QR_THEMES.get(theme, QR_THEMES['ethcc'])
+    rng = random.Random(f"{THEME_TEMPLATE_SEED}:{theme}:{size}")
+
+    # Create enhanced gradient background with the pattern overlay
+    bg = create_enhanced_gradient_background(size, size, theme_config['bg_colors'], rng=rng)
+    canvas = add_enhanced_pattern_overlay(bg, theme_config['pattern'], rng=rng).convert('RGBA')
+
+    # Calculate QR code size and position with better spacing
+    qr_size = int(size * 0.4)  # QR takes 40% of the shortest dimension
+    qr_x = (size - qr_size) // 2
+    
+    # Dynamic positioning based on whether event name exists
+    if with_event:
+        qr_y = int(size * 0.35)  # Lower position when event name exists
+    else:
+        qr_y = int(size * 0.28)  # Higher position when no event name, moved up to make room for username below
+    
+    # Create enhanced white background for QR with shadow effect
+    qr_bg_size = qr_size + 60
+    
+    # Add shadow: eight stacked translucent black layers, composited as one
+    shadow_offset = 8
+    transparency = 1.0
+    for i in range(shadow_offset):
+        transparency *= 1 - int(40 * (shadow_offset - i) / shadow_offset) / 255
+    qr_bg = Image.new('RGBA', (qr_bg_size, qr_bg_size), (0, 0, 0, round(255 * (1 - transparency))))
+    
+    # Add white background with rounded corners effect
+    white_bg = Image.new('RGBA', (qr_bg_size, qr_bg_size), (255, 255, 255, 250))
+    qr_bg.paste(white_bg, (0, 0), white_bg)
+    canvas.paste(qr_bg, (qr_x - 30, qr_y - 30), qr_bg)
+    
+    draw = ImageDraw.Draw(canvas)
+    # INCREASED FONT SIZES for better visibility
+    username_font = load_font(72)
+    event_font = load_font(60)
+    
+    # Add decorative elements
+    add_decorative_elements(draw, size, theme_config)
+    
+    # Add ETHCC logo in top right corner if theme is 'ethcc'
+    if theme == 'ethcc':
+        # Define the logo size - make it prominent but not overwhelming
+        logo_size = int(size * 0.2)  # 20% of the canvas width
+        
+        # Create a simplified ETHCC logo using triangular shapes
+        # Top triangle (blue)
+        logo_x = int(size * 0.75)  # Position in top right area
+        logo_y = int(size * 0.1)  # Position in top right area
+        
+        # Triangle dimensions
+        triangle_height = int(logo_size * 0.8)
+        triangle_width = int(logo_size * 0.8)
+        
+        # Draw the triangular logo inspired by ETHCC
+        # Top triangle (blue)
+        top_triangle = [
+            (logo_x + triangle_width//2, logo_y),
+            (logo_x + triangle_width, logo_y + triangle_height),
+            (logo_x, logo_y + triangle_height)
+        ]
+        draw.polygon(top_triangle, fill=(0, 155, 208, 220))  # ETHCC blue
+        
+        # Bottom triangle (teal)
+        bottom_triangle = [
+            (logo_x, logo_y + triangle_height - triangle_height//3),
+            (logo_x + triangle_width, logo_y + triangle_height - triangle_height//3),
+            (logo_x + triangle_width//2, logo_y + triangle_height*2 - triangle_height//3)
+        ]
+        draw.polygon(bottom_triangle, fill=(42, 206, 204, 220))  # ETHCC teal
+        
+        # Add logo outline for better visibility
+        draw.line(top_triangle + [top_triangle[0]], fill=(255, 255, 255, 180), width=3)
+        draw.line(bottom_triangle + [bottom_triangle[0]], fill=(255, 255, 255, 180), width=3)
+        
+        # Add "ETHCC" text below logo if space allows
+        if not with_event:
+            ethcc_text = text_sprite("ETHCC", username_font, shadow_depth=3, shadow_opacity=100)
+            ethcc_x = logo_x + triangle_width//2 - ethcc_text.width//2
+            ethcc_y = logo_y + triangle_height*2 + 10
+            
+            # Draw ETHCC text with shadow
+            draw_text(canvas, (ethcc_x, ethcc_y), ethcc_text, fill=(255, 255, 255))
+
+    return ThemeTemplate(canvas.convert('RGB'), (qr_x, qr_y, qr_size), username_font, event_font)
+
+
+def _cached_template(key, compile_template, *args):
+    with _template_lock:
+        template = _template_cache.get(key)
+        if template is not None:
+            _template_cache.move_to_end(key)
+            return template
+    template = compile_template(*args)
+    with _template_lock:
+        _template_cache[key] = template
+        while len(_template_cache) > THEME_TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
+    return template
+
+
+def theme_template(theme='ethcc', size=1000, with_event=False):
+    """compile_theme_template, compiled once per variant and kept in an LRU"""
+    return _cached_template((theme, size, bool(with_event)), compile_theme_template, theme, size, bool(with_event))
+
+
+def create_themed_qr(qr_data, username, event_name=None, theme='ethcc', size=1000):
+    """Create a themed QR code with username and optional event name"""
+    try:
+        with render_admission.admit(render_bytes(size, size)):
+            return _render_themed_qr(qr_data, username, event_name, theme, size)
+    except Exception as e:
+        logger.error(f"Error creating themed QR code: {e}")
+        return None
+
+
+def _render_themed_qr(qr_data, username, event_name, theme, size):
+    template = theme_template(theme, size, with_event=bool(event_name))
+    qr_x, qr_y, qr_size = template.qr_box
+    # The only full-size buffer a render allocates; everything else is stamped into it
+    canvas = template.image.copy()
+    
+    # High error correction for better design
+    canvas.paste(rasterize_qr(qr_matrix(qr_data, 'H'), qr_size), (qr_x, qr_y))
+    
+    # Add event name at top with better positioning
+    if event_name:
+        # Enhanced text shadow
+        event_text = text_sprite(f"🎪 {event_name.upper()}", template.event_font,
+                                 shadow_depth=4, shadow_opacity=120)
+        event_x = (size - event_text.width) // 2
+        event_y = int(size * 0.08)  # Top positioning with percentage
+        draw_text(canvas, (event_x, event_y), event_text, fill=(255, 255, 255))
+    
+    # Add username BELOW the QR code with improved visibility
+    username_text = f"@{username}" if not username.startswith('@') else username
+    # Enhanced username text shadow for better readability
+    username_text = text_sprite(username_text, template.username_font, shadow_depth=4, shadow_opacity=160)
+    username_x = (size - username_text.width) // 2
+    
+    # Position username just below the QR code, with small padding
+    username_y = qr_y + qr_size + 18  # 18px padding below QR code
+    draw_text(canvas, (username_x, username_y), username_text, fill=(255, 255, 255))
+    return canvas
+
+
+class CardTemplate(NamedTuple):
+    """The card background with its glass container, ready for a user's code and name"""
+    image: Any  # RGB card; copy before drawing on it
+    qr_box: Tuple[int, int, int]  # x, y and size of the code
+    container_box: Tuple[int, int]  # x and width of the container the name is centred in
+
+
+def compile_card_template(size=(1200, 675)):
+    """Load and scale the card background and draw the glass container on it, once per size"""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    # Load background image
+    try:
+        with Image.open(CARD_BACKGROUND_PATH) as source:
+            # Resize background to fit card size while maintaining aspect ratio
+            card = source.convert('RGB').resize(size, Image.Resampling.LANCZOS)
+    except Exception as e:
+        logger.error(f"Failed to load background image: {e}")
+        # Create fallback gradient background
+        card = Image.new('RGB', size, (14, 165, 233))
+        draw = ImageDraw.Draw(card)
+        for y in range(size[1]):
+            ratio = y / size[1]
+            r = int(14 * (1 - ratio) + 42 * ratio)
+            g = int(165 * (1 - ratio) + 206 * ratio)
+            b = int(233 * (1 - ratio) + 204 * ratio)
+            draw.line([(0, y), (size[0], y)], fill=(r, g, b))
+    
+    # Calculate QR code size and position (centered)
+    qr_size = int(min(size) * 0.42)  # QR takes about 42% of the shortest dimension
+    
+    # Make the container bigger relative to QR
+    qr_container_width = int(qr_size * 1.5)
+    qr_container_height = int(qr_size * 1.5)
+    
+    # Calculate QR container position (centered)
+    container_x = (size[0] - qr_container_width) // 2
+    container_y = (size[1] - qr_container_height) // 2
+    
+    # Create translucent white container with rounded corners
+    container = Image.new('RGBA', (qr_container_width, qr_container_height), (255, 255, 255, 0))
+    mask = Image.new('L', (qr_container_width, qr_container_height), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    radius = 40  # corner radius
+    mask_draw.rounded_rectangle([0, 0, qr_container_width, qr_container_height], radius=radius, fill=255)
+    # Fill the rounded rectangle with semi-transparent white
+    box = Image.new('RGBA', (qr_container_width, qr_container_height), (255, 255, 255, 170))
+    container = Image.composite(box, container, mask)
+    # Add blurry effect to the box
+    blurred = container.filter(ImageFilter.GaussianBlur(radius=12))
+    # Overlay the blurred box and then the main container for a glassy effect
+    card.paste(blurred, (container_x, container_y), blurred)
+    card.paste(container, (container_x, container_y), container)
+    
+    # Calculate QR position within container (centered horizontally, higher vertically)
+    qr_x = container_x + (qr_container_width - qr_size) // 2
+    qr_y = container_y + (qr_container_height - qr_size) // 3  # Place higher to leave room for text
+    return CardTemplate(card, (qr_x, qr_y, qr_size), (container_x, qr_container_width))
+
+
+def card_template(size=(1200, 675)):
+    """compile_card_template, compiled once per size and kept in an LRU"""
+    return _cached_template(('card', tuple(size)), compile_card_template, tuple(size))
+
+
+def create_card_style_qr(qr_data, username, size=(1200, 675), qr_color=(0, 0, 0)):
+    """Create a card-style QR code with ethglobal.png as background
+    
+    Args:
+        qr_data: Data to encode in QR
+        username: Telegram username to display
+        size: Card size in pixels (width, height) - default 1200x675 (16:9 aspect ratio)
+        qr_color: RGB tuple for QR code color (default: ETH Cannes blue)
+        
+    Returns:
+        PIL.Image: Card image with QR code
+    """
+    try:
+        with render_admission.admit(render_bytes(*size)):
+            return _render_card_style_qr(qr_data, username, size, qr_color)
+    except Exception as e:
+        logger.error(f"Card QR generation failed: {e}")
+        return None
+
+
+def _render_card_style_qr(qr_data, username, size, qr_color):
+    template = card_template(size)
+    qr_x, qr_y, qr_size = template.qr_box
+    container_x, qr_container_width = template.container_box
+    # The only full-size buffer a render allocates; everything else is stamped into it
+    card = template.image.copy()
+    
+    # Paste QR code onto card, with high error correction for better design
+    card.paste(rasterize_qr(qr_matrix(qr_data, 'H'), qr_size, fill_color=qr_color), (qr_x, qr_y))
+    
+    # Add username text below QR code
+    username_font = load_font(44)  # Smaller font size
+    
+    # Format the username
+    if username:
+        username_text = f"@{username}" if not username.startswith('@') else username
+        # Add subtle shadow for better readability
+        username_text = text_sprite(username_text, username_font, shadow_depth=3, shadow_opacity=120)
+        
+        # Position username just below the QR code, with a bit more padding
+        username_x = container_x + (qr_container_width - username_text.width) // 2
+        username_y = qr_y + qr_size + 32  # 32px padding below QR code
+        draw_text(card, (username_x, username_y), username_text, fill=qr_color)
+    return card
+
+
+def warm_up():
+    """Render one card and one ETHCC code so Pillow, qrcode, the fonts and both
+    templates are loaded before the first QR request"""
+    create_card_style_qr(deep_link('linkup_bot', 0), 'LinkUp')
+    create_themed_qr(deep_link('linkup_bot', 0), 'LinkUp')
+
+
+def basic_qr_image(qr_data):
+    """Plain black-on-white QR code, the fallback when a card cannot be drawn"""
+    import qrcode
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white")
+
+
+def generate_qr_code_image(tg_id, size=300):
+    """Generate QR code image for a given Telegram user ID - can be used by webapp API"""
+    try:
+        # Create QR code with Telegram deep link format
+        return basic_qr_image(start_payload(tg_id))
+    except Exception as e:
+        logger.error(f"QR code generation failed: {e}")
+        return None
+
+
+def qr_matrix_to_svg(modules, fill_color='#000000', back_color='#ffffff', border=4):
+    """Compact SVG for a QR module matrix
+
+    Each horizontal run of dark modules is one relative subpath in a single
+    <path>, in module units, so the markup stays around 1KB and scales crisply.
+    """
+    size = len(modules) + 2 * border
+    runs = []
+    last_x, last_y = 0, 0
+    for y, row in enumerate(modules):
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            # After "z" the pen is back at the start of the previous run
+            runs.append(f"m{start + border - last_x} {y + border - last_y}v1h{x - start}v-1z")
+            last_x, last_y = start + border, y + border
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="{back_color}"/>'
+        f'<path fill="{fill_color}" d="{"".join(runs)}"/></svg>'
+    )
+
+
+def generate_qr_code_svg(tg_id, fill_color='#000000'):
+    """Same code as generate_qr_code_image, as SVG markup for the webapp"""
+    try:
+        return qr_matrix_to_svg(qr_matrix(start_payload(tg_id), 'L'), fill_color=fill_color)
+    except Exception as e:
+        logger.error(f"QR SVG generation failed: {e}")
+        return None
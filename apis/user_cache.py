@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sentinel distinguishing "not cached" from a cached value
+_MISSING = object()
+
+# Longest TTL of a local cache in one of several API processes (gunicorn
+# workers, or the bot on the in-process transport). A write only invalidates
+# the process that handled it, so the others serve the old row, and its ETag,
+# until their copy expires.
+USER_CACHE_MULTI_PROCESS_TTL = float(os.getenv('USER_CACHE_MULTI_PROCESS_TTL', '2'))
+
+
+def default_ttl() -> float:
+    """USER_CACHE_TTL, capped while several processes keep local caches"""
+    ttl = float(os.getenv('USER_CACHE_TTL', '60'))
+    shared = os.getenv('USER_CACHE_BACKEND', 'local') != 'local'
+    if int(os.getenv('API_PROCESSES', '1')) > 1 and not shared:
+        ttl = min(ttl, USER_CACHE_MULTI_PROCESS_TTL)
+    return ttl
+
+
+class CacheBackend(ABC):
+    """Storage interface for the user cache.
+
+    The local backend keeps entries in this process only. Multi-worker
+    deployments can register a shared backend (e.g. Redis/memcached) with
+    ``register_cache_backend`` and select it with ``USER_CACHE_BACKEND``.
+    """
+
+    @abstractmethod
+    def get(self, key: Tuple) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: Tuple, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: Tuple) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class LocalCacheBackend(CacheBackend):
+    """In-process LRU store with a per-entry TTL"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Tuple) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Tuple, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Tuple) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': 'local',
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+_BACKENDS: Dict[str, Callable[[], CacheBackend]] = {
+    'local': lambda: LocalCacheBackend(int(os.getenv('USER_CACHE_MAX_ENTRIES', '10000'))),
+}
+
+
+def register_cache_backend(name: str, factory: Callable[[], CacheBackend]) -> None:
+    """Register a backend factory selectable through USER_CACHE_BACKEND"""
+    _BACKENDS[name] = factory
+
+
+def create_cache_backend(name: str = None) -> CacheBackend:
+    """Build the configured backend, falling back to the local stand-in"""
+    name = name or os.getenv('USER_CACHE_BACKEND', 'local')
+    factory = _BACKENDS.get(name)
+    if factory is None:
+        logger.warning(f"Unknown user cache backend '{name}', using local cache")
+        factory = _BACKENDS['local']
+    return factory()
+
+
+class _Flight:
+    """A load in progress that concurrent readers can wait on"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class UserCache:
+    """Read-through cache for user rows, keyed by tg_id and user_id.
+
+    Concurrent misses for the same key are coalesced so only one request
+    goes to MySQL; the others wait for its result.
+    """
+
+    def __init__(self, backend: CacheBackend = None, ttl: float = None, load_timeout: float = 10.0):
+        self.backend = backend or create_cache_backend()
+        self.ttl = ttl if ttl is not None else default_ttl()
+        self.load_timeout = load_timeout
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple, _Flight] = {}
+        self._async_inflight: Dict[Tuple, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get_by_tg_id(self, tg_id: int, loader: Callable[[int], Optional[Dict]]) -> Optional[Dict]:
+        """Return the user row for a Telegram ID, loading it on a miss"""
+        return self._get(('tg', int(tg_id)), lambda: loader(int(tg_id)))
+
+    def get_by_user_id(self, user_id: int, loader: Callable[[int], Optional[Dict]]) -> Optional[Dict]:
+        """Return the user row for a database user_id, loading it on a miss"""
+        return self._get(('id', int(user_id)), lambda: loader(int(user_id)))
+
+    async def aget_by_tg_id(self, tg_id: int, loader: Callable[[int], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """Async variant of get_by_tg_id for the ASGI server"""
+        return await self._aget(('tg', int(tg_id)), lambda: loader(int(tg_id)))
+
+    async def aget_by_user_id(self, user_id: int, loader: Callable[[int], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """Async variant of get_by_user_id for the ASGI server"""
+        return await self._aget(('id', int(user_id)), lambda: loader(int(user_id)))
+
+    def invalidate(self, user_id: int = None, tg_id: int = None) -> None:
+        """Drop every cached entry for a user"""
+        keys = set()
+        if user_id is not None:
+            keys.add(('id', int(user_id)))
+            cached = self.backend.get(('id', int(user_id)))
+            if cached is not _MISSING and cached:
+                keys.add(('tg', int(cached['tg_id'])))
+        if tg_id is not None:
+            keys.add(('tg', int(tg_id)))
+            cached = self.backend.get(('tg', int(tg_id)))
+            if cached is not _MISSING and cached:
+                keys.add(('id', int(cached['user_id'])))
+        with self._lock:
+            # Loads that started before this point must not repopulate the cache
+            self._generation += 1
+            self.invalidations += 1
+        for key in keys:
+            self.backend.delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'enabled': self.enabled,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'loads': self.loads,
+                'load_errors': self.load_errors,
+                'coalesced': self.coalesced,
+                'invalidations': self.invalidations,
+                'inflight': len(self._inflight),
+            }
+        stats.update(self.backend.stats())
+        return stats
+
+    def _get(self, key: Tuple, load: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+        if not self.enabled:
+            return load()
+
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.misses += 1
+                generation = self._generation
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Another request is already loading this key; share its result
+            if flight.done.wait(self.load_timeout) and flight.error is None:
+                return flight.value
+            return load()
+
+        try:
+            with self._lock:
+                self.loads += 1
+            flight.value = load()
+            if flight.value:
+                with self._lock:
+                    stale = generation != self._generation
+                if not stale:
+                    self._store(flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.load_errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    async def _aget(self, key: Tuple, load: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        if not self.enabled:
+            return await load()
+
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        # Everything below runs on one event loop, so the in-flight map needs no lock
+        flight = self._async_inflight.get(key)
+        if flight is not None:
+            with self._lock:
+                self.coalesced += 1
+            return await asyncio.shield(flight)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._async_inflight[key] = flight
+        with self._lock:
+            self.misses += 1
+            self.loads += 1
+            generation = self._generation
+        try:
+            value = await load()
+            if value:
+                with self._lock:
+                    stale = generation != self._generation
+                if not stale:
+                    self._store(value)
+            flight.set_result(value)
+            return value
+        except Exception as e:
+            with self._lock:
+                self.load_errors += 1
+            flight.set_exception(e)
+            # Followers re-raise it; mark it retrieved for the leader
+            flight.exception()
+            raise
+        finally:
+            self._async_inflight.pop(key, None)
+            if not flight.done():
+                # Leader was cancelled; let followers fail instead of waiting forever
+                flight.cancel()
+
+    def _store(self, row: Dict) -> None:
+        if row.get('tg_id') is not None:
+            self.backend.set(('tg', int(row['tg_id'])), row, self.ttl)
+        if row.get('user_id') is not None:
+            self.backend.set(('id', int(row['user_id'])), row, self.ttl)
@@ -0,0 +1,80 @@
+import json
+import logging
+import mimetypes
+import os
+from typing import NamedTuple, Optional
+
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import safe_join
+
+logger = logging.getLogger(__name__)
+
+WEBAPP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'webapp')
+WEBAPP_DIST_DIR = os.getenv('WEBAPP_DIST_DIR', os.path.join(WEBAPP_DIR, 'dist'))
+
+# Fingerprinted names change whenever their content does
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Precompressed variants written by webapp/build.py, in order of preference
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+class WebappFile(NamedTuple):
+    directory: str
+    filename: str
+    mimetype: Optional[str]
+    encoding: Optional[str]
+    cache_control: str
+
+
+class WebappAssets:
+    """Locates webapp files, preferring the build in webapp/dist.
+
+    Without a build (local development) files come straight from webapp/
+    and every response is revalidated.
+    """
+
+    def __init__(self, source_dir: str = WEBAPP_DIR, dist_dir: str = WEBAPP_DIST_DIR):
+        self.source_dir = source_dir
+        self.dist_dir = dist_dir
+        self.manifest = self._load_manifest()
+        self.root = dist_dir if self.manifest else source_dir
+        self.fingerprinted = set(self.manifest.get('assets', {}).values())
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.dist_dir, 'manifest.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable webapp manifest: {e}")
+            return {}
+
+    @property
+    def built(self) -> bool:
+        return bool(self.manifest)
+
+    def resolve(self, filename: str, accept_encodings=None) -> WebappFile:
+        """The file to send for a webapp path; raises NotFound"""
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+        mimetype = mimetypes.guess_type(filename)[0]
+        cache_control = IMMUTABLE_CACHE_CONTROL if filename in self.fingerprinted else REVALIDATE_CACHE_CONTROL
+
+        if self.built and accept_encodings is not None:
+            for encoding, suffix in PRECOMPRESSED:
+                if accept_encodings[encoding] and os.path.isfile(path + suffix):
+                    return WebappFile(self.root, filename + suffix, mimetype, encoding, cache_control)
+        return WebappFile(self.root, filename, mimetype, None, cache_control)
+
+
+def finish_webapp_response(response, webapp_file: WebappFile):
+    """Headers shared by the Flask and Quart webapp routes"""
+    if webapp_file.encoding:
+        response.headers['Content-Encoding'] = webapp_file.encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = webapp_file.cache_control
+    return response
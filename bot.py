@@ -12,16 +12,15 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKe
 from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 from dotenv import load_dotenv
 from telegram_api import telegram_api, initialize_telegram_api, close_telegram_api
-from apis.api_client import api_client
-import qrcode
+from apis.api_client import api_client, APIUnavailable, ServiceBusy
+from apis.qr_render import QR_THEMES, create_themed_qr, create_card_style_qr, basic_qr_image, \
+    warm_up as warm_up_qr_rendering, deep_link, parse_qr_payload, START_PAYLOAD_PREFIXES
 import io
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
-import textwrap
-import random
-import math
 from typing import List, Dict
 import asyncio
+import functools
 import re
+import time
 
 load_dotenv()
 
@@ -37,580 +36,6 @@ def get_full_name(user):
         return full_name
     return f"User {user.id if hasattr(user, 'id') else 'Unknown'}"
 
-# QR Code Themes - Enhanced with more vibrant colors
-QR_THEMES = {
-    'ethcc': {
-        'bg_colors': [(0, 155, 208), (42, 206, 204)],  # ETHCC blue/teal
-        'pattern': 'ethcc',
-        'qr_colors': [(255, 255, 255), (255, 147, 91)]  # White and light orange
-    }
-}
-
-def create_gradient_background(width, height, colors):
-    """Create a gradient background"""
-    image = Image.new('RGB', (width, height))
-    draw = ImageDraw.Draw(image)
-    
-    color1, color2 = colors
-    for y in range(height):
-        ratio = y / height
-        r = int(color1[0] * (1 - ratio) + color2[0] * ratio)
-        g = int(color1[1] * (1 - ratio) + color2[1] * ratio)
-        b = int(color1[2] * (1 - ratio) + color2[2] * ratio)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
-    
-    return image
-
-def add_pattern_overlay(image, pattern_type, opacity=30):
-    """Add decorative patterns to background"""
-    width, height = image.size
-    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
-    
-    if pattern_type == 'tech':
-        # Add circuit-like patterns
-        for _ in range(20):
-            x = random.randint(0, width)
-            y = random.randint(0, height)
-            size = random.randint(10, 30)
-            draw.ellipse([x, y, x+size, y+size], outline=(255, 255, 255, opacity))
-    
-    elif pattern_type == 'crypto':
-        # Add diamond/crystal patterns
-        for _ in range(15):
-            x = random.randint(0, width-40)
-            y = random.randint(0, height-40)
-            points = [(x+20, y), (x+40, y+20), (x+20, y+40), (x, y+20)]
-            draw.polygon(points, outline=(255, 255, 255, opacity))
-    
-    elif pattern_type == 'waves':
-        # Add wave patterns
-        for i in range(0, width, 50):
-            points = []
-            for x in range(i, min(i+100, width), 10):
-                y = height//2 + 30 * math.sin(x * 0.1)
-                points.append((x, int(y)))
-            if len(points) > 1:
-                for j in range(len(points)-1):
-                    draw.line([points[j], points[j+1]], fill=(255, 255, 255, opacity), width=2)
-    
-    elif pattern_type == 'geometric':
-        # Add geometric shapes
-        for _ in range(25):
-            x = random.randint(0, width-30)
-            y = random.randint(0, height-30)
-            if random.choice([True, False]):
-                draw.rectangle([x, y, x+20, y+20], outline=(255, 255, 255, opacity))
-            else:
-                draw.ellipse([x, y, x+20, y+20], outline=(255, 255, 255, opacity))
-    
-    image = Image.alpha_composite(image.convert('RGBA'), overlay)
-    return image.convert('RGB')
-
-def create_enhanced_gradient_background(width, height, colors):
-    """Create an enhanced gradient background with multiple layers"""
-    image = Image.new('RGB', (width, height))
-    draw = ImageDraw.Draw(image)
-    
-    # Create multiple gradient layers for richer colors
-    color1, color2 = colors
-    
-    # Main gradient
-    for y in range(height):
-        ratio = y / height
-        # Add some curve to the gradient for more visual interest
-        curve_ratio = 0.5 * (1 + math.sin(math.pi * (ratio - 0.5)))
-        
-        r = int(color1[0] * (1 - curve_ratio) + color2[0] * curve_ratio)
-        g = int(color1[1] * (1 - curve_ratio) + color2[1] * curve_ratio)
-        b = int(color1[2] * (1 - curve_ratio) + color2[2] * curve_ratio)
-        
-        # Add slight variation for depth
-        r = max(0, min(255, r + random.randint(-10, 10)))
-        g = max(0, min(255, g + random.randint(-10, 10)))
-        b = max(0, min(255, b + random.randint(-10, 10)))
-        
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
-    
-    # Add diagonal gradient overlay for more depth
-    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    overlay_draw = ImageDraw.Draw(overlay)
-    
-    for x in range(width):
-        ratio = x / width
-        alpha = int(30 * math.sin(math.pi * ratio))  # Subtle overlay
-        overlay_draw.line([(x, 0), (x, height)], fill=(255, 255, 255, alpha))
-    
-    image = Image.alpha_composite(image.convert('RGBA'), overlay)
-    return image.convert('RGB')
-
-def add_enhanced_pattern_overlay(image, pattern_type, opacity=40):
-    """Add enhanced decorative patterns to background"""
-    width, height = image.size
-    overlay = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
-    
-    if pattern_type == 'tech':
-        # Enhanced tech patterns with circuit-like designs
-        for _ in range(30):
-            x = random.randint(0, width-60)
-            y = random.randint(0, height-60)
-            size = random.randint(15, 40)
-            
-            # Circuit nodes
-            draw.ellipse([x, y, x+size, y+size], outline=(255, 255, 255, opacity))
-            
-            # Connecting lines
-            if random.choice([True, False]):
-                line_length = random.randint(30, 80)
-                if random.choice([True, False]):  # Horizontal
-                    draw.line([(x+size, y+size//2), (x+size+line_length, y+size//2)], 
-                             fill=(255, 255, 255, opacity//2), width=2)
-                else:  # Vertical
-                    draw.line([(x+size//2, y+size), (x+size//2, y+size+line_length)], 
-                             fill=(255, 255, 255, opacity//2), width=2)
-    
-    elif pattern_type == 'ethcc':
-        # ETHCC inspired pattern with triangular elements like the logo
-        for _ in range(25):
-            x = random.randint(0, width-70)
-            y = random.randint(0, height-70)
-            size = random.randint(30, 60)
-            
-            # Create triangular shapes inspired by ETHCC logo
-            if random.choice([True, False]):
-                # Upward pointing triangle (like top of logo)
-                points = [(x+size//2, y), (x+size, y+size), (x, y+size)]
-                draw.polygon(points, outline=(255, 255, 255, opacity), width=2)
-            else:
-                # Downward pointing triangle (like bottom of logo)
-                points = [(x, y), (x+size, y), (x+size//2, y+size)]
-                draw.polygon(points, outline=(255, 255, 255, opacity), width=2)
-                
-            # Add secondary shape for more complex pattern
-            x_offset = random.randint(-20, 20)
-            y_offset = random.randint(-20, 20)
-            smaller_size = size // 2
-            
-            if random.choice([True, False, False]):  # Less frequently
-                # Add hexagon shape (inspired by Ethereum)
-                hex_size = smaller_size
-                hex_points = [
-                    (x+x_offset+hex_size//2, y+y_offset),
-                    (x+x_offset+hex_size, y+y_offset+hex_size//4),
-                    (x+x_offset+hex_size, y+y_offset+3*hex_size//4),
-                    (x+x_offset+hex_size//2, y+y_offset+hex_size),
-                    (x+x_offset, y+y_offset+3*hex_size//4),
-                    (x+x_offset, y+y_offset+hex_size//4)
-                ]
-                draw.polygon(hex_points, outline=(255, 255, 255, opacity//2), width=1)
-    
-    elif pattern_type == 'crypto':
-        # Enhanced crypto patterns with diamond crystals
-        for _ in range(20):
-            x = random.randint(0, width-60)
-            y = random.randint(0, height-60)
-            size = random.randint(20, 50)
-            
-            # Diamond shape
-            points = [(x+size//2, y), (x+size, y+size//2), (x+size//2, y+size), (x, y+size//2)]
-            draw.polygon(points, outline=(255, 255, 255, opacity), width=2)
-            
-            # Inner diamond
-            inner_offset = size // 4
-            inner_points = [(x+size//2, y+inner_offset), (x+size-inner_offset, y+size//2), 
-                          (x+size//2, y+size-inner_offset), (x+inner_offset, y+size//2)]
-            draw.polygon(inner_points, outline=(255, 255, 255, opacity//2))
-    
-    elif pattern_type == 'waves':
-        # Enhanced wave patterns
-        wave_count = 8
-        for i in range(wave_count):
-            amplitude = random.randint(20, 40)
-            frequency = random.uniform(0.02, 0.05)
-            phase = random.uniform(0, 2 * math.pi)
-            y_offset = (height // wave_count) * i
-            
-            points = []
-            for x in range(0, width, 5):
-                y = y_offset + amplitude * math.sin(frequency * x + phase)
-                points.append((x, int(y)))
-            
-            for j in range(len(points)-1):
-                draw.line([points[j], points[j+1]], fill=(255, 255, 255, opacity//2), width=3)
-    
-    elif pattern_type == 'geometric':
-        # Enhanced geometric patterns
-        for _ in range(35):
-            x = random.randint(0, width-40)
-            y = random.randint(0, height-40)
-            size = random.randint(15, 35)
-            shape_type = random.choice(['rect', 'circle', 'triangle'])
-            
-            if shape_type == 'rect':
-                draw.rectangle([x, y, x+size, y+size], outline=(255, 255, 255, opacity), width=2)
-            elif shape_type == 'circle':
-                draw.ellipse([x, y, x+size, y+size], outline=(255, 255, 255, opacity), width=2)
-            else:  # triangle
-                points = [(x+size//2, y), (x+size, y+size), (x, y+size)]
-                draw.polygon(points, outline=(255, 255, 255, opacity), width=2)
-    
-    elif pattern_type == 'nature':
-        # Nature-inspired patterns for forest theme
-        for _ in range(25):
-            x = random.randint(0, width-50)
-            y = random.randint(0, height-50)
-            
-            # Draw leaf-like shapes
-            size = random.randint(20, 40)
-            # Leaf outline
-            points = [(x, y+size//2), (x+size//4, y), (x+size//2, y+size//4), 
-                     (x+3*size//4, y), (x+size, y+size//2), (x+3*size//4, y+size),
-                     (x+size//2, y+3*size//4), (x+size//4, y+size)]
-            
-            draw.polygon(points, outline=(255, 255, 255, opacity//2))
-    
-    else:  # clean/minimal
-        # Subtle dot pattern for minimal theme
-        for _ in range(40):
-            x = random.randint(0, width)
-            y = random.randint(0, height)
-            size = random.randint(2, 6)
-            draw.ellipse([x, y, x+size, y+size], fill=(255, 255, 255, opacity//3))
-    
-    image = Image.alpha_composite(image.convert('RGBA'), overlay)
-    return image.convert('RGB')
-
-def add_decorative_elements(draw, size, theme_config):
-    """Add sophisticated decorative elements to the QR code"""
-    # Enhanced corner decorations with theme-specific styling
-    corner_size = int(size * 0.06)  # Proportional to canvas size
-    line_width = max(3, int(size * 0.004))
-    
-    # Corner positions with better spacing
-    margin = int(size * 0.03)
-    corners = [
-        (margin, margin),  # Top-left
-        (size - margin - corner_size, margin),  # Top-right
-        (margin, size - margin - corner_size),  # Bottom-left
-        (size - margin - corner_size, size - margin - corner_size)  # Bottom-right
-    ]
-    
-    for i, (x, y) in enumerate(corners):
-        # Create different corner styles based on theme
-        if theme_config.get('pattern') == 'ethcc':
-            # ETHCC style corners with triangular elements
-            if i == 0:  # Top-left
-                # Create a triangular corner decoration
-                triangle_points = [
-                    (x, y),
-                    (x + corner_size, y),
-                    (x, y + corner_size)
-                ]
-                draw.polygon(triangle_points, outline=(255, 255, 255, 200), width=line_width)
-                # Inner detail
-                smaller_size = corner_size // 2
-                smaller_triangle = [
-                    (x + 4, y + 4),
-                    (x + smaller_size, y + 4),
-                    (x + 4, y + smaller_size)
-                ]
-                draw.polygon(smaller_triangle, outline=(255, 255, 255, 150), width=line_width//2)
-            elif i == 1:  # Top-right
-                # Create a triangular corner decoration
-                triangle_points = [
-                    (x + corner_size, y),
-                    (x + corner_size, y + corner_size),
-                    (x, y)
-                ]
-                draw.polygon(triangle_points, outline=(255, 255, 255, 200), width=line_width)
-                # Inner detail
-                smaller_size = corner_size // 2
-                smaller_triangle = [
-                    (x + corner_size - 4, y + 4),
-                    (x + corner_size - 4, y + smaller_size),
-                    (x + corner_size - smaller_size, y + 4)
-                ]
-                draw.polygon(smaller_triangle, outline=(255, 255, 255, 150), width=line_width//2)
-            elif i == 2:  # Bottom-left
-                # Create a triangular corner decoration
-                triangle_points = [
-                    (x, y + corner_size),
-                    (x + corner_size, y + corner_size),
-                    (x, y)
-                ]
-                draw.polygon(triangle_points, outline=(255, 255, 255, 200), width=line_width)
-                # Inner detail
-                smaller_size = corner_size // 2
-                smaller_triangle = [
-                    (x + 4, y + corner_size - 4),
-                    (x + smaller_size, y + corner_size - 4),
-                    (x + 4, y + corner_size - smaller_size)
-                ]
-                draw.polygon(smaller_triangle, outline=(255, 255, 255, 150), width=line_width//2)
-            else:  # Bottom-right
-                # Create a triangular corner decoration
-                triangle_points = [
-                    (x + corner_size, y),
-                    (x + corner_size, y + corner_size),
-                    (x, y + corner_size)
-                ]
-                draw.polygon(triangle_points, outline=(255, 255, 255, 200), width=line_width)
-                # Inner detail
-                smaller_size = corner_size // 2
-                smaller_triangle = [
-                    (x + corner_size - 4, y + corner_size - 4),
-                    (x + corner_size - 4, y + corner_size - smaller_size),
-                    (x + corner_size - smaller_size, y + corner_size - 4)
-                ]
-                draw.polygon(smaller_triangle, outline=(255, 255, 255, 150), width=line_width//2)
-        elif theme_config.get('pattern') in ['tech', 'crypto']:
-            # Tech/crypto: Square corners with inner details
-            draw.rectangle([x, y, x + corner_size, y + corner_size], 
-                         outline=(255, 255, 255, 200), width=line_width)
-            # Inner square
-            inner_margin = corner_size // 4
-            draw.rectangle([x + inner_margin, y + inner_margin, 
-                          x + corner_size - inner_margin, y + corner_size - inner_margin], 
-                         outline=(255, 255, 255, 150), width=line_width//2)
-        else:
-            # Other themes: Circular corners
-            draw.ellipse([x, y, x + corner_size, y + corner_size], 
-                        outline=(255, 255, 255, 200), width=line_width)
-            # Inner circle
-            inner_margin = corner_size // 4
-            draw.ellipse([x + inner_margin, y + inner_margin, 
-                         x + corner_size - inner_margin, y + corner_size - inner_margin], 
-                        outline=(255, 255, 255, 150), width=line_width//2)
-    
-    # Add subtle border frame - customized by theme
-    frame_margin = int(size * 0.01)
-    if theme_config.get('pattern') == 'ethcc':
-        # For ETHCC, add a border frame with triangular corners
-        # Draw border lines
-        line_width = 3
-        # Top line
-        draw.line([(frame_margin + corner_size, frame_margin), 
-                  (size - frame_margin - corner_size, frame_margin)], 
-                 fill=(255, 255, 255, 100), width=line_width)
-        # Right line
-        draw.line([(size - frame_margin, frame_margin + corner_size), 
-                  (size - frame_margin, size - frame_margin - corner_size)], 
-                 fill=(255, 255, 255, 100), width=line_width)
-        # Bottom line
-        draw.line([(frame_margin + corner_size, size - frame_margin), 
-                  (size - frame_margin - corner_size, size - frame_margin)], 
-                 fill=(255, 255, 255, 100), width=line_width)
-        # Left line
-        draw.line([(frame_margin, frame_margin + corner_size), 
-                  (frame_margin, size - frame_margin - corner_size)], 
-                 fill=(255, 255, 255, 100), width=line_width)
-    else:
-        # Standard border for other themes
-        draw.rectangle([frame_margin, frame_margin, size - frame_margin, size - frame_margin], 
-                      outline=(255, 255, 255, 100), width=2)
-
-def create_themed_qr(qr_data, username, event_name=None, theme='ethcc', size=1000):
-    """Create a themed QR code with username and optional event name"""
-    try:
-        
-        # Get theme configuration
-        theme_config = QR_THEMES.get(theme, QR_THEMES['ethcc'])
-        
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,  # High error correction for better design
-            box_size=10,
-            border=0,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        # Create QR image with custom colors
-        qr_img = qr.make_image(fill_color='black', back_color='white')
-        
-        # Create main canvas with padding
-        canvas = Image.new('RGB', (size, size), 'white')
-        
-        # Create enhanced gradient background
-        bg = create_enhanced_gradient_background(size, size, theme_config['bg_colors'])
-        
-        # Add enhanced pattern overlay
-        bg = add_enhanced_pattern_overlay(bg, theme_config['pattern'])
-        
-        # Paste background
-        canvas.paste(bg, (0, 0))
-        
-        # Calculate QR code size and position with better spacing
-        qr_size = int(size * 0.4)  # QR takes 40% of the shortest dimension
-        qr_x = (size - qr_size) // 2
-        
-        # Dynamic positioning based on whether event name exists
-        if event_name:
-            qr_y = int(size * 0.35)  # Lower position when event name exists
-        else:
-            qr_y = int(size * 0.28)  # Higher position when no event name, moved up to make room for username below
-        
-        # Resize and paste QR code
-        qr_resized = qr_img.resize((qr_size, qr_size), Image.Resampling.LANCZOS)
-        
-        # Create enhanced white background for QR with shadow effect
-        qr_bg_size = qr_size + 60
-        qr_bg = Image.new('RGBA', (qr_bg_size, qr_bg_size), (0, 0, 0, 0))
-        
-        # Add shadow
-        shadow_offset = 8
-        for i in range(shadow_offset):
-            shadow_alpha = int(40 * (shadow_offset - i) / shadow_offset)
-            shadow_bg = Image.new('RGBA', (qr_bg_size, qr_bg_size), (0, 0, 0, shadow_alpha))
-            qr_bg = Image.alpha_composite(qr_bg, shadow_bg)
-        
-        # Add white background with rounded corners effect
-        white_bg = Image.new('RGBA', (qr_bg_size, qr_bg_size), (255, 255, 255, 250))
-        qr_bg.paste(white_bg, (0, 0), white_bg)
-        
-        # Paste QR code
-        qr_bg.paste(qr_resized, (30, 30))
-        
-        # Convert canvas to RGBA for blending
-        canvas = canvas.convert('RGBA')
-        canvas.paste(qr_bg, (qr_x - 30, qr_y - 30), qr_bg)
-        
-        # Enhanced text rendering
-        draw = ImageDraw.Draw(canvas)
-        
-        # Try to load better fonts with different sizes
-        try:
-            font_paths = [
-                "/System/Library/Fonts/Helvetica.ttc",  # macOS
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",  # Linux
-                "arial.ttf",  # Windows
-            ]
-            
-            # INCREASED FONT SIZES for better visibility
-            title_font = None
-            username_font = None
-            event_font = None
-            
-            for font_path in font_paths:
-                try:
-                    title_font = ImageFont.truetype(font_path, 85)  # Larger for title
-                    username_font = ImageFont.truetype(font_path, 72)  # INCREASED for username
-                    event_font = ImageFont.truetype(font_path, 60)  # Larger for event
-                    break
-                except (OSError, IOError):
-                    continue
-            
-            # Fallback to default if no fonts found
-            if username_font is None:
-                title_font = ImageFont.load_default()
-                username_font = ImageFont.load_default()
-                event_font = ImageFont.load_default()
-                
-        except:
-            title_font = ImageFont.load_default()
-            username_font = ImageFont.load_default()
-            event_font = ImageFont.load_default()
-        
-        # Add event name at top with better positioning
-        if event_name:
-            event_text = f"🎪 {event_name.upper()}"
-            bbox = draw.textbbox((0, 0), event_text, font=event_font)
-            event_width = bbox[2] - bbox[0]
-            event_x = (size - event_width) // 2
-            event_y = int(size * 0.08)  # Top positioning with percentage
-            
-            # Enhanced text shadow with multiple layers
-            for offset in range(4, 0, -1):
-                shadow_alpha = int(120 * offset / 4)
-                draw.text((event_x + offset, event_y + offset), event_text, 
-                         fill=(0, 0, 0, shadow_alpha), font=event_font)
-            
-            # Main event text with gradient effect simulation
-            draw.text((event_x, event_y), event_text, fill=(255, 255, 255, 255), font=event_font)
-        
-        # Add username BELOW the QR code with improved visibility
-        username_text = f"@{username}" if not username.startswith('@') else username
-        
-        bbox = draw.textbbox((0, 0), username_text, font=username_font)
-        username_width = bbox[2] - bbox[0]
-        username_x = (size - username_width) // 2
-        
-        # Position username just below the QR code, with small padding
-        username_y = qr_y + qr_size + 18  # 18px padding below QR code
-        
-        # Enhanced username text shadow for better readability
-        for offset in range(4, 0, -1):
-            shadow_alpha = int(160 * offset / 4)  # Increased shadow opacity
-            draw.text((username_x + offset, username_y + offset), username_text, 
-                     fill=(0, 0, 0, shadow_alpha), font=username_font)
-        
-        # Main username text
-        draw.text((username_x, username_y), username_text, fill=(255, 255, 255, 255), font=username_font)
-        
-        # Add decorative elements
-        add_decorative_elements(draw, size, theme_config)
-        
-        # Add ETHCC logo in top right corner if theme is 'ethcc'
-        if theme == 'ethcc':
-            # Define the logo size - make it prominent but not overwhelming
-            logo_size = int(size * 0.2)  # 20% of the canvas width
-            
-            # Create a simplified ETHCC logo using triangular shapes
-            # Top triangle (blue)
-            logo_x = int(size * 0.75)  # Position in top right area
-            logo_y = int(size * 0.1)  # Position in top right area
-            
-            # Triangle dimensions
-            triangle_height = int(logo_size * 0.8)
-            triangle_width = int(logo_size * 0.8)
-            
-            # Draw the triangular logo inspired by ETHCC
-            # Top triangle (blue)
-            top_triangle = [
-                (logo_x + triangle_width//2, logo_y),
-                (logo_x + triangle_width, logo_y + triangle_height),
-                (logo_x, logo_y + triangle_height)
-            ]
-            draw.polygon(top_triangle, fill=(0, 155, 208, 220))  # ETHCC blue
-            
-            # Bottom triangle (teal)
-            bottom_triangle = [
-                (logo_x, logo_y + triangle_height - triangle_height//3),
-                (logo_x + triangle_width, logo_y + triangle_height - triangle_height//3),
-                (logo_x + triangle_width//2, logo_y + triangle_height*2 - triangle_height//3)
-            ]
-            draw.polygon(bottom_triangle, fill=(42, 206, 204, 220))  # ETHCC teal
-            
-            # Add logo outline for better visibility
-            draw.line(top_triangle + [top_triangle[0]], fill=(255, 255, 255, 180), width=3)
-            draw.line(bottom_triangle + [bottom_triangle[0]], fill=(255, 255, 255, 180), width=3)
-            
-            # Add "ETHCC" text below logo if space allows
-            if not event_name:
-                ethcc_text = "ETHCC"
-                ethcc_font = username_font
-                bbox = draw.textbbox((0, 0), ethcc_text, font=ethcc_font)
-                ethcc_width = bbox[2] - bbox[0]
-                ethcc_x = logo_x + triangle_width//2 - ethcc_width//2
-                ethcc_y = logo_y + triangle_height*2 + 10
-                
-                # Draw ETHCC text with shadow
-                for offset in range(3, 0, -1):
-                    shadow_alpha = int(100 * offset / 3)
-                    draw.text((ethcc_x + offset, ethcc_y + offset), ethcc_text, 
-                             fill=(0, 0, 0, shadow_alpha), font=ethcc_font)
-                draw.text((ethcc_x, ethcc_y), ethcc_text, fill=(255, 255, 255, 220), font=ethcc_font)
-            
-        # Convert back to RGB for saving
-        canvas = canvas.convert('RGB')
-        
-        return canvas
-    except Exception as e:
-        logger.error(f"Error creating themed QR code: {e}")
-        return None
-
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -664,19 +89,33 @@ async def get_user_profile(tg_id):
         if result and 'user' in result:
             return db_user_to_profile(result['user'])
         return None
+    except APIUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error getting user profile from API: {e}")
         return None
 
+async def get_db_user_id(tg_id):
+    """Get only the database user_id for a Telegram user"""
+    try:
+        result = api_client.get_user_by_tg_id(tg_id, fields=['user_id'])
+        if result and 'user' in result:
+            return result['user']['user_id']
+        return None
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting user id from API: {e}")
+        return None
+
 async def create_or_update_user_profile(tg_id, profile_data):
     """Create or update user profile in database"""
     try:
         # Check if user exists
-        existing_user = await get_user_profile(tg_id)
+        user_id = await get_db_user_id(tg_id)
         
-        if existing_user:
+        if user_id:
             # Update existing user
-            user_id = existing_user['user_id']
             update_data = profile_to_db_user(profile_data, tg_id)
             # Remove tg_id from update data as it shouldn't be updated
             update_data.pop('tg_id', None)
@@ -688,6 +127,8 @@ async def create_or_update_user_profile(tg_id, profile_data):
             logger.info(f"Creating user with data: {create_data}")
             result = api_client.create_user(**create_data)
             return result is not None and 'user_id' in result
+    except APIUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error creating/updating user profile in API: {e}")
         return False
@@ -696,16 +137,18 @@ async def create_or_update_user_profile(tg_id, profile_data):
 connection_requests = {}
 user_notes = {}
 
+# Columns of the other user that connection lists display
+CONNECTION_USER_FIELDS = ['user_id', 'tg_id', 'display_name', 'username', 'role', 'project_name', 'description']
+
 async def get_user_connections(user_id: int) -> List[Dict]:
     """Get user connections from database"""
     try:
         # Get user database ID first
-        user_profile = await get_user_profile(user_id)
-        if not user_profile:
+        db_user_id = await get_db_user_id(user_id)
+        if not db_user_id:
             return []
         
-        db_user_id = user_profile['user_id']
-        result = api_client.get_user_groups(db_user_id)
+        result = api_client.get_user_groups(db_user_id, fields=CONNECTION_USER_FIELDS)
         
         if result and 'groups' in result:
             # Convert to connection format
@@ -728,6 +171,8 @@ async def get_user_connections(user_id: int) -> List[Dict]:
             return connections
         
         return []
+    except APIUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error getting user connections from database: {e}")
         return []
@@ -736,16 +181,13 @@ async def create_connection_in_database(user_id: int, target_user_id: int, group
     """Create a connection by storing a group in the database"""
     try:
         # Get user database IDs
-        user_profile = await get_user_profile(user_id)
-        target_profile = await get_user_profile(target_user_id)
+        db_user_id = await get_db_user_id(user_id)
+        db_target_user_id = await get_db_user_id(target_user_id)
         
-        if not user_profile or not target_profile:
+        if not db_user_id or not db_target_user_id:
             logger.error(f"Could not find profiles for users {user_id} and {target_user_id}")
             return False
         
-        db_user_id = user_profile['user_id']
-        db_target_user_id = target_profile['user_id']
-        
         # Use placeholder only when no link is provided
         final_link = group_link
         if final_link is None:
@@ -767,30 +209,42 @@ async def create_connection_in_database(user_id: int, target_user_id: int, group
         
         return False
         
+    except APIUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error creating connection in database: {e}")
         return False
 
+async def get_connected_tg_ids(user_id: int) -> set:
+    """Get the Telegram IDs a user is connected to"""
+    db_user_id = await get_db_user_id(user_id)
+    if not db_user_id:
+        return set()
+    
+    # Only tg_id is needed, so skip the rest of each connection's profile
+    result = api_client.get_user_groups(db_user_id, fields=['tg_id'])
+    if result and 'groups' in result:
+        return {group['other_user']['tg_id'] for group in result['groups'] if group['other_user']}
+    return set()
+
 async def check_connection_exists(user_id: int, target_user_id: int) -> bool:
     """Check if connection exists between two users"""
     try:
         # First check connections in the normal direction
-        connections = await get_user_connections(user_id)
-        for connection in connections:
-            if connection['tg_id'] == target_user_id:
-                logger.info(f"Found existing connection between {user_id} and {target_user_id}")
-                return True
+        if target_user_id in await get_connected_tg_ids(user_id):
+            logger.info(f"Found existing connection between {user_id} and {target_user_id}")
+            return True
         
         # Also check connections in the reverse direction
         # This is important because connections are bidirectional
-        target_connections = await get_user_connections(target_user_id)
-        for connection in target_connections:
-            if connection['tg_id'] == user_id:
-                logger.info(f"Found existing reverse connection between {target_user_id} and {user_id}")
-                return True
+        if user_id in await get_connected_tg_ids(target_user_id):
+            logger.info(f"Found existing reverse connection between {target_user_id} and {user_id}")
+            return True
                 
         logger.info(f"No existing connection found between {user_id} and {target_user_id}")
         return False
+    except APIUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error checking connection existence: {e}")
         return False
@@ -799,6 +253,64 @@ def escape_markdown(text):
     """Escape Telegram Markdown special characters in a string."""
     return re.sub(r'([_\*\[\]()~`>#+\-=|{}.!])', r'\\\1', str(text))
 
+# Time a scan may spend on API calls before the user gets the fallback message
+SCAN_DEADLINE_SECONDS = float(os.getenv('SCAN_DEADLINE_SECONDS', '10'))
+
+API_SLOW_MESSAGE = (
+    "⏳ **LinkUp is slow to respond right now**\n\n"
+    "Please try again in a moment."
+)
+
+SCAN_SLOW_MESSAGE = (
+    "⏳ **LinkUp is slow to respond right now**\n\n"
+    "Your connection was not created. Please scan the QR code again in a moment."
+)
+
+def api_unavailable_message(error: APIUnavailable, slow_message: str = API_SLOW_MESSAGE) -> str:
+    if isinstance(error, ServiceBusy):
+        return (
+            "🚧 **LinkUp is busy right now**\n\n"
+            "We're having trouble reaching our servers. Please try again in a minute."
+        )
+    return slow_message
+
+def start_slow_message(context: ContextTypes.DEFAULT_TYPE) -> str:
+    """/start is a scan when it carries a QR payload, otherwise just a welcome"""
+    if context.args and context.args[0].startswith(START_PAYLOAD_PREFIXES):
+        return SCAN_SLOW_MESSAGE
+    return API_SLOW_MESSAGE
+
+GROUP_CREATION_WARMING_UP_MESSAGE = (
+    "⏳ **Group creation is warming up**\n\n"
+    "The bot has just restarted and is still connecting to Telegram. Please try again in a few seconds."
+)
+
+def group_creation_warming_up() -> bool:
+    """True while the MTProto client is still logging in after a restart"""
+    return not telegram_api.is_initialized and telegram_api.is_starting
+
+def with_api_deadline(seconds, message=API_SLOW_MESSAGE):
+    """Give every API call a handler makes one shared time budget.
+
+    When it runs out the remaining calls fail fast and the user is told to
+    try again, instead of each call waiting out its own timeout. message is
+    what they are told, or a function of the context that picks it.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            try:
+                with api_client.deadline(seconds):
+                    return await handler(update, context)
+            except APIUnavailable as e:
+                logger.warning(f"{handler.__name__} gave up on the API: {type(e).__name__} at {e}")
+                slow_message = message(context) if callable(message) else message
+                await update.effective_message.reply_text(api_unavailable_message(e, slow_message),
+                                                          parse_mode='Markdown')
+        return wrapper
+    return decorator
+
+@with_api_deadline(SCAN_DEADLINE_SECONDS, message=start_slow_message)
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Welcome message and handle deep link parameters"""
     user_name = get_full_name(update.effective_user)
@@ -827,9 +339,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.args and len(context.args) > 0:
         logger.info(f"Start command received with args: {context.args}")
         
-        if context.args[0].startswith("user_"):
+        if context.args[0].startswith(START_PAYLOAD_PREFIXES):
             try:
-                target_user_id = int(context.args[0].replace("user_", ""))
+                target_user_id = parse_qr_payload(context.args[0])
                 logger.info(f"Processing QR scan: user {user_id} scanning user {target_user_id}")
                 
                 # Show immediate processing message
@@ -937,6 +449,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     "Please make sure you're scanning a QR code generated by this bot."
                 )
                 return
+            except APIUnavailable:
+                raise
             except Exception as e:
                 logger.error(f"Unexpected error in QR scan processing: {e}")
                 await update.message.reply_text(
@@ -1066,9 +580,9 @@ async def generate_qr(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Use Telegram deep link format that works with all QR scanners
     try:
-        bot_info = await context.bot.get_me()
-        bot_username = bot_info.username
-        qr_data = f"https://t.me/{bot_username}?start=user_{user_id}"
+        # Cached by Application.initialize(); no round trip per QR
+        bot_username = context.bot.username
+        qr_data = deep_link(bot_username, user_id)
     except Exception as e:
         logger.error(f"Could not get bot username: {e}")
         # Fallback to user ID only
@@ -1098,17 +612,7 @@ async def generate_qr(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             # Fallback to simple QR if card generation fails
             # Create QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-            
-            # Create QR code image
-            qr_image = qr.make_image(fill_color="black", back_color="white")
+            qr_image = basic_qr_image(qr_data)
             
             # Convert to bytes
             bio = io.BytesIO()
@@ -1186,9 +690,9 @@ async def generate_themed_qr(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     # Get QR data
     try:
-        bot_info = await context.bot.get_me()
-        bot_username = bot_info.username
-        qr_data = f"https://t.me/{bot_username}?start=user_{user_id}"
+        # Cached by Application.initialize(); no round trip per QR
+        bot_username = context.bot.username
+        qr_data = deep_link(bot_username, user_id)
     except Exception as e:
         logger.error(f"Could not get bot username: {e}")
         qr_data = f"LinkUp://user/{user_id}"
@@ -1240,6 +744,7 @@ async def generate_themed_qr(update: Update, context: ContextTypes.DEFAULT_TYPE)
             "Use `/myqr` for a basic QR code instead."
         )
 
+@with_api_deadline(SCAN_DEADLINE_SECONDS, message=SCAN_SLOW_MESSAGE)
 async def handle_scan(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle QR code scan"""
     user_id = update.effective_user.id
@@ -1249,7 +754,7 @@ async def handle_scan(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "📱 **QR Code Scanner**\n\n"
             "Usage: `/scan [QR_CODE_DATA]`\n\n"
             "Examples:\n"
-            "• `/scan https://t.me/your_bot?start=user_5094393032`\n"
+            "• `/scan https://t.me/your_bot?start=u5YlYLY`\n"
             "• `/scan LinkUp://user/5094393032`\n"
             "• `/scan 5094393032` (just the user ID)\n\n"
             "💡 **In a real app, this would use your camera to scan QR codes automatically!**"
@@ -1266,29 +771,11 @@ async def handle_scan(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     # Extract user ID from QR code
-    target_user_id = None
-    
-    if qr_input.startswith("LinkUp://user/"):
-        try:
-            target_user_id = int(qr_input.replace("LinkUp://user/", ""))
-        except ValueError:
-            await processing_message.edit_text("❌ Invalid QR code format")
-            return
-    elif "?start=user_" in qr_input:
-        # Handle Telegram deep link format
-        try:
-            start_param = qr_input.split("?start=user_")[1]
-            target_user_id = int(start_param)
-        except (IndexError, ValueError):
-            await processing_message.edit_text("❌ Invalid QR code format")
-            return
-    else:
-        # Try to parse as direct user ID
-        try:
-            target_user_id = int(qr_input)
-        except ValueError:
-            await processing_message.edit_text("❌ Invalid QR code format")
-            return
+    try:
+        target_user_id = parse_qr_payload(qr_input)
+    except ValueError:
+        await processing_message.edit_text("❌ Invalid QR code format")
+        return
     
     # Check if target user exists
     target_profile = await get_user_profile(target_user_id)
@@ -1364,6 +851,10 @@ async def create_and_show_group_with_message(processing_message, context, user_i
     group_title = f"🤝 {user_name_short} ↔ {target_name_short}"
     group_description = f"WeMeetAI networking group for {user_profile['name']} ({user_profile['role']}) and {target_profile['name']} ({target_profile['role']})"
     
+    if group_creation_warming_up():
+        await processing_message.edit_text(GROUP_CREATION_WARMING_UP_MESSAGE)
+        return
+    
     try:
         # Create empty group with Telegram API
         if telegram_api.is_initialized:
@@ -1446,6 +937,8 @@ async def create_and_show_group_with_message(processing_message, context, user_i
         # Fallback if API fails
         raise Exception("Telegram API group creation failed")
         
+    except APIUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Group creation failed: {e}")
         
@@ -1520,9 +1013,9 @@ async def generate_qr_from_callback(query, context):
     
     # Get QR data
     try:
-        bot_info = await context.bot.get_me()
-        bot_username = bot_info.username
-        qr_data = f"https://t.me/{bot_username}?start=user_{user_id}"
+        # Cached by Application.initialize(); no round trip per QR
+        bot_username = context.bot.username
+        qr_data = deep_link(bot_username, user_id)
     except Exception as e:
         logger.error(f"Could not get bot username: {e}")
         # Fallback to user ID only
@@ -1560,17 +1053,7 @@ async def generate_qr_from_callback(query, context):
             
         else:
             # Fallback to basic QR if card generation fails
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-            
-            # Create QR code image
-            qr_image = qr.make_image(fill_color="black", back_color="white")
+            qr_image = basic_qr_image(qr_data)
             
             bio = io.BytesIO()
             qr_image.save(bio, format='PNG')
@@ -1599,147 +1082,6 @@ async def generate_qr_from_callback(query, context):
             "Please try the /myqr command instead."
         )
 
-def create_card_style_qr(qr_data, username, size=(1200, 675), qr_color=(0, 0, 0)):
-    """Create a card-style QR code with ethglobal.png as background
-    
-    Args:
-        qr_data: Data to encode in QR
-        username: Telegram username to display
-        size: Card size in pixels (width, height) - default 1200x675 (16:9 aspect ratio)
-        qr_color: RGB tuple for QR code color (default: ETH Cannes blue)
-        
-    Returns:
-        PIL.Image: Card image with QR code
-    """
-    try:
-        # Load background image
-        bg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ethglobal.jpg')
-        try:
-            bg_image = Image.open(bg_path)
-            # Resize background to fit card size while maintaining aspect ratio
-            bg_image = bg_image.resize(size, Image.Resampling.LANCZOS)
-        except Exception as e:
-            logging.error(f"Failed to load background image: {e}")
-            # Create fallback gradient background
-            bg_image = Image.new('RGB', size, (14, 165, 233))
-            draw = ImageDraw.Draw(bg_image)
-            for y in range(size[1]):
-                ratio = y / size[1]
-                r = int(14 * (1 - ratio) + 42 * ratio)
-                g = int(165 * (1 - ratio) + 206 * ratio)
-                b = int(233 * (1 - ratio) + 204 * ratio)
-                draw.line([(0, y), (size[0], y)], fill=(r, g, b))
-        
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,  # High error correction for better design
-            box_size=10,
-            border=0,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        # Create QR image with specified color
-        qr_img = qr.make_image(fill_color=qr_color, back_color='white')
-        
-        # Calculate QR code size and position (centered)
-        qr_size = int(min(size) * 0.42)  # QR takes about 42% of the shortest dimension
-        qr_img = qr_img.resize((qr_size, qr_size), Image.Resampling.LANCZOS)
-        
-        # Create a new blank image with the background
-        card = Image.new('RGBA', size, (0, 0, 0, 0))
-        if bg_image.mode != 'RGBA':
-            bg_image = bg_image.convert('RGBA')
-        card.paste(bg_image, (0, 0))
-        
-        # Make the container bigger relative to QR
-        qr_container_width = int(qr_size * 1.5)
-        qr_container_height = int(qr_size * 1.5)
-        
-        # Calculate QR container position (centered)
-        container_x = (size[0] - qr_container_width) // 2
-        container_y = (size[1] - qr_container_height) // 2
-        
-        # Create translucent white container with rounded corners
-        container = Image.new('RGBA', (qr_container_width, qr_container_height), (255, 255, 255, 0))
-        mask = Image.new('L', (qr_container_width, qr_container_height), 0)
-        mask_draw = ImageDraw.Draw(mask)
-        radius = 40  # corner radius
-        mask_draw.rounded_rectangle([0, 0, qr_container_width, qr_container_height], radius=radius, fill=255)
-        # Fill the rounded rectangle with semi-transparent white
-        box = Image.new('RGBA', (qr_container_width, qr_container_height), (255, 255, 255, 170))
-        container = Image.composite(box, container, mask)
-        # Add blurry effect to the box
-        blurred = container.filter(ImageFilter.GaussianBlur(radius=12))
-        # Overlay the blurred box and then the main container for a glassy effect
-        card.paste(blurred, (container_x, container_y), blurred)
-        card.paste(container, (container_x, container_y), container)
-        
-        # Calculate QR position within container (centered horizontally, higher vertically)
-        qr_x = container_x + (qr_container_width - qr_size) // 2
-        qr_y = container_y + (qr_container_height - qr_size) // 3  # Place higher to leave room for text
-        
-        # Paste QR code onto card
-        card.paste(qr_img, (qr_x, qr_y))
-        
-        # Add username text below QR code
-        draw = ImageDraw.Draw(card)
-        
-        # Try to load fonts
-        font_paths = [
-            "/System/Library/Fonts/Helvetica.ttc",  # macOS
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",  # Linux
-            "arial.ttf",  # Windows
-        ]
-        
-        username_font = None
-        for font_path in font_paths:
-            try:
-                username_font = ImageFont.truetype(font_path, 44)  # Smaller font size
-                break
-            except (OSError, IOError):
-                continue
-        
-        # Fallback to default if no fonts found
-        if username_font is None:
-            username_font = ImageFont.load_default()
-        
-        # Format the username
-        if username:
-            username_text = f"@{username}" if not username.startswith('@') else username
-            
-            # Get text width
-            bbox = draw.textbbox((0, 0), username_text, font=username_font)
-            username_width = bbox[2] - bbox[0]
-            username_height = bbox[3] - bbox[1]
-            
-            # Position username just below the QR code, with a bit more padding
-            username_x = container_x + (qr_container_width - username_width) // 2
-            username_y = qr_y + qr_size + 32  # 32px padding below QR code
-            
-            # Add subtle shadow for better readability
-            for offset in range(3, 0, -1):
-                draw.text(
-                    (username_x + offset, username_y + offset),
-                    username_text,
-                    fill=(0, 0, 0, 120),
-                    font=username_font
-                )
-            # Main username text
-            draw.text(
-                (username_x, username_y),
-                username_text,
-                fill=qr_color,
-                font=username_font
-            )
-        
-        return card.convert('RGB')
-        
-    except Exception as e:
-        logging.error(f"Card QR generation failed: {e}")
-        return None
-
 # QR color options
 QR_COLORS = {
     'blue': (0, 155, 208),  # ETH Cannes blue
@@ -1929,6 +1271,10 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.edit_message_text("❌ Error retrieving user profiles. Please try again.")
             return
         
+        if group_creation_warming_up():
+            await query.edit_message_text(GROUP_CREATION_WARMING_UP_MESSAGE)
+            return
+        
         try:
             # Create actual Telegram group using Telegram API (pyrogram)
             group_title = f"🤝 {user_profile['name']} ↔ {target_profile['name']}"
@@ -2214,6 +1560,10 @@ async def create_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 group_description += f"• {connection['name']} - {connection['role']} at {connection['project']}\n"
                 break
     
+    if group_creation_warming_up():
+        await update.message.reply_text(GROUP_CREATION_WARMING_UP_MESSAGE)
+        return
+    
     # Send processing message
     processing_message = await update.message.reply_text(
         "⏳ **Creating your group...**\n\n"
@@ -2331,9 +1681,8 @@ async def create_group(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except Exception as e:
             logger.error(f"Failed to notify user {target_tg_id}: {e}")
 
-async def initialize_app(application):
-    """Initialize the application and Telegram API client"""
-    # Initialize Telegram API client
+async def start_telegram_api():
+    """Log in to MTProto; group creation reports "warming up" until this finishes"""
     logger.info("Initializing Telegram API client...")
     api_success = await initialize_telegram_api()
     
@@ -2341,15 +1690,39 @@ async def initialize_app(application):
         logger.info("✅ Telegram API client initialized - Group creation available!")
     else:
         logger.warning("⚠️ Telegram API client failed to initialize - Using fallback mode")
+    return api_success
+
+async def warm_up(application):
+    """Everything the first updates would otherwise wait for, run concurrently"""
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        start_telegram_api(),
+        set_bot_commands(application),
+        asyncio.to_thread(warm_up_qr_rendering),
+        asyncio.to_thread(api_client.warm_up),
+        return_exceptions=True,
+    )
+    for step, result in zip(("MTProto login", "bot commands", "QR rendering", "API client"), results):
+        if isinstance(result, Exception):
+            logger.warning(f"Warm-up step '{step}' failed: {result}")
+    logger.info(f"Warm-up finished in {time.perf_counter() - started:.1f}s")
+
+async def initialize_app(application):
+    """Start warming up in the background so the bot answers updates right away"""
+    # Mark MTProto as starting before polling begins, so early group requests say "warming up"
+    telegram_api.is_starting = True
+    application.bot_data['warm_up'] = asyncio.create_task(warm_up(application))
     
     # Log ETHCC theme information
     logger.info("🔷 ETHCC theme active - QR codes will use ETHCC styling by default")
     print("\033[96m" + "ETHCC theme enabled! QR codes will use the official ETHCC colors and design." + "\033[0m")
-    
-    return api_success
 
 async def shutdown_app(application):
     """Cleanup function"""
+    task = application.bot_data.get('warm_up')
+    if task is not None and not task.done():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
     logger.info("Shutting down Telegram API client...")
     await close_telegram_api()
 
@@ -2374,30 +1747,6 @@ async def shutdown_app(application):
 #     )
 
 # QR Code generation for webapp
-def generate_qr_code_image(tg_id, size=300):
-    """Generate QR code image for a given Telegram user ID - can be used by webapp API"""
-    try:
-        # Create QR code with Telegram deep link format
-        qr_data = f"user_{tg_id}"
-        
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        # Create QR code image
-        qr_image = qr.make_image(fill_color="black", back_color="white")
-        
-        return qr_image
-    except Exception as e:
-        logger.error(f"QR code generation failed: {e}")
-        return None
-
 async def update_profile_from_callback(query, context):
     """Handle profile update from callback"""
     await query.edit_message_text(
@@ -2434,6 +1783,10 @@ async def create_instant_group(query, context, target_user_id):
     group_title = f"{user_profile['project']} <-> {target_profile['project']}"
     group_description = f"WeMeetAI networking group: {user_profile['name']} & {target_profile['name']}"
     
+    if group_creation_warming_up():
+        await query.edit_message_text(GROUP_CREATION_WARMING_UP_MESSAGE)
+        return
+    
     await query.edit_message_text("🏗️ **Creating your networking group...** ⏳")
     
     try:
@@ -2669,6 +2022,7 @@ async def create_instant_connection(update: Update, context: ContextTypes.DEFAUL
             f"💾 **Connection saved to database.**"
         )
 
+@with_api_deadline(SCAN_DEADLINE_SECONDS, message=SCAN_SLOW_MESSAGE)
 async def handle_connect(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle instant connection request"""
     user_id = update.effective_user.id
@@ -2731,9 +2085,9 @@ async def generate_qr_with_color(query, context, color_name):
     
     # Get QR data
     try:
-        bot_info = await context.bot.get_me()
-        bot_username = bot_info.username
-        qr_data = f"https://t.me/{bot_username}?start=user_{user_id}"
+        # Cached by Application.initialize(); no round trip per QR
+        bot_username = context.bot.username
+        qr_data = deep_link(bot_username, user_id)
     except Exception as e:
         logger.error(f"Could not get bot username: {e}")
         qr_data = f"LinkUp://user/{user_id}"
@@ -2783,7 +2137,25 @@ async def generate_qr_with_color(query, context, color_name):
             "Use /myqr for a basic QR code instead."
         )
 
+async def handle_error(update: object, context: ContextTypes.DEFAULT_TYPE):
+    """Tell the user when the API is down instead of failing silently"""
+    error = context.error
+    if not isinstance(error, APIUnavailable):
+        logger.error("Unhandled error while processing an update", exc_info=error)
+        return
+    logger.warning(f"API unavailable ({type(error).__name__}), client stats: {api_client.stats()}")
+    if not isinstance(update, Update):
+        return
+    try:
+        if update.callback_query:
+            await update.callback_query.answer("🚧 LinkUp is busy right now. Please try again in a minute.", show_alert=True)
+        elif update.effective_message:
+            await update.effective_message.reply_text(api_unavailable_message(error), parse_mode='Markdown')
+    except Exception as e:
+        logger.warning(f"Could not send the service busy message: {e}")
+
 async def set_bot_commands(application):
+    """Set the commands of the small Menu button"""
     commands = [
         BotCommand("start", "Show main menu"),
         BotCommand("update_profile", "Set up or update your profile"),
@@ -2824,9 +2196,6 @@ def main():
         .build()
     )
     
-    # Set bot commands for the small Menu button
-    asyncio.get_event_loop().run_until_complete(set_bot_commands(app))
-    
     # Add handlers
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("update_profile", setup_profile))
@@ -2839,6 +2208,7 @@ def main():
     # app.add_handler(CommandHandler("connect", handle_connect))  # Comment out handler registration
     app.add_handler(CallbackQueryHandler(handle_callback))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    app.add_error_handler(handle_error)
     
     logger.info("Starting WeMeetAI Bot with ETHCC Theme...")
     try:
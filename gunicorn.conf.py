@@ -0,0 +1,75 @@
+"""
+Gunicorn configuration for serving the LinkUp API in production.
+
+    gunicorn -c gunicorn.conf.py linkup_api:app
+
+Worker and thread counts follow the container's CPU allotment (2 vCPUs on
+ROFL, see rofl.yaml) and can be overridden with WEB_CONCURRENCY and
+GUNICORN_THREADS. Each worker opens its own MySQL pool after fork.
+Send SIGHUP to the master to reload workers gracefully.
+"""
+import math
+import os
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'apis')
+
+
+def cpu_allotment() -> int:
+    """CPUs this container may use: cgroup quota, then affinity, then host count"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# linkup_api imports its siblings script-style, so run from apis/
+chdir = API_DIR
+bind = f"0.0.0.0:{os.getenv('API_PORT', '8000')}"
+
+# Requests mostly wait on MySQL, so threads per worker raise concurrency
+# without paying another interpreter's memory for each slot
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', str(cpu_allotment() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Restart a worker whose main loop stops checking in for this long. With
+# gthread a hung request thread does not stop the check-ins, so this never
+# ends a single request; API_REQUEST_TIMEOUT caps each request's queries instead.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+# Give in-flight requests time to finish on reload/stop
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# Each worker keeps its own user cache, and a write only invalidates the worker
+# that served it; user_cache caps the TTL when it is one of several
+raw_env = [f"API_PROCESSES={workers}"]
+
+# Recycle workers periodically so slow leaks cannot build up
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    """Open this worker's MySQL pool, sized to its thread count"""
+    import db
+    try:
+        db.init_pool(int(os.getenv('MYSQL_POOL_SIZE', str(threads))))
+    except Exception as e:
+        # Keep the worker up; the pool is retried on the first request
+        worker.log.warning(f"MySQL pool not ready in worker {worker.pid}: {e}")
+
+
+def worker_exit(server, worker):
+    import db
+    db.close_pool()
@@ -6,29 +6,54 @@ echo "====================================="
 # Function to handle shutdown
 shutdown() {
     echo "🛑 Shutting down services..."
-    kill -TERM "$api_pid" "$bot_pid" 2>/dev/null
-    wait "$api_pid" "$bot_pid"
+    kill -TERM "$api_pid" "$bot_pid" $events_pid 2>/dev/null
+    wait "$api_pid" "$bot_pid" $events_pid
     echo "✅ Services stopped"
     exit 0
 }
 
+# Reload API workers gracefully (gunicorn only)
+reload() {
+    echo "🔄 Reloading API workers..."
+    kill -HUP "$api_pid" 2>/dev/null
+}
+
 # Trap signals
 trap shutdown SIGTERM SIGINT
+trap reload SIGHUP
 
-# Start Flask API in background
-echo "🌐 Starting Flask API server..."
+# Start the API in background (API_SERVER=gunicorn|async|flask)
+API_SERVER=${API_SERVER:-gunicorn}
 cd /app
-python apis/linkup_api.py &
-api_pid=$!
+if [ "$API_SERVER" = "gunicorn" ]; then
+    echo "🌐 Starting API server (gunicorn)..."
+    gunicorn -c gunicorn.conf.py linkup_api:app &
+    api_pid=$!
+    # Live connection streams each hold a gunicorn thread; EVENTS_PORT serves
+    # them from the async server instead (point EVENTS_URL at it)
+    if [ -n "$EVENTS_PORT" ]; then
+        echo "📡 Starting connection events server on port $EVENTS_PORT..."
+        API_PORT="$EVENTS_PORT" python apis/linkup_api_async.py &
+        events_pid=$!
+    fi
+elif [ "$API_SERVER" = "async" ]; then
+    echo "🌐 Starting async API server..."
+    python apis/linkup_api_async.py &
+    api_pid=$!
+else
+    echo "🌐 Starting Flask API server..."
+    python apis/linkup_api.py &
+    api_pid=$!
+fi
 
 # Wait a moment for API to start
 sleep 3
 
 # Check if API started successfully
 if kill -0 $api_pid 2>/dev/null; then
-    echo "✅ Flask API server started (PID: $api_pid)"
+    echo "✅ API server started ($API_SERVER, PID: $api_pid)"
 else
-    echo "❌ Flask API server failed to start"
+    echo "❌ API server failed to start"
     exit 1
 fi
 
@@ -45,19 +70,21 @@ if kill -0 $bot_pid 2>/dev/null; then
     echo "✅ Telegram bot started (PID: $bot_pid)"
 else
     echo "❌ Telegram bot failed to start"
-    kill -TERM "$api_pid" 2>/dev/null
+    kill -TERM "$api_pid" $events_pid 2>/dev/null
     exit 1
 fi
 
 echo "🎉 All services running successfully!"
-echo "📊 Flask API: http://localhost:8000"
+echo "📊 API ($API_SERVER): http://localhost:8000"
 echo "🤖 Telegram Bot: Active"
 echo ""
 echo "📋 Process IDs:"
 echo "   API: $api_pid"
 echo "   Bot: $bot_pid"
 echo ""
-echo "💡 Use Ctrl+C to stop all services"
+echo "💡 Use Ctrl+C to stop all services, SIGHUP to reload API workers"
 
-# Wait for processes
-wait "$api_pid" "$bot_pid" 
\ No newline at end of file
+# Wait for processes (a SIGHUP reload interrupts wait, so keep waiting while both run)
+while kill -0 "$api_pid" 2>/dev/null && kill -0 "$bot_pid" 2>/dev/null; do
+    wait "$api_pid" "$bot_pid"
+done 
\ No newline at end of file
@@ -5,10 +5,9 @@ Handles group creation using the full Telegram API (MTProto)
 """
 
 import os
+import importlib
 import logging
 from typing import List, Optional, Dict, Any
-from pyrogram import Client, enums, types
-from pyrogram.errors import FloodWait, SessionPasswordNeeded, PhoneCodeInvalid, PhoneCodeExpired
 import asyncio
 from datetime import datetime, timedelta
 
@@ -20,10 +19,19 @@ class TelegramAPIClient:
     def __init__(self):
         self.app = None
         self.is_initialized = False
+        # True while initialize() is logging in, so callers can tell "not ready yet" from "unavailable"
+        self.is_starting = False
         self.session_name = "linkup_session"
         
     async def initialize(self, interactive=False):
         """Initialize the Telegram API client"""
+        self.is_starting = True
+        try:
+            return await self._initialize(interactive)
+        finally:
+            self.is_starting = False
+
+    async def _initialize(self, interactive):
         api_id = os.getenv("TELEGRAM_API_ID")
         api_hash = os.getenv("TELEGRAM_API_HASH")
         phone_number = os.getenv("TELEGRAM_PHONE_NUMBER")
@@ -33,7 +41,9 @@ class TelegramAPIClient:
             return False
             
         try:
-            self.app = Client(
+            # pyrogram takes most of a second to import; load it off the event loop
+            pyrogram = await asyncio.to_thread(importlib.import_module, 'pyrogram')
+            self.app = pyrogram.Client(
                 self.session_name,
                 api_id=int(api_id),
                 api_hash=api_hash,
@@ -89,6 +99,7 @@ class TelegramAPIClient:
             logger.error("Telegram API client not initialized")
             return None
             
+        from pyrogram.errors import FloodWait
         try:
             # Create an empty group (only with the bot)
             chat = await self.app.create_group(
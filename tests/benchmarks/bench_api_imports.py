@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Measure the API process's import time and memory, before and after its first QR render
+
+Each measurement runs in a fresh interpreter so nothing is shared between runs.
+No database is needed; the render goes straight through qr_cache.render_qr.
+Run from the repository root:
+
+    python tests/benchmarks/bench_api_imports.py [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'apis')
+
+PROBE = '''
+import json, resource, sys, time
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+start = time.perf_counter()
+import linkup_api
+imported = time.perf_counter()
+import_rss = rss_mb()
+
+from qr_cache import render_qr, QRRequest
+render_qr(QRRequest(1001, 'default', None))
+rendered = time.perf_counter()
+
+print(json.dumps({
+    'import_s': imported - start,
+    'import_rss_mb': import_rss,
+    'first_render_s': rendered - imported,
+    'render_rss_mb': rss_mb(),
+    'heavy_modules': sorted(name for name in ('bot', 'telegram', 'pyrogram', 'PIL', 'qrcode') if name in sys.modules),
+}))
+'''
+
+
+def measure():
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=API_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [measure() for _ in range(runs)]
+    print(f"📊 API process, median of {runs} runs")
+    print(f"   import linkup_api   {median(r['import_s'] for r in results) * 1000:7.1f} ms   "
+          f"max RSS {median(r['import_rss_mb'] for r in results):6.1f} MB")
+    print(f"   first QR render     {median(r['first_render_s'] for r in results) * 1000:7.1f} ms   "
+          f"max RSS {median(r['render_rss_mb'] for r in results):6.1f} MB")
+    print(f"   loaded after render: {', '.join(results[-1]['heavy_modules']) or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Closed-loop HTTP load test for the LinkUp API
+
+Runs a fixed number of concurrent clients against one endpoint for a fixed
+duration and reports requests/sec and latency percentiles. Start the server
+under test first, then run e.g.:
+
+    python tests/benchmarks/bench_api_load.py --url http://localhost:8000 \\
+        --path "/get-user-by-tg-id?tg_id=123456" --concurrency 64 --duration 20
+
+Run it once against API_SERVER=flask and once against API_SERVER=async (or
+API_SERVER=gunicorn) with the same arguments to compare the servers.
+"""
+import argparse
+import sys
+import threading
+import time
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def worker(url, deadline, latencies, errors, lock, timeout):
+    session = requests.Session()
+    local_latencies = []
+    local_errors = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = session.get(url, timeout=timeout)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        if ok:
+            local_latencies.append(elapsed)
+        else:
+            local_errors += 1
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def run(url, concurrency, duration, timeout):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(url, deadline, latencies, errors, lock, timeout))
+               for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'rps': len(latencies) / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LinkUp API load test")
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--path', default='/internal/cache-stats')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/') + args.path
+    print("🔍 LinkUp API load test")
+    print(f"📡 {url} | {args.concurrency} clients | {args.duration:.0f}s")
+
+    try:
+        requests.get(url, timeout=args.timeout)
+    except requests.RequestException as e:
+        print(f"❌ API server is not reachable: {e}")
+        return 1
+
+    result = run(url, args.concurrency, args.duration, args.timeout)
+    print(f"✅ {result['requests']} requests, {result['errors']} errors")
+    print(f"📊 {result['rps']:.0f} req/s | p50 {result['p50_ms']:.1f} ms | "
+          f"p99 {result['p99_ms']:.1f} ms | max {result['max_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
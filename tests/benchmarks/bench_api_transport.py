@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark a QR scan's API calls over HTTP vs the in-process transport
+
+Replays the lookups the bot makes while handling a scan (both profiles, both
+users' database ids and connections, then both profiles again) and reports
+per-scan latency for each transport. Both users must exist. Requires the MYSQL_*
+variables in .env and, for the HTTP run, the API listening on --url. Run from
+the repository root:
+
+    python tests/benchmarks/bench_api_transport.py --scanner 123456 --target 654321 --scans 200
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'apis'))
+
+from api_client import LinkUpAPIClient, InProcessTransport
+
+load_dotenv()
+
+CONNECTION_FIELDS = ['tg_id']
+
+
+def scan(api, scanner, target):
+    """The API calls of one /start user_<id> scan up to group creation"""
+    api.get_user_by_tg_id(scanner)
+    api.get_user_by_tg_id(target)
+    for user, other in ((scanner, target), (target, scanner)):
+        user_id = api.get_user_by_tg_id(user, fields=['user_id'])['user']['user_id']
+        api.get_user_groups(user_id, fields=CONNECTION_FIELDS)
+    api.get_user_by_tg_id(scanner)
+    api.get_user_by_tg_id(target)
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(name, api, scanner, target, scans):
+    # Warm up: connection pool, prepared statements, ETag and user caches
+    for _ in range(5):
+        scan(api, scanner, target)
+    latencies = []
+    for _ in range(scans):
+        start = time.perf_counter()
+        scan(api, scanner, target)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f"   {name:<11} p50 {percentile(latencies, 50) * 1000:7.2f} ms   "
+          f"p95 {percentile(latencies, 95) * 1000:7.2f} ms   "
+          f"p99 {percentile(latencies, 99) * 1000:7.2f} ms")
+    return percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default=os.getenv('LINKUP_API_URL', 'http://localhost:8000'))
+    parser.add_argument('--scanner', type=int, required=True, help='tg_id of the scanning user')
+    parser.add_argument('--target', type=int, required=True, help='tg_id of the scanned user')
+    parser.add_argument('--scans', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"📊 {args.scans} scans, 10 API calls each")
+    http = run('http', LinkUpAPIClient(args.url), args.scanner, args.target, args.scans)
+    inprocess = run('in-process', LinkUpAPIClient(args.url, transport=InProcessTransport()),
+                    args.scanner, args.target, args.scans)
+    print(f"✅ In-process p50 is {http / inprocess:.1f}x faster than HTTP")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark JSON encoding/decoding of a 500-connection /get-user-groups payload
+
+Compares the stdlib provider with the orjson provider on the Flask app, and the
+API client's decode path. Needs no database:
+
+    python tests/benchmarks/bench_json.py [connections] [iterations]
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'apis'))
+
+import orjson
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import init_json_provider
+
+
+def build_payload(connections):
+    base = datetime(2025, 7, 1, 9, 30)
+    groups = []
+    for i in range(connections):
+        stamp = base + timedelta(minutes=i)
+        groups.append({
+            'group_id': i + 1,
+            'group_link': f"https://t.me/+linkupGroup{i:05d}",
+            'event_name': 'EthCC',
+            'meeting_location': 'Palais des Festivals',
+            'meeting_time': stamp,
+            'created_at': stamp,
+            'updated_at': stamp,
+            'other_user_id': 10000 + i,
+            'other_user': {
+                'user_id': 10000 + i,
+                'tg_id': 500000000 + i,
+                'username': f"builder_{i}",
+                'display_name': f"Builder {i}",
+                'project_name': 'LinkUp',
+                'role': 'Developer',
+                'description': 'Building privacy-preserving apps on Sapphire. ' * 3,
+                'profile_image_url': None,
+                'created_at': stamp,
+                'updated_at': stamp,
+            },
+        })
+    return {'groups': groups}
+
+
+def time_it(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    payload = build_payload(connections)
+
+    print(f"🔍 JSON benchmark: {connections} connections, {iterations} iterations")
+    results = {}
+    bodies = {}
+    for name in ('std', 'orjson'):
+        os.environ['API_JSON_PROVIDER'] = name
+        app = Flask(__name__)
+        init_json_provider(app, DefaultJSONProvider)
+        with app.app_context():
+            results[name] = time_it(lambda: app.json.response(payload).get_data(), iterations)
+            bodies[name] = app.json.response(payload).get_data()
+        print(f"📊 encode ({name:6}): {results[name] * 1000:7.2f} ms/response, {len(bodies[name]) / 1024:.0f} KiB")
+
+    body = bodies['orjson']
+    decode_std = time_it(lambda: json.loads(body), iterations)
+    decode_orjson = time_it(lambda: orjson.loads(body), iterations)
+    print(f"📊 decode (std   ): {decode_std * 1000:7.2f} ms/response")
+    print(f"📊 decode (orjson): {decode_orjson * 1000:7.2f} ms/response")
+    print(f"✅ encode {results['std'] / results['orjson']:.1f}x faster, "
+          f"decode {decode_std / decode_orjson:.1f}x faster with orjson")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Compare QR version, module count and render time for legacy and compact payloads
+
+Encodes one user's deep link in the legacy (start=user_<tg_id>) and compact
+(start=u<base-62 tg_id>) forms at the error correction level each renderer
+uses, and times the card and ETHCC renders of each. Runs offline from the
+repository root:
+
+    python tests/benchmarks/bench_qr_payload.py --bot linkup_event_bot --tg-id 5094393032
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'apis'))
+
+import qrcode
+
+from qr_render import create_card_style_qr, create_themed_qr, deep_link
+
+
+def matrix(payload, error_correction):
+    qr = qrcode.QRCode(error_correction=error_correction, border=4)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr.version, qr.modules_count
+
+
+def render_ms(render, payload, rounds):
+    render(payload)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        render(payload)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bot', default=os.getenv('BOT_USERNAME', 'linkup_event_bot'))
+    parser.add_argument('--tg-id', type=int, default=5094393032)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    payloads = {
+        'legacy': f"https://t.me/{args.bot}?start=user_{args.tg_id}",
+        'compact': deep_link(args.bot, args.tg_id),
+    }
+    renders = {
+        'card': lambda payload: create_card_style_qr(payload, 'alice'),
+        'ethcc': lambda payload: create_themed_qr(payload, 'alice', theme='ethcc'),
+    }
+
+    print(f"📊 {args.rounds} renders per theme")
+    for name, payload in payloads.items():
+        version, modules = matrix(payload, qrcode.constants.ERROR_CORRECT_H)
+        timings = '   '.join(f"{theme} {render_ms(render, payload, args.rounds):6.1f} ms"
+                             for theme, render in renders.items())
+        print(f"   {name:<8} {len(payload):3d} chars   version {version:2d} ({modules}x{modules})   {timings}")
+        print(f"            {payload}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark drawing the QR code at card size: make_image + LANCZOS vs cached matrix + NEAREST
+
+The legacy path encodes the payload, draws it at box_size=10 and LANCZOS-resizes
+the result to the card's QR size, as create_card_style_qr and create_themed_qr
+used to. The new path takes the matrix from qr_matrix() and rasterizes it with
+whole-pixel modules. Also counts grey pixels (neither pure black nor white),
+which blur module edges for scanners. Runs offline from the repository root:
+
+    python tests/benchmarks/bench_qr_raster.py --rounds 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'apis'))
+
+import qrcode
+from PIL import Image
+
+import qr_render
+from qr_render import deep_link, qr_matrix, rasterize_qr
+
+# Card QR size (42% of 675) and themed QR size (40% of 1000)
+SIZES = (283, 400)
+
+
+def legacy(payload, size):
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=0)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr.make_image(fill_color=(0, 0, 0), back_color='white').resize((size, size), Image.Resampling.LANCZOS)
+
+
+def uncached(payload, size):
+    qr_render._matrix_cache.clear()
+    return rasterize_qr(qr_matrix(payload, 'H'), size, fill_color=(0, 0, 0))
+
+
+def cached(payload, size):
+    return rasterize_qr(qr_matrix(payload, 'H'), size, fill_color=(0, 0, 0))
+
+
+def grey_pixels(image):
+    histogram = image.convert('L').histogram()
+    return sum(histogram[1:255])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bot', default=os.getenv('BOT_USERNAME', 'linkup_event_bot'))
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    payload = deep_link(args.bot, 5094393032)
+    print(f"📊 {args.rounds} draws per path, payload {payload}")
+    for size in SIZES:
+        print(f"   {size}x{size}")
+        baseline = None
+        for name, draw in (('legacy', legacy), ('matrix', uncached), ('cached', cached)):
+            draw(payload, size)
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                image = draw(payload, size)
+            elapsed = (time.perf_counter() - start) / args.rounds * 1000
+            baseline = baseline or elapsed
+            print(f"      {name:<7} {elapsed:6.2f} ms   {baseline / elapsed:5.1f}x   "
+                  f"grey pixels {grey_pixels(image):6d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
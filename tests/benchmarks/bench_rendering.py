@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Time every QR renderer at production sizes and check them against stored baselines
+
+Each case renders for a new user every round, so matrices and text sprites miss
+their caches as they would in production, while theme templates stay warm.
+Reports the median time and the peak RSS a single render adds (Linux only), and
+exits with 1 if either is more than --tolerance above
+tests/benchmarks/render_baselines.json. Needs only ethglobal.jpg and the bundled
+font; no network or database. Run from the repository root:
+
+    python tests/benchmarks/bench_rendering.py
+    python tests/benchmarks/bench_rendering.py --update   # re-record after an intended change
+
+Baselines are machine-specific. Record them on the machine that checks them.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'apis'))
+
+import PIL
+
+import qr_render
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'render_baselines.json')
+# Differences this small are noise (timer jitter, allocator rounding)
+TIME_SLACK_MS = 0.5
+MEMORY_SLACK_MB = 1.0
+# Peaks are measured in a child process where glibc always returns large
+# buffers to the OS. Otherwise a render reuses heap freed by the previous one
+# and its peak does not show in RSS.
+PEAK_ENV = {'MALLOC_MMAP_THRESHOLD_': '131072'}
+
+_users = itertools.count(5094393032)
+
+
+def new_user():
+    tg_id = next(_users)
+    return qr_render.deep_link('linkup_bot', tg_id), f"user{tg_id}"
+
+
+def card():
+    payload, username = new_user()
+    qr_render.create_card_style_qr(payload, username)
+
+
+def ethcc():
+    payload, username = new_user()
+    qr_render.create_themed_qr(payload, username)
+
+
+def ethcc_template():
+    qr_render.compile_theme_template('ethcc', 1000)
+
+
+def card_template():
+    qr_render.compile_card_template((1200, 675))
+
+
+def default_png():
+    qr_render.generate_qr_code_image(next(_users))
+
+
+def default_svg():
+    qr_render.generate_qr_code_svg(next(_users))
+
+
+def gradient():
+    qr_render.create_gradient_background(1000, 1000, qr_render.QR_THEMES['ethcc']['bg_colors'])
+
+
+def enhanced_gradient():
+    qr_render.create_enhanced_gradient_background(1000, 1000, qr_render.QR_THEMES['ethcc']['bg_colors'])
+
+
+def pattern_overlay():
+    from PIL import Image
+    qr_render.add_pattern_overlay(Image.new('RGB', (1000, 1000)), 'geometric')
+
+
+def enhanced_pattern_overlay():
+    from PIL import Image
+    qr_render.add_enhanced_pattern_overlay(Image.new('RGB', (1000, 1000)), 'ethcc')
+
+
+CASES = {function.__name__: function for function in (
+    card, ethcc, card_template, ethcc_template, default_png, default_svg,
+    gradient, enhanced_gradient, pattern_overlay, enhanced_pattern_overlay,
+)}
+
+
+def _status_kb(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def peak_mb(function):
+    """RSS a single call adds at its peak, or None where /proc cannot report it"""
+    try:
+        # Writing 5 resets VmHWM, the peak RSS, to the current RSS
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        before = _status_kb('VmRSS')
+    except (OSError, KeyError):
+        return None
+    function()
+    return (_status_kb('VmHWM') - before) / 1024
+
+
+def measure_ms(function, rounds):
+    function()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def measure_peaks(names):
+    """{case: peak MB or None}, from a child process running with PEAK_ENV"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--peaks'] + list(names),
+                            env=dict(os.environ, **PEAK_ENV), capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def print_peaks(names):
+    peaks = {}
+    for name in names:
+        # Load modules, fonts and templates first
+        CASES[name]()
+        peak = peak_mb(CASES[name])
+        peaks[name] = round(peak, 2) if peak is not None else None
+    print(json.dumps(peaks))
+
+
+def regressions(result, baseline, tolerance):
+    found = []
+    if result['ms'] > baseline['ms'] * (1 + tolerance) + TIME_SLACK_MS:
+        found.append(f"time {result['ms']:.1f} ms vs {baseline['ms']:.1f} ms")
+    if result['peak_mb'] is not None and baseline.get('peak_mb') is not None and \
+            result['peak_mb'] > baseline['peak_mb'] * (1 + tolerance) + MEMORY_SLACK_MB:
+        found.append(f"peak {result['peak_mb']:.1f} MB vs {baseline['peak_mb']:.1f} MB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown or growth over the baseline (0.25 = 25%%)')
+    parser.add_argument('--update', action='store_true', help='record these results as the new baselines')
+    parser.add_argument('--peaks', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('cases', nargs='*', metavar='case',
+                        help=f"cases to run (default: all of {', '.join(CASES)})")
+    args = parser.parse_args()
+    names = args.cases or list(CASES)
+    unknown = sorted(set(names) - set(CASES))
+    if unknown:
+        parser.error(f"unknown case: {', '.join(unknown)}")
+    if args.peaks:
+        print_peaks(names)
+        return 0
+
+    for path in (qr_render.CARD_BACKGROUND_PATH, qr_render.BUNDLED_FONT_PATH):
+        if not os.path.exists(path):
+            print(f"❌ Missing {path}; the renderers would fall back and the numbers would not compare")
+            return 2
+
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as f:
+            baselines = json.load(f)
+
+    results = {}
+    failed = False
+    print(f"📊 {args.rounds} rounds per case, tolerance {args.tolerance:.0%}")
+    peaks = measure_peaks(names)
+    for name in names:
+        result = results[name] = {'ms': measure_ms(CASES[name], args.rounds), 'peak_mb': peaks[name]}
+        peak = f"{result['peak_mb']:6.1f} MB" if result['peak_mb'] is not None else '     n/a'
+        baseline = baselines.get('cases', {}).get(name)
+        if args.update or baseline is None:
+            verdict = '📝'
+        else:
+            found = regressions(result, baseline, args.tolerance)
+            failed = failed or bool(found)
+            verdict = f"❌ {'; '.join(found)}" if found else '✅'
+        print(f"   {name:<25} {result['ms']:8.1f} ms   peak {peak}   {verdict}")
+
+    if args.update:
+        cases = dict(baselines.get('cases', {}), **results)
+        with open(BASELINES_PATH, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'pillow': PIL.__version__,
+                'machine': platform.machine(),
+                'cases': cases,
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"📝 Baselines written to {os.path.relpath(BASELINES_PATH)}")
+        return 0
+    if failed:
+        print("❌ Rendering regressed beyond the tolerance")
+        return 1
+    print("✅ Within baselines")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
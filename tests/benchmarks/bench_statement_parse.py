@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark statement parsing: formatted SQL on plain cursors vs cached prepared statements
+
+Requires a reachable MySQL configured through the MYSQL_* variables in .env.
+Run from the repository root:
+
+    python tests/benchmarks/bench_statement_parse.py [iterations]
+"""
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'apis'))
+
+import mysql.connector
+
+import db
+from constants import GET_USER_BY_TG_ID_QUERY
+
+load_dotenv()
+
+
+def server_counters(conn):
+    cursor = conn.cursor()
+    cursor.execute("SHOW SESSION STATUS WHERE Variable_name IN ('Com_select', 'Com_stmt_prepare', 'Com_stmt_execute')")
+    counters = {name: int(value) for name, value in cursor.fetchall()}
+    cursor.close()
+    return counters
+
+
+def run_formatted(conn, iterations):
+    """The old pattern: values formatted into a fresh SQL string per request"""
+    for i in range(iterations):
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f"SELECT * FROM users WHERE tg_id = {1000 + i % 50}")
+        cursor.fetchall()
+        cursor.close()
+
+
+def run_prepared(conn, iterations):
+    """The registry pattern: one prepared statement per connection, reused"""
+    for i in range(iterations):
+        db.fetch_all(conn, GET_USER_BY_TG_ID_QUERY, (1000 + i % 50,), dictionary=True)
+
+
+def measure(label, fn, iterations):
+    conn = mysql.connector.connect(**db.connection_config())
+    try:
+        before = server_counters(conn)
+        start = time.perf_counter()
+        fn(conn, iterations)
+        elapsed = time.perf_counter() - start
+        after = server_counters(conn)
+    finally:
+        conn.close()
+
+    delta = {name: after[name] - before.get(name, 0) for name in after}
+    print(f"📊 {label}")
+    print(f"   {iterations} queries in {elapsed * 1000:.1f} ms ({elapsed / iterations * 1e6:.0f} µs/query)")
+    print(f"   Com_select={delta.get('Com_select', 0)} "
+          f"Com_stmt_prepare={delta.get('Com_stmt_prepare', 0)} "
+          f"Com_stmt_execute={delta.get('Com_stmt_execute', 0)}")
+    return elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("🔍 Statement parse benchmark")
+    print(f"📡 MySQL: {os.getenv('MYSQL_HOST')}:{os.getenv('MYSQL_PORT')}")
+
+    try:
+        formatted = measure("Formatted SQL, plain cursor", run_formatted, iterations)
+        prepared = measure("Cached prepared statement", run_prepared, iterations)
+    except mysql.connector.Error as e:
+        print(f"❌ MySQL not reachable: {e}")
+        return 1
+
+    print(f"✅ Prepared statements: {formatted / prepared:.2f}x the throughput of formatted SQL")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Benchmark themed QR renders with and without the precompiled theme template
+
+"compile" times compile_theme_template(), the per-theme work every render used
+to repeat. "render" times create_themed_qr() once the template is cached,
+which only pastes the user's code and draws the text. Runs offline from the
+repository root:
+
+    python tests/benchmarks/bench_theme_template.py --rounds 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'apis'))
+
+from qr_render import QR_THEMES, compile_theme_template, create_themed_qr, deep_link
+
+
+def timed_ms(function, rounds):
+    function()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--size', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"📊 {args.rounds} rounds at {args.size}x{args.size}")
+    for theme in QR_THEMES:
+        compile_ms = timed_ms(lambda: compile_theme_template(theme, args.size), args.rounds)
+        tg_ids = iter(range(10 ** 9, 2 * 10 ** 9))
+        render_ms = timed_ms(lambda: create_themed_qr(deep_link('linkup_bot', next(tg_ids)), 'alice',
+                                                      theme=theme, size=args.size), args.rounds)
+        print(f"   {theme:<8} compile {compile_ms:6.1f} ms   render {render_ms:6.1f} ms   "
+              f"(was about {compile_ms + render_ms:.0f} ms per render)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
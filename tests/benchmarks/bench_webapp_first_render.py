@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Measure the webapp's time to first render in headless Chromium
+
+The webapp is loaded from webapp/ and every API call is answered from fixtures
+after a simulated network round trip, so no API server or database is needed.
+"First render" is when the profile role and the connections list are on screen.
+
+    pip install playwright && python -m playwright install chromium
+    python tests/benchmarks/bench_webapp_first_render.py --rtt 150 --runs 5
+
+Compare against the pre-bootstrap app.js with:
+
+    git show <commit>:webapp/app.js > /tmp/app_old.js
+    python tests/benchmarks/bench_webapp_first_render.py --app-js /tmp/app_old.js
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import sys
+
+try:
+    from playwright.async_api import async_playwright
+except ImportError:
+    async_playwright = None
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WEBAPP_DIR = os.path.join(ROOT, 'webapp')
+ORIGIN = 'http://localhost:8000'
+TG_ID = 1001
+
+TELEGRAM_STUB = """
+window.Telegram = {WebApp: {
+    ready() {}, expand() {}, themeParams: {},
+    initDataUnsafe: {user: {id: %d, first_name: 'Bench', last_name: 'User', username: 'bench'}}
+}};
+""" % TG_ID
+
+USER = {'user_id': 1, 'tg_id': TG_ID, 'username': 'bench', 'display_name': 'Bench User', 'role': 'Developer',
+        'project_name': 'LinkUp', 'description': 'Benchmarking', 'profile_image_url': None}
+COLUMNS = ['user_id', 'tg_id', 'username', 'display_name', 'role', 'project_name', 'description',
+           'profile_image_url', 'group_id', 'group_link', 'event_name', 'connected_at']
+CONNECTIONS = {
+    'columns': COLUMNS,
+    'rows': [[100 + i, 5000 + i, f"user{i}", f"User {i}", 'Dev', 'LinkUp', 'Hi', None, 50 - i,
+              f"https://t.me/+g{i}", 'EthCC', '2025-07-01T09:30:00'] for i in range(20)],
+    'next_before': None,
+}
+
+QR_SVG = ('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 29 29"><rect width="29" height="29" fill="#fff"/>'
+          '<path d="m4 4v1h7v-1z"/></svg>')
+
+FIRST_RENDER = """() => {
+    const role = document.getElementById('userRole');
+    const list = document.getElementById('connectionsList');
+    return role && role.textContent === 'Developer' && list && list.querySelector('.connection-card');
+}"""
+
+
+def qr_png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 300), 'white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def api_response(path):
+    """Status, content type and body for an API path"""
+    if path.startswith('/api/bootstrap'):
+        body = {'created': False, 'user': USER, 'connections': CONNECTIONS,
+                'qr': {'url': f"/api/generate-qr?tg_id={TG_ID}", 'svg_url': f"/api/generate-qr?tg_id={TG_ID}&format=svg"}}
+        return 200, 'application/json', json.dumps(body)
+    if path.startswith('/create-user'):
+        return 409, 'application/json', json.dumps({'error': 'User with this tg_id already exists'})
+    if path.startswith('/get-user-by-tg-id'):
+        return 200, 'application/json', json.dumps({'user': USER})
+    if path.startswith('/api/user-connections'):
+        return 200, 'application/json', json.dumps(CONNECTIONS)
+    if path.startswith('/api/generate-qr') and 'format=svg' in path:
+        return 200, 'image/svg+xml', QR_SVG
+    if path.startswith('/api/generate-qr'):
+        return 200, 'image/png', qr_png()
+    return 404, 'application/json', json.dumps({'error': 'not found'})
+
+
+async def measure_once(browser, rtt, app_js):
+    context = await browser.new_context()
+    page = await context.new_page()
+    api_requests = []
+
+    async def handle(route):
+        url = route.request.url
+        path = url[len(ORIGIN):] if url.startswith(ORIGIN) else url
+        if 'telegram.org' in url:
+            return await route.fulfill(status=200, content_type='application/javascript', body=TELEGRAM_STUB)
+        if path.startswith('/webapp/'):
+            name = path[len('/webapp/'):].split('?')[0] or 'index.html'
+            file_path = app_js if name == 'app.js' and app_js else os.path.join(WEBAPP_DIR, name)
+            if not os.path.exists(file_path):
+                return await route.fulfill(status=404, body='')
+            with open(file_path, 'rb') as f:
+                return await route.fulfill(status=200, body=f.read(), content_type={
+                    'html': 'text/html', 'js': 'application/javascript', 'css': 'text/css',
+                }.get(name.rsplit('.', 1)[-1], 'application/octet-stream'))
+        if url.startswith(ORIGIN):
+            api_requests.append(path.split('?')[0])
+            await asyncio.sleep(rtt / 1000)
+            status, content_type, body = api_response(path)
+            return await route.fulfill(status=status, content_type=content_type, body=body)
+        return await route.fulfill(status=204, body='')
+
+    await context.route('**/*', handle)
+    await page.goto(f"{ORIGIN}/webapp/")
+    await page.wait_for_function(FIRST_RENDER, polling='raf', timeout=30000)
+    elapsed = await page.evaluate('performance.now()')
+    await context.close()
+    return elapsed, api_requests
+
+
+async def run(args):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        timings = []
+        requests_made = []
+        for _ in range(args.runs):
+            elapsed, requests_made = await measure_once(browser, args.rtt, args.app_js)
+            timings.append(elapsed)
+        await browser.close()
+
+    print(f"📡 API requests before first render: {', '.join(requests_made)}")
+    print(f"📊 Time to first render over {args.runs} runs at {args.rtt:.0f} ms RTT: "
+          f"median {statistics.median(timings):.0f} ms, min {min(timings):.0f} ms, max {max(timings):.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Webapp time-to-first-render benchmark")
+    parser.add_argument('--rtt', type=float, default=150.0, help="simulated API round trip in ms")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--app-js', help="serve this app.js instead of webapp/app.js")
+    args = parser.parse_args()
+
+    if async_playwright is None:
+        print("❌ Playwright is not installed: pip install playwright && python -m playwright install chromium")
+        return 1
+
+    print("🔍 Webapp first render benchmark")
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
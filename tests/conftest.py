@@ -0,0 +1,22 @@
+"""
+Shared test setup: the API modules import each other by bare name, as they do
+when run from apis/, so that directory goes on sys.path for every test
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'apis'))
+
+
+@pytest.fixture
+def fresh_api_cache(monkeypatch):
+    """Give both API apps an empty user cache with zeroed counters"""
+    import linkup_api
+    import linkup_api_async
+    from user_cache import UserCache, LocalCacheBackend
+
+    for app_module in (linkup_api, linkup_api_async):
+        monkeypatch.setattr(app_module, 'user_cache', UserCache(LocalCacheBackend(), ttl=60))
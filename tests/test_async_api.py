@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Tests for the ASGI variant of the API
+"""
+
+import pytest
+
+import linkup_api_async
+
+ALICE = {'user_id': 7, 'tg_id': 1001, 'display_name': 'Alice'}
+
+pytestmark = pytest.mark.usefixtures('fresh_api_cache')
+
+
+@pytest.mark.asyncio
+async def test_get_user_by_tg_id_matches_sync_contract(monkeypatch):
+    """Same status codes and JSON shape as the Flask server"""
+    calls = []
+
+    async def loader(tg_id, conn=None):
+        calls.append(tg_id)
+        return dict(ALICE) if tg_id == 1001 else None
+
+    monkeypatch.setattr(linkup_api_async, 'load_user_by_tg_id', loader)
+    client = linkup_api_async.app.test_client()
+
+    response = await client.get('/get-user-by-tg-id?tg_id=1001')
+    assert response.status_code == 200
+    assert (await response.get_json()) == {'user': ALICE}
+    await client.get('/get-user-by-tg-id?tg_id=1001')
+    assert calls == [1001]
+
+    response = await client.get('/get-user-by-tg-id?tg_id=2002')
+    assert response.status_code == 404
+    assert (await response.get_json()) == {'error': 'User not found'}
+
+
+@pytest.mark.asyncio
+async def test_rejects_missing_and_non_numeric_ids():
+    client = linkup_api_async.app.test_client()
+    assert (await client.get('/get-user-by-tg-id')).status_code == 400
+    assert (await client.get('/get-user-by-tg-id?tg_id=1%20OR%201=1')).status_code == 400
+    assert (await client.get('/get-user-details?user_id=abc')).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_generate_qr_is_cached_with_strong_etag(monkeypatch, tmp_path):
+    from qr_cache import QRImageCache
+    monkeypatch.setattr(linkup_api_async, 'qr_cache', QRImageCache(str(tmp_path)))
+    renders = []
+    monkeypatch.setattr(linkup_api_async, 'render_qr', lambda qr, username: renders.append(qr) or b'png')
+    client = linkup_api_async.app.test_client()
+
+    response = await client.get('/api/generate-qr?tg_id=1001')
+    assert response.status_code == 200 and await response.get_data() == b'png'
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/') and 'max-age=' in response.headers['Cache-Control']
+    response = await client.get('/api/generate-qr?tg_id=1001', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert len(renders) == 1
+
+
+@pytest.mark.asyncio
+async def test_connection_events_stream_pushes_published_groups(monkeypatch):
+    from events import ConnectionEventHub
+    hub = ConnectionEventHub()
+    monkeypatch.setattr(linkup_api_async, 'connection_events', hub)
+
+    async def message(tg_id, after, upto, limit):
+        return f"id: {upto}\nevent: connection\ndata: {{}}\n\n"
+
+    monkeypatch.setattr(linkup_api_async, 'connection_event_message', message)
+    client = linkup_api_async.app.test_client()
+
+    async with client.request('/api/connection-events?tg_id=1001') as connection:
+        await connection.send_complete()
+        assert (await connection.receive()).startswith(b'retry:')
+        hub.publish(12, (1001, 2002))
+        assert (await connection.receive()) == b'id: 12\nevent: connection\ndata: {}\n\n'
+        await connection.disconnect()
+
+
+class FakeCursor:
+    def __init__(self, executed):
+        self.executed = executed
+        self.lastrowid = None
+        self.rowcount = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=()):
+        self.executed.append(sql)
+
+    async def fetchall(self):
+        return [dict(ALICE)] if self.executed[-1].lstrip().startswith('SELECT') else []
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+
+    def thread_id(self):
+        return 1
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self.executed)
+
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def acquire(self):
+        pool = self
+
+        class Borrow:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Borrow()
+
+
+@pytest.mark.asyncio
+async def test_pool_autocommits(monkeypatch):
+    """aiomysql closes connections released mid-transaction, so reads must not open one"""
+    import async_db
+    options = {}
+
+    async def create_pool(**kwargs):
+        options.update(kwargs)
+
+    monkeypatch.setattr(async_db.aiomysql, 'create_pool', create_pool)
+    await async_db.init_pool(1)
+    assert options['autocommit'] is True
+
+
+@pytest.mark.asyncio
+async def test_request_budget_limits_async_queries(monkeypatch):
+    """X-Request-Budget-Ms caps the queries of that request, as on the Flask server"""
+    import async_db
+    from constants import REQUEST_BUDGET_HEADER
+    pool = FakePool()
+    monkeypatch.setattr(async_db, '_pool', pool)
+    client = linkup_api_async.app.test_client()
+
+    response = await client.get('/get-user-by-tg-id?tg_id=1001', headers={REQUEST_BUDGET_HEADER: '2000'})
+    assert response.status_code == 200
+    limited, query = pool.conn.executed
+    assert 1000 < int(limited.rsplit('=', 1)[1]) <= 2000
+    assert query.lstrip().startswith('SELECT')
+
+    # Requests without the header get API_REQUEST_TIMEOUT, set once and then reused
+    pool.conn.executed.clear()
+    await client.get('/get-user-by-tg-id?tg_id=2002')
+    budget_ms = linkup_api_async.DEFAULT_REQUEST_BUDGET * 1000
+    assert 0.9 * budget_ms < int(pool.conn.executed[0].rsplit('=', 1)[1]) <= budget_ms
+    pool.conn.executed.clear()
+    await client.get('/get-user-by-tg-id?tg_id=3003')
+    assert len(pool.conn.executed) == 1
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the webapp's one-shot /api/bootstrap endpoint
+"""
+
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+import linkup_api
+
+USER = {'user_id': 1, 'tg_id': 1001, 'username': 'alice', 'display_name': 'Alice', 'updated_at': None}
+
+pytestmark = pytest.mark.usefixtures('fresh_api_cache')
+
+
+def bootstrap(client, rowcount=1, **body):
+    with patch.object(linkup_api, 'get_db_connection', return_value=MagicMock()), \
+            patch.object(linkup_api, 'run_statement', return_value={'lastrowid': 1, 'rowcount': rowcount}) as upsert, \
+            patch.object(linkup_api, 'fetch_one', return_value=USER), \
+            patch.object(linkup_api, 'fetch_all', return_value=[]) as fetch_all:
+        response = client.post('/api/bootstrap', json=body)
+    return response, upsert, fetch_all
+
+
+def test_bootstrap_returns_everything_for_first_render():
+    client = linkup_api.app.test_client()
+    response, upsert, fetch_all = bootstrap(client, tg_id=1001, username='alice', display_name='Alice', limit=20)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['created'] is True
+    assert data['user']['display_name'] == 'Alice'
+    assert data['connections'] == {'columns': data['connections']['columns'], 'rows': [], 'next_before': None}
+    assert data['qr'] == {'url': '/api/generate-qr?tg_id=1001', 'svg_url': '/api/generate-qr?tg_id=1001&format=svg'}
+    assert data['events_url'] is None
+    assert upsert.call_args.args[2] == (1001, 'alice', 'Alice', None)
+    assert fetch_all.call_args.args[2][-1] == 21
+
+
+def test_existing_user_and_skipped_upsert():
+    client = linkup_api.app.test_client()
+    response, _, _ = bootstrap(client, rowcount=0, tg_id=1001)
+    assert response.get_json()['created'] is False
+
+    response, upsert, _ = bootstrap(client, tg_id=1001, upsert=False)
+    assert response.status_code == 200 and not upsert.called
+
+
+def test_bad_arguments():
+    client = linkup_api.app.test_client()
+    assert client.post('/api/bootstrap', json={}).status_code == 400
+    assert client.post('/api/bootstrap', json={'tg_id': 'abc'}).status_code == 400
+    assert client.post('/api/bootstrap', json={'tg_id': 1001, 'limit': 0}).status_code == 400
@@ -34,6 +34,7 @@ def mock_context():
     context.bot.send_message = AsyncMock()
     context.bot.get_me = AsyncMock()
     context.bot.get_me.return_value = Mock(username="test_bot")
+    context.bot.username = "test_bot"
     context.args = []
     context.user_data = {}
     return context
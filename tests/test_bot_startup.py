@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the bot's background warm-up at startup
+"""
+
+import asyncio
+import subprocess
+import sys
+from unittest.mock import Mock, AsyncMock, patch
+
+import pytest
+
+import bot
+from telegram_api import TelegramAPIClient
+
+
+def test_import_does_not_load_pyrogram():
+    probe = "import sys, bot; print('pyrogram' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True,
+                            cwd=bot.os.path.dirname(bot.__file__))
+    assert result.stdout.strip() == 'False'
+
+
+@pytest.mark.asyncio
+async def test_initialize_app_returns_before_warm_up_finishes():
+    login = asyncio.Event()
+
+    async def slow_login():
+        await login.wait()
+        return True
+
+    application = Mock(bot_data={})
+    with patch.object(bot, 'initialize_telegram_api', side_effect=slow_login), \
+            patch.object(bot, 'set_bot_commands', AsyncMock()) as set_commands, \
+            patch.object(bot, 'warm_up_qr_rendering') as render, \
+            patch.object(bot.api_client, 'warm_up'), \
+            patch.object(bot, 'telegram_api', TelegramAPIClient()):
+        await bot.initialize_app(application)
+        task = application.bot_data['warm_up']
+        await asyncio.sleep(0.05)
+        # Commands and caches are done while MTProto is still logging in
+        assert not task.done()
+        set_commands.assert_awaited_once_with(application)
+        render.assert_called_once()
+        assert bot.group_creation_warming_up()
+
+        login.set()
+        await task
+
+
+@pytest.mark.asyncio
+async def test_group_creation_says_warming_up():
+    query = Mock(from_user=Mock(id=1001), edit_message_text=AsyncMock())
+    profile = {'user_id': 7, 'name': 'Alice', 'role': 'Dev', 'project': 'LinkUp'}
+    starting = TelegramAPIClient()
+    starting.is_starting = True
+    with patch.object(bot, 'telegram_api', starting), \
+            patch.object(bot, 'get_user_profile', AsyncMock(return_value=profile)), \
+            patch.object(bot, 'check_connection_exists', AsyncMock(return_value=False)):
+        await bot.create_instant_group(query, Mock(), 2002)
+    query.edit_message_text.assert_awaited_once_with(bot.GROUP_CREATION_WARMING_UP_MESSAGE)
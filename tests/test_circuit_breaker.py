@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the API client's circuit breaker and GET retries
+"""
+
+from unittest.mock import patch, MagicMock
+
+import pytest
+import requests
+
+from api_client import LinkUpAPIClient, CircuitBreaker, ServiceBusy
+
+
+def response(status_code, content=b'{"user":{"user_id":7}}'):
+    return MagicMock(status_code=status_code, headers={}, content=content, text='')
+
+
+@pytest.fixture
+def api():
+    client = LinkUpAPIClient('http://api')
+    client.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    # No real backoff in tests
+    with patch('api_client.time.sleep'):
+        yield client
+
+
+def test_get_is_retried_after_a_gateway_error(api):
+    with patch('api_client.requests.request', side_effect=[response(503), response(200)]) as request:
+        assert api.get_user_by_tg_id(1001) == {'user': {'user_id': 7}}
+    assert request.call_count == 2
+    assert api.stats() == {'circuit': api.breaker.stats(), 'retried': 1}
+    assert api.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_writes_are_not_retried(api):
+    with patch('api_client.requests.request', side_effect=requests.exceptions.ConnectionError('refused')) as request:
+        assert api.create_user(1001, username='alice') is None
+    assert request.call_count == 1
+
+
+def test_not_found_is_an_answer_not_a_failure(api):
+    with patch('api_client.requests.request', return_value=response(404)):
+        for _ in range(5):
+            assert api.get_user_by_tg_id(1001) is None
+    assert api.breaker.stats()['failures'] == 0
+
+
+def test_retried_get_counts_once_toward_the_breaker(api):
+    with patch('api_client.requests.request', side_effect=requests.exceptions.ConnectionError('refused')) as request:
+        assert api.get_user_by_tg_id(1001) is None
+    assert request.call_count == 3
+    assert api.breaker.stats()['failures'] == 1 and api.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_timeouts_are_not_retried(api):
+    with patch('api_client.requests.request', side_effect=requests.exceptions.Timeout('slow')) as request:
+        assert api.get_user_by_tg_id(1001) is None
+    assert request.call_count == 1
+
+
+def test_retries_share_one_timeout_without_a_deadline(api):
+    """Outside a deadline() block, every attempt comes out of the same api.timeout"""
+    api.timeout = 1
+    clock = iter(range(100))
+    with patch('api_client.time.monotonic', side_effect=lambda: next(clock)), \
+            patch('api_client.requests.request', side_effect=requests.exceptions.ConnectionError('refused')) as request:
+        assert api.get_user_by_tg_id(1001) is None
+    assert request.call_count == 1
+
+
+def test_open_circuit_fails_fast(api):
+    """After enough failed calls the rest are refused without touching the network"""
+    with patch('api_client.requests.request', side_effect=requests.exceptions.ConnectionError('refused')) as request:
+        for _ in range(3):
+            assert api.get_user_by_tg_id(1001) is None
+        assert request.call_count == 9
+        with pytest.raises(ServiceBusy):
+            api.get_user_by_tg_id(1001)
+        assert request.call_count == 9
+    stats = api.breaker.stats()
+    assert stats['state'] == CircuitBreaker.OPEN
+    assert stats['opened'] == 1
+    assert stats['rejected'] == 1
+
+
+def test_probe_that_raises_reopens_the_circuit(api):
+    """A probe failing outside requests must not leave the circuit waiting on it"""
+    api.breaker.record_failure()
+    api.breaker.record_failure()
+    api.breaker.record_failure()
+    with patch('api_client.time.monotonic', return_value=api.breaker._opened_at + 31), \
+            patch('api_client.requests.request', side_effect=ValueError('bad header')):
+        with pytest.raises(ValueError):
+            api.get_user_by_tg_id(1001)
+    assert api.breaker.state == CircuitBreaker.OPEN and not api.breaker._probing
+
+    with patch('api_client.time.monotonic', return_value=api.breaker._opened_at + 31), \
+            patch('api_client.requests.request', return_value=response(200)):
+        assert api.get_user_by_tg_id(1001) == {'user': {'user_id': 7}}
+    assert api.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    with patch('api_client.time.monotonic', return_value=breaker._opened_at + 31):
+        assert breaker.allow()
+        # Others keep failing fast while the probe is out
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+    with patch('api_client.time.monotonic', return_value=breaker._opened_at + 31):
+        assert breaker.allow()
+        breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    assert breaker.stats()['probes'] == 2
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for the live new-connection stream behind /api/connection-events
+"""
+
+import threading
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+import linkup_api
+from events import ConnectionEventHub, sse_message
+
+STAMP = datetime(2025, 7, 1, 9, 30)
+
+
+def connection_row(group_id):
+    return (100 + group_id, 5000 + group_id, f"user{group_id}", f"User {group_id}", 'Dev', 'LinkUp', 'Hi',
+            None, group_id, f"https://t.me/+g{group_id}", 'EthCC', STAMP, STAMP, STAMP)
+
+
+@pytest.fixture(autouse=True)
+def fresh_hub(monkeypatch):
+    hub = ConnectionEventHub()
+    monkeypatch.setattr(linkup_api, 'connection_events', hub)
+    monkeypatch.setattr(linkup_api, 'stream_slots', threading.BoundedSemaphore(2))
+    return hub
+
+
+def test_publish_reaches_only_the_participants_once(fresh_hub):
+    received = {1001: [], 2002: [], 3003: []}
+    subscriptions = [fresh_hub.subscribe(tg_id, received[tg_id].append) for tg_id in received]
+
+    fresh_hub.publish(7, (1001, 2002))
+    fresh_hub.publish(7, (1001, 2002))
+    assert received == {1001: [7], 2002: [7], 3003: []}
+
+    fresh_hub.unsubscribe(subscriptions[0])
+    fresh_hub.publish(8, (1001, 2002))
+    assert received[1001] == [7] and received[2002] == [7, 8]
+    assert fresh_hub.stats()['streams'] == 2
+
+
+def test_poller_picks_up_groups_from_other_processes(fresh_hub):
+    received = []
+    fresh_hub.subscribe(1001, received.append)
+    fresh_hub.set_loaders(lambda after, limit: [(41, 1001, 2002), (42, 3003, 1001)] if after < 41 else [],
+                          lambda: 40)
+    fresh_hub.poll_once()
+    assert received == []
+    fresh_hub.poll_once()
+    fresh_hub.poll_once()
+    assert received == [41, 42]
+
+
+def test_hub_answers_polls_from_memory_once_current(fresh_hub):
+    assert fresh_hub.has_news(1001, 40) is None
+    fresh_hub.set_loaders(lambda after, limit: [], lambda: 40)
+    fresh_hub.poll_once()
+    fresh_hub.poll_once()
+    assert fresh_hub.position() == 40
+    assert fresh_hub.has_news(1001, 40) is False
+    # Below where the hub started watching, only the database knows
+    assert fresh_hub.has_news(1001, 30) is None
+
+    fresh_hub.publish(41, (1001, 2002))
+    assert fresh_hub.has_news(1001, 40) is True and fresh_hub.has_news(3003, 40) is False
+
+
+def watched_hub(hub, latest=40):
+    hub.set_loaders(lambda after, limit: [], lambda: latest)
+    hub.watch(60)
+    hub.poll_once()
+    hub.poll_once()
+    return hub
+
+
+def test_sse_message_format():
+    assert sse_message('{"a":1}', event='connection', event_id=9) == 'id: 9\nevent: connection\ndata: {"a":1}\n\n'
+
+
+def test_create_group_publishes_to_both_users(fresh_hub):
+    received = []
+    fresh_hub.subscribe(5002, received.append)
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'get_db_connection', return_value=MagicMock()), \
+            patch.object(linkup_api, 'fetch_one', side_effect=[(1, 5001), (2, 5002)]), \
+            patch.object(linkup_api, 'run_statement', return_value={'lastrowid': 77, 'rowcount': 1}):
+        response = client.post('/create-group', json={'group_link': 'https://t.me/+x', 'user1_id': 1, 'user2_id': 2})
+    assert response.status_code == 201 and received == [77]
+
+
+def test_stream_replays_then_pushes_new_connections(fresh_hub):
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'get_db_connection', return_value=MagicMock()), \
+            patch.object(linkup_api, 'fetch_all', side_effect=[[connection_row(9), connection_row(4)],
+                                                               [connection_row(12)]]):
+        response = client.get('/api/connection-events?tg_id=1001', headers={'Last-Event-ID': '5'}, buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'retry:')
+
+        replay = next(chunks).decode()
+        assert replay.startswith('id: 9\nevent: connection\n')
+        assert '"user9"' in replay and '"user4"' not in replay
+
+        fresh_hub.publish(12, (1001, 2002))
+        assert next(chunks).decode().startswith('id: 12\n')
+        response.close()
+    assert fresh_hub.stats()['streams'] == 0
+
+
+def test_streams_beyond_the_cap_are_answered_as_polls(monkeypatch, fresh_hub):
+    monkeypatch.setattr(linkup_api, 'stream_slots', threading.BoundedSemaphore(1))
+    linkup_api.stream_slots.acquire()
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'get_db_connection', return_value=MagicMock()), \
+            patch.object(linkup_api, 'fetch_all', return_value=[connection_row(9)]):
+        response = client.get('/api/connection-events?tg_id=1001', headers={'Last-Event-ID': '5'})
+    # A 200 that ends keeps EventSource reconnecting; it holds no thread or subscription
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert body.startswith(f"retry: {linkup_api.EVENTS_POLL_RETRY_MS}\n\n") and 'id: 9\n' in body
+    assert fresh_hub.stats()['streams'] == 0
+    assert client.get('/api/connection-events?tg_id=abc').status_code == 400
+
+
+def test_polls_without_news_skip_the_database(monkeypatch, fresh_hub):
+    watched_hub(fresh_hub)
+    monkeypatch.setattr(linkup_api, 'stream_slots', threading.BoundedSemaphore(1))
+    linkup_api.stream_slots.acquire()
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'fetch_all') as fetch_all:
+        body = client.get('/api/connection-events?tg_id=1001', headers={'Last-Event-ID': '40'}).get_data(as_text=True)
+    assert body == f"retry: {linkup_api.EVENTS_POLL_RETRY_MS}\n\n" and not fetch_all.called
+    assert fresh_hub.stats()['answered_from_memory'] == 1
+
+
+def test_poll_moves_an_old_client_up_to_the_hub(monkeypatch, fresh_hub):
+    """A client far behind is queried once, then told where the hub's memory starts"""
+    watched_hub(fresh_hub)
+    monkeypatch.setattr(linkup_api, 'stream_slots', threading.BoundedSemaphore(1))
+    linkup_api.stream_slots.acquire()
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'get_db_connection', return_value=MagicMock()), \
+            patch.object(linkup_api, 'fetch_all', return_value=[connection_row(9)]) as fetch_all:
+        body = client.get('/api/connection-events?tg_id=1001', headers={'Last-Event-ID': '5'}).get_data(as_text=True)
+    assert fetch_all.call_count == 1
+    # The bare id comes first, so Last-Event-ID ends at the replayed group
+    assert body.index('id: 40\n\n') < body.index('id: 9\n')
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests for the API's connection pool and per-connection prepared statement cache
+"""
+
+import os
+
+import pytest
+
+import db
+from constants import GET_USER_BY_TG_ID_QUERY, UPDATE_USER_QUERY
+
+
+class FakeCursor:
+    def __init__(self, prepared):
+        self.prepared = prepared
+        self.executed = []
+        self.closed = False
+        self.lastrowid = 1
+        self.rowcount = 1
+
+    def execute(self, sql, params):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return [{'user_id': 1}]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, connection_id=1):
+        self.connection_id = connection_id
+        self.cursors = []
+
+    def cursor(self, prepared=False, dictionary=False):
+        cursor = FakeCursor(prepared)
+        self.cursors.append(cursor)
+        return cursor
+
+
+@pytest.fixture(autouse=True)
+def prepared_statements(monkeypatch):
+    monkeypatch.setenv('MYSQL_PREPARED_STATEMENTS', '1')
+
+
+def test_statement_is_prepared_once_per_connection():
+    """Repeated queries reuse the same prepared cursor and statement object"""
+    conn = FakeConnection()
+    for tg_id in (1, 2, 3):
+        db.fetch_one(conn, GET_USER_BY_TG_ID_QUERY, (tg_id,), dictionary=True)
+
+    assert len(conn.cursors) == 1
+    executed = conn.cursors[0].executed
+    assert [params for _, params in executed] == [(1,), (2,), (3,)]
+    # Same string object every time so the connector skips re-preparing
+    assert all(sql is executed[0][0] for sql, _ in executed)
+
+
+def test_reconnected_session_prepares_again():
+    """A new server session does not reuse cursors from the old one"""
+    conn = FakeConnection(connection_id=1)
+    db.fetch_one(conn, GET_USER_BY_TG_ID_QUERY, (1,))
+    conn.connection_id = 2
+    db.fetch_one(conn, GET_USER_BY_TG_ID_QUERY, (1,))
+    assert len(conn.cursors) == 2
+
+
+def test_least_recently_used_statement_is_closed(monkeypatch):
+    """Statements beyond the per-connection limit are closed"""
+    monkeypatch.setattr(db, 'MAX_STATEMENTS_PER_CONNECTION', 2)
+    conn = FakeConnection()
+    for fields in ('display_name = %s', 'role = %s', 'description = %s'):
+        db.run_statement(conn, UPDATE_USER_QUERY.format(set_fields=fields), ('x', 1))
+
+    assert conn.cursors[0].closed
+    assert not conn.cursors[2].closed
+
+
+def test_plain_cursors_when_disabled(monkeypatch):
+    """MYSQL_PREPARED_STATEMENTS=0 uses and closes plain cursors"""
+    monkeypatch.setenv('MYSQL_PREPARED_STATEMENTS', '0')
+    conn = FakeConnection()
+    db.fetch_all(conn, GET_USER_BY_TG_ID_QUERY, (1,))
+    assert not conn.cursors[0].prepared and conn.cursors[0].closed
+
+
+def test_parse_user_fields_orders_and_validates():
+    """?fields= is normalized to table order so each field set has one statement text"""
+    assert db.parse_user_fields('tg_id, user_id') == ['user_id', 'tg_id']
+    assert db.parse_user_fields('') is None
+    assert db.user_columns_sql(['user_id', 'tg_id'], 'u') == 'u.user_id, u.tg_id'
+    with pytest.raises(ValueError, match='password'):
+        db.parse_user_fields('user_id,password')
+
+
+def test_pooled_connections_autocommit(monkeypatch):
+    """Pooled connections are not reset on release, so they must not hold a transaction open"""
+    created = {}
+    monkeypatch.setattr(db, 'MySQLConnectionPool', lambda **kwargs: created.update(kwargs))
+    for name in ('_pool', '_pool_pid', '_pool_size'):
+        monkeypatch.setattr(db, name, None)
+    db.init_pool(1)
+    assert created['autocommit'] is True and created['pool_reset_session'] is False
+    assert db.connection_config()['autocommit'] is True
+
+
+@pytest.mark.skipif(not os.getenv('MYSQL_HOST'), reason='needs a MySQL server (MYSQL_HOST)')
+def test_pooled_read_sees_rows_committed_elsewhere(monkeypatch):
+    """A pooled connection that only read still sees rows inserted by another session"""
+    import mysql.connector
+
+    for name in ('_pool', '_pool_pid', '_pool_size'):
+        monkeypatch.setattr(db, name, None)
+    # One pooled connection, so the second read reuses the first's session
+    db.init_pool(1)
+    writer = mysql.connector.connect(**db.connection_config())
+    cursor = writer.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS linkup_visibility_test (id INT PRIMARY KEY)")
+    cursor.execute("DELETE FROM linkup_visibility_test")
+    try:
+        count_query = "SELECT COUNT(*) FROM linkup_visibility_test"
+        conn = db.get_db_connection()
+        assert db.fetch_one(conn, count_query) == (0,)
+        conn.close()
+
+        cursor.execute("INSERT INTO linkup_visibility_test (id) VALUES (1)")
+        conn = db.get_db_connection()
+        assert db.fetch_one(conn, count_query) == (1,)
+        conn.close()
+    finally:
+        cursor.execute("DROP TABLE linkup_visibility_test")
+        cursor.close()
+        writer.close()
+        db.close_pool()
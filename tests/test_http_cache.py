@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for API response compression and conditional GETs
+"""
+
+import gzip
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+import linkup_api
+from api_client import LinkUpAPIClient
+
+ALICE = {'user_id': 7, 'tg_id': 1001, 'display_name': 'Alice', 'description': 'x' * 2000,
+         'updated_at': datetime(2025, 7, 1, 9, 30)}
+
+pytestmark = pytest.mark.usefixtures('fresh_api_cache')
+
+
+def test_etag_and_not_modified():
+    """A matching If-None-Match gets an empty 304; a changed row gets a new tag"""
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'load_user_by_tg_id', return_value=dict(ALICE)):
+        first = client.get('/get-user-by-tg-id?tg_id=1001')
+        etag = first.headers['ETag']
+        assert first.headers['Cache-Control'] == 'no-cache'
+
+        again = client.get('/get-user-by-tg-id?tg_id=1001', headers={'If-None-Match': etag})
+        assert again.status_code == 304 and again.get_data() == b''
+
+        projected = client.get('/get-user-by-tg-id?tg_id=1001&fields=user_id', headers={'If-None-Match': etag})
+        assert projected.status_code == 200
+
+    linkup_api.user_cache.clear()
+    changed = dict(ALICE, updated_at=datetime(2025, 7, 2))
+    with patch.object(linkup_api, 'load_user_by_tg_id', return_value=changed):
+        assert client.get('/get-user-by-tg-id?tg_id=1001', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_large_responses_are_compressed():
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'load_user_by_tg_id', return_value=dict(ALICE)):
+        response = client.get('/get-user-by-tg-id?tg_id=1001', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'"display_name":"Alice"' in gzip.decompress(response.get_data())
+
+    small = client.get('/get-user-by-tg-id', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_client_revalidates_with_etag():
+    """The API client sends If-None-Match and reuses its stored body on 304"""
+    api = LinkUpAPIClient('http://api')
+    ok = MagicMock(status_code=200, headers={'ETag': 'W/"v1"'}, content=b'{"user":{"user_id":7}}')
+    not_modified = MagicMock(status_code=304, headers={'ETag': 'W/"v1"'}, content=b'')
+    with patch('api_client.requests.request', side_effect=[ok, not_modified]) as request:
+        assert api.get_user_by_tg_id(1001) == {'user': {'user_id': 7}}
+        assert api.get_user_by_tg_id(1001) == {'user': {'user_id': 7}}
+    assert request.call_args_list[1].kwargs['headers'] == {'If-None-Match': 'W/"v1"'}
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the API client's in-process transport
+"""
+
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+import linkup_api
+from api_client import LinkUpAPIClient, InProcessTransport
+
+ALICE = {'user_id': 7, 'tg_id': 1001, 'display_name': 'Alice', 'updated_at': datetime(2025, 7, 1, 9, 30)}
+
+pytestmark = pytest.mark.usefixtures('fresh_api_cache')
+
+
+@pytest.fixture
+def api():
+    return LinkUpAPIClient('http://api', transport=InProcessTransport(linkup_api.app))
+
+
+def test_same_shapes_as_http(api):
+    """Responses decode exactly as they would over HTTP"""
+    with patch.object(linkup_api, 'load_user_by_tg_id', return_value=dict(ALICE)), \
+            patch('api_client.requests.request') as http:
+        assert api.get_user_by_tg_id(1001, fields=['user_id', 'display_name']) == \
+            {'user': {'user_id': 7, 'display_name': 'Alice'}}
+        assert api.get_user_by_tg_id(1001)['user']['updated_at'] == '2025-07-01T09:30:00'
+    http.assert_not_called()
+
+
+def test_revalidation_and_not_found(api):
+    with patch.object(linkup_api, 'load_user_by_tg_id', return_value=dict(ALICE)) as load:
+        first = api.get_user_by_tg_id(1001)
+        # The second call is answered with a 304 and the stored body
+        assert api.get_user_by_tg_id(1001) == first
+    assert load.call_count == 1
+
+    with patch.object(linkup_api, 'load_user_by_tg_id', return_value=None):
+        assert api.get_user_by_tg_id(2002) is None
+
+
+def test_budget_reaches_the_app(api):
+    budgets = []
+    with patch.object(linkup_api, 'set_statement_budget', side_effect=budgets.append), \
+            patch.object(linkup_api, 'load_user_by_tg_id', return_value=dict(ALICE)):
+        with api.deadline(5):
+            api.get_user_by_tg_id(1001)
+    assert 0 < budgets[0] <= 5 and budgets[-1] is None
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Tests for the API's orjson JSON provider
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+from flask import Flask, jsonify, request
+
+from json_provider import init_json_provider
+
+
+def make_app(monkeypatch, provider):
+    monkeypatch.setenv('API_JSON_PROVIDER', provider)
+    app = Flask(__name__)
+    assert init_json_provider(app) == provider
+
+    @app.route('/row', methods=['GET', 'POST'])
+    def row():
+        if request.method == 'POST':
+            return jsonify(request.get_json())
+        return jsonify({'b': 1, 'a': datetime(2025, 7, 1, 9, 30, 15), 'price': Decimal('1.50')})
+
+    return app
+
+
+def test_datetimes_are_iso_8601(monkeypatch):
+    client = make_app(monkeypatch, 'orjson').test_client()
+    response = client.get('/row')
+    assert response.mimetype == 'application/json'
+    assert response.get_data() == b'{"a":"2025-07-01T09:30:15","b":1,"price":"1.50"}\n'
+
+
+def test_request_bodies_round_trip(monkeypatch):
+    client = make_app(monkeypatch, 'orjson').test_client()
+    assert client.post('/row', json={'tg_id': 1001, 'name': 'Zoë'}).get_json() == {'tg_id': 1001, 'name': 'Zoë'}
+
+
+def test_unknown_provider_falls_back_to_std(monkeypatch):
+    monkeypatch.setenv('API_JSON_PROVIDER', 'nope')
+    assert init_json_provider(Flask(__name__)) == 'std'
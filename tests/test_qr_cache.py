@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk QR image cache behind /api/generate-qr
+"""
+
+import os
+import re
+import threading
+from unittest.mock import patch
+
+import pytest
+
+import linkup_api
+from qr_cache import QRImageCache, QRRequest, parse_qr_args, render_qr
+from qr_render import start_payload
+
+pytestmark = pytest.mark.usefixtures('fresh_api_cache')
+
+
+@pytest.fixture(autouse=True)
+def fresh_qr_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(linkup_api, 'qr_cache', QRImageCache(str(tmp_path)))
+
+
+def test_parse_qr_args():
+    assert parse_qr_args({'tg_id': '1001'}) == QRRequest(1001, 'default', None)
+    assert parse_qr_args({'tg_id': '1001', 'theme': 'card', 'color': '#ff8000'}).color == (255, 128, 0)
+    # The ETHCC palette is fixed, so colour does not split its cache entries
+    assert parse_qr_args({'tg_id': '1001', 'theme': 'ethcc', 'color': '#ff8000'}).color is None
+    assert parse_qr_args({'tg_id': '1001', 'format': 'svg'}).mimetype == 'image/svg+xml'
+    for args in ({}, {'tg_id': 'abc'}, {'tg_id': '1', 'theme': 'tech'}, {'tg_id': '1', 'color': 'red'},
+                 {'tg_id': '1', 'format': 'gif'}, {'tg_id': '1', 'theme': 'card', 'format': 'svg'}):
+        with pytest.raises(ValueError):
+            parse_qr_args(args)
+
+
+def test_concurrent_misses_render_once(tmp_path):
+    cache = QRImageCache(str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def render():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b'png'
+
+    first = cache.submit('k', render)
+    started.wait(5)
+    second = cache.submit('k', render)
+    release.set()
+    assert first is second and first.result(5) == second.result(5)
+    assert len(calls) == 1
+
+    # A new process-level cache finds the file on disk
+    path, etag = QRImageCache(str(tmp_path)).lookup('k')
+    assert open(path, 'rb').read() == b'png' and etag == first.result()[1]
+
+
+def test_file_removed_by_another_worker_is_rendered_again(tmp_path):
+    cache = QRImageCache(str(tmp_path))
+    path, etag = cache.get('k', lambda: b'png')
+    os.remove(path)
+    assert cache.lookup('k') is None
+    assert cache.get('k', lambda: b'png') == (path, etag) and os.path.exists(path)
+    assert cache.stats()['renders'] == 2
+
+
+def test_eviction_removes_the_least_recently_used_files_in_the_directory(tmp_path):
+    for age, key in enumerate(('a', 'b', 'c')):
+        (tmp_path / key).write_bytes(b'png')
+        os.utime(tmp_path / key, (1000 + age, 1000 + age))
+    # A hit in one worker keeps 'a' over 'b' and 'c' when another worker evicts
+    QRImageCache(str(tmp_path), max_files=2).lookup('a')
+    other = QRImageCache(str(tmp_path), max_files=2)
+    other.get('d', lambda: b'png')
+    assert sorted(os.listdir(tmp_path)) == ['a', 'd']
+    assert other.stats()['evictions'] == 2
+
+
+def test_key_changes_with_the_bot_username(monkeypatch):
+    qr = QRRequest(1001, 'card', None)
+    monkeypatch.setenv('BOT_USERNAME', 'linkup_bot')
+    before = qr.key('alice')
+    monkeypatch.setenv('BOT_USERNAME', 'linkup_test_bot')
+    assert qr.key('alice') != before
+
+
+def test_endpoint_serves_cached_images_with_strong_etags():
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'render_qr', return_value=b'\x89PNG fake') as render:
+        response = client.get('/api/generate-qr?tg_id=1001&color=%23ff0000')
+        etag = response.headers['ETag']
+        assert response.status_code == 200 and response.data == b'\x89PNG fake'
+        assert not etag.startswith('W/')
+        assert 'public' in response.headers['Cache-Control'] and 'max-age=' in response.headers['Cache-Control']
+
+        assert client.get('/api/generate-qr?tg_id=1001&color=%23ff0000',
+                          headers={'If-None-Match': etag}).status_code == 304
+        assert client.get('/api/generate-qr?tg_id=1001&color=%23ff0000').data == b'\x89PNG fake'
+    assert render.call_count == 1
+    assert client.get('/api/generate-qr?tg_id=1001&theme=tech').status_code == 400
+
+
+def test_named_themes_include_the_username():
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'load_user_by_tg_id', return_value={'user_id': 1, 'tg_id': 1001, 'username': 'alice'}), \
+            patch.object(linkup_api, 'render_qr', return_value=b'card') as render:
+        assert client.get('/api/generate-qr?tg_id=1001&theme=card').status_code == 200
+    assert render.call_args.args[1] == 'alice'
+
+
+def test_svg_encodes_the_same_modules_as_the_png():
+    """The path's runs, replayed, give back the QR module matrix"""
+    import qrcode
+    svg = render_qr(QRRequest(1001, 'default', (255, 0, 0), 'svg')).decode('utf-8')
+    assert len(svg) < 2048 and 'fill="#ff0000"' in svg
+
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, border=4)
+    qr.add_data(start_payload(1001))
+    qr.make(fit=True)
+    size = len(qr.modules) + 8
+    assert f'viewBox="0 0 {size} {size}"' in svg
+
+    modules = [[False] * size for _ in range(size)]
+    x = y = 0
+    for dx, dy, width in re.findall(r'm(-?\d+) (-?\d+)v1h(\d+)v-1z', re.search(r' d="([^"]+)"', svg).group(1)):
+        x, y = x + int(dx), y + int(dy)
+        for column in range(x, x + int(width)):
+            modules[y][column] = True
+    assert [row[4:-4] for row in modules[4:-4]] == [list(row) for row in qr.modules]
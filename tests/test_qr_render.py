@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared QR rendering module
+"""
+
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+import qr_render
+
+API_DIR = os.path.dirname(qr_render.__file__)
+
+
+def test_import_is_lightweight():
+    """Importing the module (and the API's QR cache) loads neither Pillow nor the bot"""
+    probe = "import sys, qr_cache; print(sorted(m for m in ('PIL', 'qrcode', 'bot', 'telegram') if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', probe], cwd=API_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_renders_cards_and_codes():
+    assert qr_render.create_card_style_qr('https://t.me/linkup_bot?start=user_1001', 'alice').size == (1200, 675)
+    assert qr_render.create_themed_qr('https://t.me/linkup_bot?start=user_1001', 'alice', size=400).size == (400, 400)
+    assert qr_render.generate_qr_code_image(1001) is not None
+
+
+def test_payload_round_trip_and_legacy_forms():
+    assert qr_render.start_payload(5094393032) == 'u5YlYLY'
+    for tg_id in (0, 61, 62, 5094393032, 2 ** 63):
+        assert qr_render.parse_qr_payload(qr_render.deep_link('linkup_bot', tg_id)) == tg_id
+    for legacy in ('user_5094393032', 'https://t.me/linkup_bot?start=user_5094393032',
+                   'LinkUp://user/5094393032', '5094393032'):
+        assert qr_render.parse_qr_payload(legacy) == 5094393032
+    for invalid in ('u', 'u5Yl-Y', 'user_abc', 'hello'):
+        with pytest.raises(ValueError):
+            qr_render.parse_qr_payload(invalid)
+
+
+def test_matrix_is_cached_and_drawn_with_whole_modules():
+    payload = qr_render.deep_link('linkup_bot', 5094393032)
+    modules = qr_render.qr_matrix(payload)
+    assert qr_render.qr_matrix(payload) is modules
+    assert qr_render.qr_matrix(payload, 'L') is not modules
+
+    image = qr_render.rasterize_qr(modules, 283, fill_color=(255, 0, 0))
+    assert image.size == (283, 283)
+    # Only the two colours, no antialiased edge
+    assert sorted(color for _, color in image.getcolors()) == [(255, 0, 0), (255, 255, 255)]
+    module_size = 283 // len(modules)
+    offset = (283 - module_size * len(modules)) // 2
+    for y, row in enumerate(modules):
+        for x, dark in enumerate(row):
+            pixel = image.getpixel((offset + x * module_size, offset + y * module_size))
+            assert pixel == ((255, 0, 0) if dark else (255, 255, 255))
+
+
+def test_theme_template_is_compiled_once_and_deterministic():
+    first = qr_render.compile_theme_template('ethcc', 400)
+    again = qr_render.compile_theme_template('ethcc', 400)
+    assert first.image.tobytes() == again.image.tobytes()
+    assert first.qr_box == (120, 112, 160)
+    assert qr_render.compile_theme_template('ethcc', 400, with_event=True).qr_box == (120, 140, 160)
+
+    template = qr_render.theme_template('ethcc', 400)
+    pristine = template.image.tobytes()
+    payload = qr_render.deep_link('linkup_bot', 1001)
+    with patch.object(qr_render, 'compile_theme_template') as compile_template:
+        card = qr_render.create_themed_qr(payload, 'alice', size=400)
+    compile_template.assert_not_called()
+    # Renders draw on a copy
+    assert template.image.tobytes() == pristine
+    # Finder pattern corner, inside the margin left by whole-pixel modules
+    count = len(qr_render.qr_matrix(payload))
+    margin = (160 - 160 // count * count) // 2
+    assert card.getpixel((120 + margin, 112 + margin)) == (0, 0, 0)
+
+
+def test_text_sprites_are_cached_and_stamped_like_draw_text():
+    from PIL import Image, ImageDraw
+
+    font = qr_render.load_font(44)
+    sprite = qr_render.text_sprite('@alice', font)
+    assert qr_render.text_sprite('@alice', font) is sprite
+    assert sprite.shadow is None
+    left, _, right, _ = ImageDraw.Draw(Image.new('L', (1, 1))).textbbox((0, 0), '@alice', font=font)
+    assert sprite.width == right - left
+
+    expected = Image.new('RGB', (300, 100), 'white')
+    ImageDraw.Draw(expected).text((20, 30), '@alice', fill=(255, 0, 0), font=font)
+    stamped = Image.new('RGB', (300, 100), 'white')
+    qr_render.draw_text(stamped, (20, 30), sprite, fill=(255, 0, 0))
+    assert stamped.tobytes() == expected.tobytes()
+
+    shadowed = qr_render.text_sprite('@alice', font, shadow_depth=3, shadow_opacity=120)
+    assert shadowed.mask.size == shadowed.shadow.size
+    assert shadowed.shadow.getextrema()[1] <= 120
+    # The shadow reaches below and right of the text
+    assert shadowed.shadow.getbbox()[2:] > shadowed.mask.getbbox()[2:]
+
+
+def test_bundled_font_is_preferred():
+    assert os.path.exists(qr_render.BUNDLED_FONT_PATH)
+    assert qr_render.load_font(44).path == qr_render.BUNDLED_FONT_PATH
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for memory-bounded QR rendering
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import qr_render
+from qr_render import RenderAdmission
+
+MB = 1024 * 1024
+
+# tracemalloc sees Python allocations only; Pillow's pixel buffers come from
+# malloc, so the probe also reads the peak RSS. A fixed mmap threshold makes
+# glibc return every freed buffer, so each render's peak shows up in RSS.
+PROBE = """
+import json, sys, tracemalloc
+import qr_render
+
+def status_kb(field):
+    with open('/proc/self/status') as status:
+        return next(int(line.split()[1]) for line in status if line.startswith(field))
+
+renders = {
+    'card': lambda n: qr_render.create_card_style_qr(qr_render.deep_link('linkup_bot', n), f'user{n}'),
+    'ethcc': lambda n: qr_render.create_themed_qr(qr_render.deep_link('linkup_bot', n), f'user{n}'),
+}
+peaks = {}
+for name, render in renders.items():
+    # Templates, fonts and modules load on the first render
+    render(1)
+    tracemalloc.start()
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    before = status_kb('VmRSS')
+    image = render(2)
+    peaks[name] = {'python': tracemalloc.get_traced_memory()[1], 'rss': (status_kb('VmHWM') - before) * 1024,
+                   'output': image.width * image.height * 4}
+    tracemalloc.stop()
+print(json.dumps(peaks))
+"""
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/clear_refs'), reason='needs Linux /proc peak RSS')
+def test_render_peak_allocation():
+    """A render allocates little beyond its output image"""
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=os.path.dirname(qr_render.__file__),
+                            env=dict(os.environ, MALLOC_MMAP_THRESHOLD_='131072'),
+                            capture_output=True, text=True, check=True)
+    for name, peak in json.loads(result.stdout).items():
+        assert peak['python'] < 1 * MB, name
+        # The output (Pillow stores RGB as 4 bytes per pixel) plus the code and text stamped into it
+        assert peak['rss'] < peak['output'] + 2 * MB, name
+        # Within what admission control reserves for it
+        assert peak['rss'] <= qr_render.render_bytes(*{'card': (1200, 675), 'ethcc': (1000, 1000)}[name])
+
+
+def test_renders_past_the_budget_wait():
+    admission = RenderAdmission(budget_bytes=10 * MB, timeout=5)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with admission.admit(8 * MB):
+            entered.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    entered.wait()
+
+    admitted = []
+
+    def wait():
+        with admission.admit(4 * MB):
+            admitted.append(True)
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    time.sleep(0.05)
+    assert not admitted and admission.stats()['waited'] == 1
+    release.set()
+    holder.join()
+    waiter.join()
+    assert admitted
+    assert admission.stats()['peak_mb'] == 8.0
+
+
+def test_oversized_render_runs_alone_and_waiting_times_out():
+    admission = RenderAdmission(budget_bytes=10 * MB, timeout=0.05)
+    with admission.admit(50 * MB):
+        assert admission.stats()['in_use_mb'] == 10.0
+        with pytest.raises(TimeoutError):
+            with admission.admit(1 * MB):
+                pass
+    assert admission.stats() == {'budget_mb': 10.0, 'in_use_mb': 0.0, 'peak_mb': 10.0, 'in_flight': 0,
+                                 'admitted': 1, 'waited': 1, 'timed_out': 1}
+
+
+def test_renderers_give_up_when_no_memory_frees(monkeypatch):
+    monkeypatch.setattr(qr_render, 'render_admission', RenderAdmission(budget_bytes=MB, timeout=0.01))
+    with qr_render.render_admission.admit(MB):
+        assert qr_render.create_card_style_qr(qr_render.deep_link('linkup_bot', 1), 'alice') is None
+        assert qr_render.create_themed_qr(qr_render.deep_link('linkup_bot', 1), 'alice', size=400) is None
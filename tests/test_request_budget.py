@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for per-interaction deadlines in the API client and statement timeouts in the API
+"""
+
+import time
+from unittest.mock import patch, MagicMock
+
+import pytest
+import requests
+
+import db
+import linkup_api
+from api_client import LinkUpAPIClient, DeadlineExceeded, REQUEST_BUDGET_HEADER
+from constants import REQUEST_BUDGET_HEADER as SERVER_BUDGET_HEADER
+
+
+def ok_response():
+    return MagicMock(status_code=200, headers={}, content=b'{"user":{"user_id":7}}')
+
+
+def test_calls_share_one_shrinking_budget():
+    """Each call under a deadline gets what is left of it, and the API is told"""
+    api = LinkUpAPIClient('http://api')
+    with patch('api_client.requests.request', return_value=ok_response()) as request:
+        with api.deadline(5):
+            api.get_user_by_tg_id(1001)
+            api.get_user_by_tg_id(1002)
+        api.get_user_by_tg_id(1003)
+    first, second, unbudgeted = request.call_args_list
+    assert first.kwargs['timeout'] <= 5
+    assert second.kwargs['timeout'] <= first.kwargs['timeout']
+    assert 0 < int(first.kwargs['headers'][REQUEST_BUDGET_HEADER]) <= 5000
+    assert unbudgeted.kwargs['timeout'] == api.timeout
+    assert REQUEST_BUDGET_HEADER not in unbudgeted.kwargs['headers']
+    assert REQUEST_BUDGET_HEADER == SERVER_BUDGET_HEADER
+
+
+def test_spent_budget_fails_fast():
+    """Once the budget is gone calls raise without touching the network"""
+    api = LinkUpAPIClient('http://api')
+    with patch('api_client.requests.request') as request:
+        with pytest.raises(DeadlineExceeded):
+            with api.deadline(0):
+                api.get_user_by_tg_id(1001)
+    request.assert_not_called()
+
+
+def test_timeout_under_deadline_raises():
+    """A call that times out on the last of the budget ends the interaction"""
+    api = LinkUpAPIClient('http://api')
+    active = []
+
+    def slow(**kwargs):
+        # The whole budget went by while waiting
+        for deadline in active:
+            deadline.expires_at = time.monotonic()
+        raise requests.exceptions.Timeout('read timed out')
+
+    with patch('api_client.requests.request', side_effect=slow):
+        assert api.get_user_by_tg_id(1001) is None
+        with pytest.raises(DeadlineExceeded):
+            with api.deadline(1) as deadline:
+                active.append(deadline)
+                api.get_user_by_tg_id(1001)
+
+
+def test_nested_deadline_does_not_extend():
+    api = LinkUpAPIClient('http://api')
+    with api.deadline(1) as outer:
+        with api.deadline(30) as inner:
+            assert inner is outer
+
+
+class FakeConnection:
+    def __init__(self, connection_id=1):
+        self.connection_id = connection_id
+        self.executed = []
+
+    def cursor(self):
+        cursor = MagicMock()
+        cursor.execute.side_effect = self.executed.append
+        return cursor
+
+
+def test_budget_sets_and_clears_statement_timeout():
+    """Budgeted requests cap the session's queries; the next request lifts the cap once"""
+    conn = FakeConnection()
+    db.set_statement_budget(2)
+    db._apply_statement_timeout(conn)
+    db.set_statement_budget(None)
+    db._apply_statement_timeout(conn)
+    db._apply_statement_timeout(conn)
+
+    limited, cleared = conn.executed
+    assert 1000 < int(limited.rsplit('=', 1)[1]) <= 2000
+    assert cleared.endswith('= 0')
+
+
+def test_default_budget_is_set_once_per_session():
+    """Unbudgeted requests get API_REQUEST_TIMEOUT without a SET on every borrow"""
+    conn = FakeConnection()
+    for _ in range(3):
+        db.set_statement_budget(db.request_budget(None))
+        db._apply_statement_timeout(conn)
+    db.set_statement_budget(db.request_budget('500'))
+    db._apply_statement_timeout(conn)
+    db.set_statement_budget(None)
+
+    default, limited = conn.executed
+    assert int(default.rsplit('=', 1)[1]) > db.DEFAULT_REQUEST_BUDGET * 1000 * db.STATEMENT_TIMEOUT_REUSE
+    assert int(limited.rsplit('=', 1)[1]) <= 500
+
+
+def test_parse_request_budget():
+    assert db.parse_request_budget('1500') == 1.5
+    assert db.parse_request_budget('999999999') == db.MAX_REQUEST_BUDGET
+    assert db.parse_request_budget('-5') is None
+    assert db.parse_request_budget(None) is None
+
+
+def test_api_applies_header_for_the_request_only():
+    """The Flask app reads the header for the request and resets it afterwards"""
+    budgets = []
+    with patch.object(linkup_api, 'set_statement_budget', side_effect=budgets.append):
+        linkup_api.app.test_client().get('/get-user-details', headers={REQUEST_BUDGET_HEADER: '750'})
+    assert budgets == [0.75, None]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for the API's read-through user cache
+"""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from user_cache import CacheBackend, UserCache, LocalCacheBackend
+import linkup_api
+
+ALICE = {'user_id': 7, 'tg_id': 1001, 'display_name': 'Alice'}
+
+pytestmark = pytest.mark.usefixtures('fresh_api_cache')
+
+
+def test_hit_after_first_load():
+    """Second lookup is served from the cache, under either key"""
+    cache = UserCache(LocalCacheBackend(), ttl=60)
+    calls = []
+
+    def loader(tg_id):
+        calls.append(tg_id)
+        return dict(ALICE)
+
+    assert cache.get_by_tg_id(1001, loader)['user_id'] == 7
+    assert cache.get_by_tg_id('1001', loader)['user_id'] == 7
+    assert cache.get_by_user_id(7, lambda _: pytest.fail('should be cached'))['tg_id'] == 1001
+    assert calls == [1001]
+    assert cache.stats()['hits'] == 2
+
+
+def test_lru_eviction_and_ttl():
+    """Entries are evicted by capacity and expire after the TTL"""
+    backend = LocalCacheBackend(max_entries=2)
+    backend.set(('id', 1), 'a', ttl=60)
+    backend.set(('id', 2), 'b', ttl=60)
+    backend.get(('id', 1))
+    backend.set(('id', 3), 'c', ttl=60)
+    assert backend.get(('id', 1)) == 'a'
+    assert backend.stats()['evictions'] == 1
+
+    backend.set(('id', 4), 'd', ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get(('id', 4)) != 'd'
+    assert backend.stats()['expirations'] == 1
+
+
+def test_incomplete_backend_fails_when_created():
+    """A backend missing part of the interface cannot be instantiated"""
+    class GetOnlyBackend(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnlyBackend()
+
+
+def test_ttl_is_capped_across_processes(monkeypatch):
+    """With several API processes a local cache only keeps rows briefly"""
+    monkeypatch.delenv('API_PROCESSES', raising=False)
+    monkeypatch.delenv('USER_CACHE_BACKEND', raising=False)
+    monkeypatch.setenv('USER_CACHE_TTL', '60')
+    assert UserCache(LocalCacheBackend()).ttl == 60
+    monkeypatch.setenv('API_PROCESSES', '5')
+    assert UserCache(LocalCacheBackend()).ttl == 2
+    monkeypatch.setenv('USER_CACHE_TTL', '0')
+    assert not UserCache(LocalCacheBackend()).enabled
+    # A shared backend sees every process's invalidations
+    monkeypatch.setenv('USER_CACHE_TTL', '60')
+    monkeypatch.setenv('USER_CACHE_BACKEND', 'shared')
+    assert UserCache(LocalCacheBackend()).ttl == 60
+
+
+def test_invalidate_by_user_id_drops_tg_key():
+    """Invalidating by user_id also removes the tg_id entry"""
+    cache = UserCache(LocalCacheBackend(), ttl=60)
+    cache.get_by_tg_id(1001, lambda _: dict(ALICE))
+    cache.invalidate(user_id=7)
+
+    calls = []
+    cache.get_by_tg_id(1001, lambda tg_id: calls.append(tg_id) or dict(ALICE))
+    assert calls == [1001]
+
+
+def test_concurrent_misses_are_coalesced():
+    """Only one loader runs when many requests miss the same key"""
+    cache = UserCache(LocalCacheBackend(), ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_loader(tg_id):
+        calls.append(tg_id)
+        started.set()
+        release.wait(2)
+        return dict(ALICE)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_by_tg_id(1001, slow_loader)))
+               for _ in range(8)]
+    threads[0].start()
+    started.wait(2)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1001]
+    assert len(results) == 8 and all(r['user_id'] == 7 for r in results)
+    assert cache.stats()['coalesced'] == 7
+
+
+def test_invalidation_during_load_is_not_overwritten():
+    """A load that raced with a write must not repopulate the stale row"""
+    cache = UserCache(LocalCacheBackend(), ttl=60)
+
+    def racing_loader(tg_id):
+        cache.invalidate(tg_id=tg_id)
+        return dict(ALICE)
+
+    cache.get_by_tg_id(1001, racing_loader)
+    assert cache.stats()['size'] == 0
+
+
+def test_route_uses_cache_and_reports_stats():
+    """/get-user-by-tg-id hits MySQL once and /internal/cache-stats reports it"""
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'load_user_by_tg_id', return_value=dict(ALICE)) as loader:
+        assert client.get('/get-user-by-tg-id?tg_id=1001').status_code == 200
+        assert client.get('/get-user-by-tg-id?tg_id=1001').get_json()['user']['display_name'] == 'Alice'
+        assert loader.call_count == 1
+
+    stats = client.get('/internal/cache-stats').get_json()['user_cache']
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+
+def test_route_rejects_non_numeric_ids():
+    """Non-numeric IDs are rejected before reaching the cache or database"""
+    client = linkup_api.app.test_client()
+    assert client.get('/get-user-by-tg-id?tg_id=1%20OR%201=1').status_code == 400
+    assert client.get('/get-user-details?user_id=abc').status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_async_concurrent_misses_are_coalesced():
+    """The ASGI server's async lookups share one load per key"""
+    import asyncio
+
+    cache = UserCache(LocalCacheBackend(), ttl=60)
+    calls = []
+
+    async def slow_loader(tg_id):
+        calls.append(tg_id)
+        await asyncio.sleep(0.05)
+        return dict(ALICE)
+
+    results = await asyncio.gather(*(cache.aget_by_tg_id(1001, slow_loader) for _ in range(8)))
+    assert calls == [1001]
+    assert all(r['user_id'] == 7 for r in results)
+    assert cache.stats()['coalesced'] == 7
+    assert (await cache.aget_by_user_id(7, slow_loader))['tg_id'] == 1001
+
+
+def test_route_projects_requested_fields():
+    """?fields= trims the cached row and rejects unknown columns"""
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'load_user_by_tg_id', return_value=dict(ALICE)):
+        assert client.get('/get-user-by-tg-id?tg_id=1001&fields=user_id').get_json() == {'user': {'user_id': 7}}
+        assert client.get('/get-user-by-tg-id?tg_id=1001').get_json()['user'] == ALICE
+    assert client.get('/get-user-by-tg-id?tg_id=1001&fields=secret').status_code == 400
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Tests for the webapp's paginated /api/user-connections endpoint
+"""
+
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import linkup_api
+
+STAMP = datetime(2025, 7, 1, 9, 30)
+
+
+def connection_row(group_id):
+    return (100 + group_id, 5000 + group_id, f"user{group_id}", f"User {group_id}", 'Dev', 'LinkUp', 'Hi',
+            None, group_id, f"https://t.me/+g{group_id}", 'EthCC', STAMP, STAMP, STAMP)
+
+
+def test_pages_are_compact_and_keyset_paginated():
+    client = linkup_api.app.test_client()
+    rows = [connection_row(group_id) for group_id in (9, 7, 4)]
+    with patch.object(linkup_api, 'get_db_connection', return_value=MagicMock()), \
+            patch.object(linkup_api, 'fetch_all', return_value=rows) as fetch_all:
+        page = client.get('/api/user-connections?tg_id=1001&limit=2&before=10').get_json()
+
+    assert fetch_all.call_args.args[2] == (1001, 10, 1001, 10, 3)
+    assert page['columns'][:4] == ['user_id', 'tg_id', 'username', 'display_name']
+    assert len(page['rows']) == 2 and len(page['rows'][0]) == len(page['columns'])
+    assert [row[page['columns'].index('group_id')] for row in page['rows']] == [9, 7]
+    assert page['next_before'] == 7
+
+
+def test_last_page_and_bad_arguments():
+    client = linkup_api.app.test_client()
+    with patch.object(linkup_api, 'get_db_connection', return_value=MagicMock()), \
+            patch.object(linkup_api, 'fetch_all', return_value=[connection_row(3)]):
+        assert client.get('/api/user-connections?tg_id=1001').get_json()['next_before'] is None
+    assert client.get('/api/user-connections?tg_id=1001&limit=0').status_code == 400
+    assert client.get('/api/user-connections?tg_id=abc').status_code == 400
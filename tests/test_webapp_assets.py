@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for the webapp build and how the API serves its output
+"""
+
+import gzip
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'webapp'))
+
+import build
+import linkup_api
+from webapp_assets import WebappAssets, IMMUTABLE_CACHE_CONTROL
+
+
+@pytest.fixture
+def built(monkeypatch, tmp_path):
+    manifest = build.build(dist_dir=str(tmp_path))
+    monkeypatch.setattr(linkup_api, 'webapp_assets', WebappAssets(dist_dir=str(tmp_path)))
+    return manifest
+
+
+def test_index_references_fingerprinted_assets(built):
+    client = linkup_api.app.test_client()
+    response = client.get('/webapp/')
+    html = response.get_data(as_text=True)
+    assert response.headers['Cache-Control'] == 'no-cache'
+    for name, hashed in built['assets'].items():
+        assert hashed != name and f'"{hashed}"' in html and f'"{name}"' not in html
+
+
+def test_assets_are_precompressed_and_immutable(built):
+    client = linkup_api.app.test_client()
+    app_js = built['assets']['app.js']
+    response = client.get(f'/webapp/{app_js}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert response.mimetype == 'text/javascript'
+    assert b'DOMContentLoaded' in gzip.decompress(response.get_data())
+
+    response = client.get(f'/webapp/{app_js}')
+    assert 'Content-Encoding' not in response.headers and b'DOMContentLoaded' in response.get_data()
+
+
+def test_source_files_without_a_build(monkeypatch, tmp_path):
+    monkeypatch.setattr(linkup_api, 'webapp_assets', WebappAssets(dist_dir=str(tmp_path / 'missing')))
+    client = linkup_api.app.test_client()
+    response = client.get('/webapp/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and response.headers['Cache-Control'] == 'no-cache'
+    assert client.get('/webapp/../bot.py').status_code == 404
+
+
+def test_service_worker_precaches_the_build(built):
+    client = linkup_api.app.test_client()
+    response = client.get('/webapp/sw.js')
+    js = response.get_data(as_text=True)
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert "const CACHE_VERSION = 'dev';" not in js
+    for hashed in built['assets'].values():
+        assert f"'{hashed}'" in js
@@ -8,7 +8,16 @@ const API_BASE_URL = window.location.origin.includes('localhost')
 let currentUser = null;
 let currentUserProfile = null;
 let connections = [];
+let connectionsNextBefore = null;
 let qrCodeData = null;
+let connectionEvents = null;
+let eventsBaseUrl = API_BASE_URL;
+let eventsReconnectDelay = 5000;
+let connectionPoll = null;
+
+// Without a live stream, new connections are fetched on this interval
+const CONNECTION_POLL_MS = 15000;
+const EVENTS_RECONNECT_MAX_MS = 60000;
 
 // Initialize the app
 document.addEventListener('DOMContentLoaded', async () => {
@@ -21,15 +30,16 @@ document.addEventListener('DOMContentLoaded', async () => {
         setAppTheme();
         
         // Get user data from Telegram
-        await initializeUser();
+        initializeUser();
         
         // Set up event listeners
         setupEventListeners();
         
-        // Load initial data
-        await loadUserProfile();
-        await loadConnections();
-        await generateQRCode();
+        // Cache the app, profile and QR for offline use
+        registerServiceWorker();
+        
+        // Load profile, connections and QR code in one round trip
+        await bootstrap();
         
         // Hide loading overlay
         hideLoading();
@@ -57,26 +67,23 @@ function setAppTheme() {
 }
 
 // Initialize user from Telegram data
-async function initializeUser() {
+function initializeUser() {
     if (tg.initDataUnsafe && tg.initDataUnsafe.user) {
         currentUser = tg.initDataUnsafe.user;
-        
-        // Update UI with user info
-        updateUserHeader();
-        
-        // Create or update user in database
-        await createOrUpdateUser();
     } else {
-        // For testing purposes, create a mock user
+        // For testing purposes, create a mock user (never written to the database)
         currentUser = {
             id: 12345,
             first_name: 'Test',
             last_name: 'User',
             username: 'testuser',
-            photo_url: 'https://via.placeholder.com/150'
+            photo_url: 'https://via.placeholder.com/150',
+            isMock: true
         };
-        updateUserHeader();
     }
+    
+    // Update UI with user info
+    updateUserHeader();
 }
 
 // Update user header with Telegram info
@@ -96,47 +103,55 @@ function updateUserHeader() {
     }
 }
 
-// Create or update user in database
-async function createOrUpdateUser() {
-    try {
-        const userData = {
-            tg_id: currentUser.id,
-            username: currentUser.username || '',
-            display_name: `${currentUser.first_name} ${currentUser.last_name || ''}`.trim(),
-            profile_image_url: currentUser.photo_url || ''
-        };
-        
-        const response = await fetch(`${API_BASE_URL}/create-user`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(userData)
-        });
-        
-        if (response.ok) {
-            const result = await response.json();
-            console.log('User created/updated:', result);
-        }
-    } catch (error) {
-        console.error('Error creating/updating user:', error);
+// Upsert the user and load everything the first render needs
+async function bootstrap() {
+    const body = { tg_id: currentUser.id, upsert: !currentUser.isMock };
+    if (!currentUser.isMock) {
+        body.username = currentUser.username || '';
+        body.display_name = `${currentUser.first_name} ${currentUser.last_name || ''}`.trim();
+        body.profile_image_url = currentUser.photo_url || '';
+    }
+    
+    const response = await fetch(`${API_BASE_URL}/api/bootstrap`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body)
+    });
+    
+    if (!response.ok) {
+        throw new Error(`Bootstrap failed with status ${response.status}`);
     }
+    
+    const data = await response.json();
+    currentUserProfile = data.user;
+    populateProfileForm(data.user);
+    updateUserRole(data.user.role);
+    applyConnectionsPage(data.connections, false);
+    // Streams may be served by a separate async server
+    eventsBaseUrl = data.events_url || API_BASE_URL;
+    subscribeToConnections();
+    
+    // The browser fetches and caches the image itself; the first render does not wait for it
+    showQRImage(`${API_BASE_URL}${data.qr.svg_url}`, `${API_BASE_URL}${data.qr.url}`);
 }
 
-// Load user profile from database
-async function loadUserProfile() {
-    try {
-        const response = await fetch(`${API_BASE_URL}/get-user-by-tg-id?tg_id=${currentUser.id}`);
-        
-        if (response.ok) {
-            const profile = await response.json();
-            currentUserProfile = profile;
-            populateProfileForm(profile);
-            updateUserRole(profile.role);
-        }
-    } catch (error) {
-        console.error('Error loading user profile:', error);
+// Service worker: offline copies of the app, profile and QR, and queued profile edits
+function registerServiceWorker() {
+    if (!('serviceWorker' in navigator)) {
+        return;
     }
+    navigator.serviceWorker.register('sw.js').catch((error) => {
+        console.error('Service worker registration failed:', error);
+    });
+    
+    // Browsers without Background Sync retry queued edits when the page is back online
+    window.addEventListener('online', () => {
+        if (navigator.serviceWorker.controller) {
+            navigator.serviceWorker.controller.postMessage({ type: 'flush-profile-updates' });
+        }
+    });
 }
 
 // Populate profile form with user data
@@ -155,15 +170,17 @@ function updateUserRole(role) {
     userRole.textContent = role || 'Set your role';
 }
 
-// Load user connections
-async function loadConnections() {
+// Load user connections, newest first, one page at a time
+async function loadConnections(before = null) {
     try {
-        const response = await fetch(`${API_BASE_URL}/api/user-connections?tg_id=${currentUser.id}`);
+        let url = `${API_BASE_URL}/api/user-connections?tg_id=${currentUser.id}`;
+        if (before) {
+            url += `&before=${before}`;
+        }
+        const response = await fetch(url, { cache: 'no-cache' });
         
         if (response.ok) {
-            connections = await response.json();
-            updateConnectionsCount();
-            displayConnections();
+            applyConnectionsPage(await response.json(), Boolean(before));
         }
     } catch (error) {
         console.error('Error loading connections:', error);
@@ -171,12 +188,100 @@ async function loadConnections() {
     }
 }
 
+// Connections from the compact format: shared column names plus one array per connection
+function connectionRows(page) {
+    return page.rows.map(row => Object.fromEntries(page.columns.map((column, i) => [column, row[i]])));
+}
+
+// Show a page of connections
+function applyConnectionsPage(page, append) {
+    const rows = connectionRows(page);
+    connections = append ? connections.concat(rows) : rows;
+    connectionsNextBefore = page.next_before;
+    updateConnectionsCount();
+    displayConnections();
+}
+
+// Live updates: the server pushes new connections, so nothing is refetched
+function subscribeToConnections() {
+    if (!window.EventSource) {
+        startConnectionPolling();
+        return;
+    }
+    if (connectionEvents) {
+        return;
+    }
+    // Anything newer than the loaded list is replayed; EventSource resumes from the last event id itself
+    const latest = connections.reduce((max, connection) => Math.max(max, connection.group_id), 0);
+    const params = new URLSearchParams({ tg_id: currentUser.id, after: latest });
+    const events = new EventSource(`${eventsBaseUrl}/api/connection-events?${params}`);
+    connectionEvents = events;
+    events.addEventListener('connection', (event) => {
+        addNewConnections(JSON.parse(event.data));
+    });
+    events.onopen = () => {
+        eventsReconnectDelay = 5000;
+        stopConnectionPolling();
+    };
+    events.onerror = () => {
+        // EventSource retries dropped streams itself, but gives up after an error
+        // status; poll meanwhile and open a new stream later
+        if (events.readyState !== EventSource.CLOSED) {
+            return;
+        }
+        connectionEvents = null;
+        startConnectionPolling();
+        setTimeout(subscribeToConnections, eventsReconnectDelay);
+        eventsReconnectDelay = Math.min(eventsReconnectDelay * 2, EVENTS_RECONNECT_MAX_MS);
+    };
+}
+
+function startConnectionPolling() {
+    if (!connectionPoll) {
+        connectionPoll = setInterval(pollNewConnections, CONNECTION_POLL_MS);
+    }
+}
+
+function stopConnectionPolling() {
+    clearInterval(connectionPoll);
+    connectionPoll = null;
+}
+
+// The first page is revalidated by ETag, so an unchanged list costs a 304
+async function pollNewConnections() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/user-connections?tg_id=${currentUser.id}`, { cache: 'no-cache' });
+        if (response.ok) {
+            addNewConnections(await response.json());
+        }
+    } catch (error) {
+        // Offline; the next tick tries again
+    }
+}
+
+// Prepend pushed connections that are not in the list yet
+function addNewConnections(page) {
+    const known = new Set(connections.map(connection => connection.group_id));
+    const rows = connectionRows(page).filter(connection => !known.has(connection.group_id));
+    if (rows.length === 0) {
+        return;
+    }
+    connections = rows.concat(connections);
+    updateConnectionsCount();
+    displayConnections();
+    showToast(`New connection: ${rows[0].display_name}`, 'success');
+}
+
+function liveUpdatesConnected() {
+    return connectionEvents && connectionEvents.readyState === EventSource.OPEN;
+}
+
 // Update connections count in UI
 function updateConnectionsCount() {
     const connectionCount = document.getElementById('connectionCount');
     const groupCount = document.getElementById('groupCount');
     
-    connectionCount.textContent = connections.length;
+    connectionCount.textContent = connectionsNextBefore ? `${connections.length}+` : connections.length;
     groupCount.textContent = Math.floor(connections.length / 2); // Rough estimate
 }
 
@@ -203,28 +308,37 @@ function displayConnections() {
             <p class="connection-description">${connection.description || 'No description'}</p>
         </div>
     `).join('');
+    
+    if (connectionsNextBefore) {
+        connectionsList.insertAdjacentHTML('beforeend',
+            '<button id="loadMoreConnections" class="btn btn-outline">Load more</button>');
+        document.getElementById('loadMoreConnections')
+            .addEventListener('click', () => loadConnections(connectionsNextBefore));
+    }
+}
+
+// Show the QR code image from a URL; share and download use the PNG at fileUrl
+function showQRImage(url, fileUrl = url) {
+    const qrImage = document.getElementById('qrImage');
+    qrImage.src = url;
+    qrImage.style.display = 'block';
+    
+    // Store QR data for sharing
+    qrCodeData = fileUrl;
+}
+
+// URL of the user's QR image; the browser caches it and revalidates with its ETag
+function qrImageURL(theme, color, format) {
+    const params = new URLSearchParams({ tg_id: currentUser.id });
+    if (theme && theme !== 'default') params.set('theme', theme);
+    if (color && color !== '#000000') params.set('color', color);
+    if (format && format !== 'png') params.set('format', format);
+    return `${API_BASE_URL}/api/generate-qr?${params}`;
 }
 
 // Generate QR code
 async function generateQRCode() {
-    try {
-        const response = await fetch(`${API_BASE_URL}/api/generate-qr?tg_id=${currentUser.id}`);
-        
-        if (response.ok) {
-            const blob = await response.blob();
-            const qrImageUrl = URL.createObjectURL(blob);
-            
-            const qrImage = document.getElementById('qrImage');
-            qrImage.src = qrImageUrl;
-            qrImage.style.display = 'block';
-            
-            // Store QR data for sharing
-            qrCodeData = qrImageUrl;
-        }
-    } catch (error) {
-        console.error('Error generating QR code:', error);
-        showToast('Error generating QR code', 'error');
-    }
+    showQRImage(qrImageURL('default', null, 'svg'), qrImageURL());
 }
 
 // Set up event listeners
@@ -299,7 +413,12 @@ async function handleProfileSubmit(e) {
         if (response.ok) {
             currentUserProfile = { ...currentUserProfile, ...formData };
             updateUserRole(formData.role);
-            showToast('Profile updated successfully!', 'success');
+            if (response.status === 202) {
+                // Offline: the service worker sends it when the network is back
+                showToast('You are offline. Your profile will sync when you reconnect.', 'success');
+            } else {
+                showToast('Profile updated successfully!', 'success');
+            }
             
             // Regenerate QR code with updated profile
             await generateQRCode();
@@ -357,24 +476,20 @@ async function downloadQRCode() {
 async function regenerateQRCode() {
     const theme = document.getElementById('qrTheme').value;
     const color = document.getElementById('qrColor').value;
+    const qrImage = document.getElementById('qrImage');
     
-    try {
-        const response = await fetch(`${API_BASE_URL}/api/generate-qr?tg_id=${currentUser.id}&theme=${theme}&color=${encodeURIComponent(color)}`);
-        
-        if (response.ok) {
-            const blob = await response.blob();
-            const qrImageUrl = URL.createObjectURL(blob);
-            
-            const qrImage = document.getElementById('qrImage');
-            qrImage.src = qrImageUrl;
-            qrCodeData = qrImageUrl;
-            
-            showToast('QR code regenerated!', 'success');
-        }
-    } catch (error) {
-        console.error('Error regenerating QR code:', error);
+    qrImage.onload = () => {
+        qrImage.onload = qrImage.onerror = null;
+        showToast('QR code regenerated!', 'success');
+    };
+    qrImage.onerror = () => {
+        qrImage.onload = qrImage.onerror = null;
+        console.error('Error regenerating QR code');
         showToast('Error regenerating QR code', 'error');
-    }
+    };
+    // The plain code is shown as SVG (small and sharp); themed cards are PNG only
+    const display = theme === 'default' ? qrImageURL(theme, color, 'svg') : qrImageURL(theme, color);
+    showQRImage(display, qrImageURL(theme, color));
 }
 
 // Scan QR code
@@ -414,8 +529,10 @@ async function handleScannedQR(qrText) {
             const result = await response.json();
             showToast(`Connected with ${result.connected_user}!`, 'success');
             
-            // Reload connections
-            await loadConnections();
+            // The event stream delivers the new connection; reload only without it
+            if (!liveUpdatesConnected()) {
+                await loadConnections();
+            }
             
             // Switch to connections tab
             switchTab('connections');
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Build the webapp for production: minify, fingerprint and precompress assets
+
+Writes webapp/dist/ with content-hashed app.js and minified styles.css, an index.html
+that references them, a service worker that precaches them, .gz/.br variants
+of every file and a manifest.json the API reads to serve them with immutable
+cache headers.
+
+    python webapp/build.py
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:  # pragma: no cover - optional dependency
+    rcssmin = None
+
+WEBAPP_DIR = os.path.dirname(os.path.abspath(__file__))
+DIST_DIR = os.path.join(WEBAPP_DIR, 'dist')
+
+# Referenced by index.html and safe to cache forever once their names carry a hash
+FINGERPRINTED = ('styles.css', 'app.js')
+# Served under fixed names and revalidated on every load
+ENTRY_POINTS = ('index.html', 'sw.js')
+HASH_LENGTH = 10
+
+
+def minify(name: str, text: str) -> str:
+    # JS is left as-is: the Python minifiers available do not parse template
+    # literals (app.js builds its HTML with them) and brotli recovers most of
+    # the difference anyway
+    if name.endswith('.css') and rcssmin is not None:
+        return rcssmin.cssmin(text)
+    return text
+
+
+def fingerprint(name: str, data: bytes) -> str:
+    """app.js -> app.<content hash>.js"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def rewrite_references(html: str, names: dict) -> str:
+    """Point src/href attributes at the fingerprinted names"""
+    def replace(match):
+        return f'{match.group(1)}="{names.get(match.group(2), match.group(2))}"'
+    return re.sub(r'\b(src|href)="([^"]+)"', replace, html)
+
+
+def rewrite_service_worker(js: str, names: dict) -> str:
+    """Precache the fingerprinted names and version the cache by their hashes"""
+    for name, hashed in names.items():
+        js = js.replace(f"'{name}'", f"'{hashed}'")
+    version = hashlib.sha256(json.dumps(names, sort_keys=True).encode('utf-8')).hexdigest()[:HASH_LENGTH]
+    return js.replace("const CACHE_VERSION = 'dev';", f"const CACHE_VERSION = '{version}';")
+
+
+def precompress(path: str) -> list:
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = []
+    # mtime=0 keeps the output byte-identical across builds
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    written.append(path + '.gz')
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+        written.append(path + '.br')
+    return written
+
+
+def build(source_dir: str = WEBAPP_DIR, dist_dir: str = DIST_DIR) -> dict:
+    """Build dist_dir from source_dir and return the manifest"""
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    names = {}
+    outputs = []
+    for name in FINGERPRINTED:
+        with open(os.path.join(source_dir, name), encoding='utf-8') as f:
+            data = minify(name, f.read()).encode('utf-8')
+        names[name] = fingerprint(name, data)
+        outputs.append((names[name], data))
+
+    for name in ENTRY_POINTS:
+        with open(os.path.join(source_dir, name), encoding='utf-8') as f:
+            text = f.read()
+        rewrite = rewrite_service_worker if name == 'sw.js' else rewrite_references
+        outputs.append((name, rewrite(text, names).encode('utf-8')))
+
+    for name, data in outputs:
+        path = os.path.join(dist_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        precompress(path)
+
+    manifest = {'assets': names, 'entry_points': list(ENTRY_POINTS)}
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def main():
+    manifest = build()
+    print(f"✅ Built {DIST_DIR}")
+    for name, hashed in manifest['assets'].items():
+        size = os.path.getsize(os.path.join(DIST_DIR, hashed))
+        gz_size = os.path.getsize(os.path.join(DIST_DIR, hashed + '.gz'))
+        print(f"   {name} -> {hashed} ({size} bytes, {gz_size} gzipped)")
+    if rcssmin is None:
+        print("⚠️  rcssmin not installed; styles.css was not minified")
+    if brotli is None:
+        print("⚠️  brotli not installed; only .gz variants were written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+// LinkUp webapp service worker
+// Keeps the webapp, the user's profile and their QR code available offline and
+// queues profile edits until the network comes back.
+
+// Replaced with a content hash by webapp/build.py
+const CACHE_VERSION = 'dev';
+const STATIC_CACHE = `linkup-static-${CACHE_VERSION}`;
+const DATA_CACHE = 'linkup-data-v1';
+const STATIC_ASSETS = ['./', 'index.html', 'styles.css', 'app.js'];
+
+const OUTBOX_DB = 'linkup-outbox';
+const OUTBOX_STORE = 'profile-updates';
+const PROFILE_SYNC_TAG = 'profile-sync';
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then((cache) => cache.addAll(STATIC_ASSETS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(names
+            .filter((name) => name.startsWith('linkup-static-') && name !== STATIC_CACHE)
+            .map((name) => caches.delete(name)));
+        await self.clients.claim();
+        await flushProfileUpdates().catch(() => {});
+    })());
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    const url = new URL(request.url);
+
+    if (request.method === 'PUT' && url.pathname === '/api/update-profile') {
+        event.respondWith(updateProfile(request));
+    } else if (request.method === 'POST' && url.pathname === '/api/bootstrap') {
+        event.respondWith(bootstrap(request));
+    } else if (request.method !== 'GET') {
+        return;
+    } else if (url.pathname === '/api/generate-qr') {
+        event.respondWith(staleWhileRevalidate(request, DATA_CACHE));
+    } else if (url.origin === self.location.origin && url.pathname.startsWith('/webapp')) {
+        // Hashed asset names change with their content, so the cached copy is always right.
+        // The page itself and unbuilt (dev) assets are refreshed in the background.
+        const hashed = CACHE_VERSION !== 'dev' && request.mode !== 'navigate';
+        event.respondWith(hashed ? cacheFirst(request) : staleWhileRevalidate(request, STATIC_CACHE));
+    } else if (url.hostname === 'telegram.org') {
+        event.respondWith(staleWhileRevalidate(request, STATIC_CACHE));
+    }
+});
+
+self.addEventListener('sync', (event) => {
+    if (event.tag === PROFILE_SYNC_TAG) {
+        event.waitUntil(flushProfileUpdates());
+    }
+});
+
+// Browsers without Background Sync: the page asks us to retry when it comes back online
+self.addEventListener('message', (event) => {
+    if (event.data && event.data.type === 'flush-profile-updates') {
+        event.waitUntil(flushProfileUpdates().catch(() => {}));
+    }
+});
+
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        const cache = await caches.open(STATIC_CACHE);
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    const network = fetch(request).then(async (response) => {
+        // Opaque: a cross-origin <img> (API on another domain); cacheable, just unreadable
+        if (response.ok || response.type === 'opaque') {
+            await cache.put(request, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        network.catch(() => {});
+        return cached;
+    }
+    return network;
+}
+
+// POST responses can't be cached directly; store them under a GET key per user
+function bootstrapCacheKey(tgId) {
+    return new Request(`${self.location.origin}/api/bootstrap?tg_id=${encodeURIComponent(tgId)}`);
+}
+
+async function bootstrap(request) {
+    const body = await request.clone().json();
+    const cache = await caches.open(DATA_CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            await cache.put(bootstrapCacheKey(body.tg_id), response.clone());
+        }
+        return response;
+    } catch (error) {
+        const cached = await cache.match(bootstrapCacheKey(body.tg_id));
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+async function updateProfile(request) {
+    const update = await request.clone().json();
+    let response;
+    try {
+        // Let a replay in flight land first, so this newer edit is the one that sticks
+        await flushing;
+        response = await fetch(request);
+    } catch (error) {
+        // Offline: keep the latest edit per user and send it when the network returns
+        await outbox('readwrite', (store) => store.put({ ...update, url: request.url, queued_at: Date.now() }));
+        await applyToCachedBootstrap(update);
+        if (self.registration.sync) {
+            await self.registration.sync.register(PROFILE_SYNC_TAG).catch(() => {});
+        }
+        return new Response(JSON.stringify({ message: 'Profile update queued', queued: true }), {
+            status: 202,
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+    if (response.ok) {
+        // This edit is newer than anything queued earlier; replaying those would undo it
+        await outbox('readwrite', (store) => store.delete(update.tg_id)).catch(() => {});
+    }
+    return response;
+}
+
+// So an offline reopen shows the queued edit rather than the old profile
+async function applyToCachedBootstrap(update) {
+    const cache = await caches.open(DATA_CACHE);
+    const key = bootstrapCacheKey(update.tg_id);
+    const cached = await cache.match(key);
+    if (!cached) {
+        return;
+    }
+    const data = await cached.json();
+    const { url, queued_at, ...fields } = update;
+    data.user = { ...data.user, ...fields };
+    await cache.put(key, new Response(JSON.stringify(data), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+}
+
+// The replay in progress, if any
+let flushing = Promise.resolve();
+
+function flushProfileUpdates() {
+    const run = flushing.catch(() => {}).then(sendQueuedUpdates);
+    flushing = run.catch(() => {});
+    return run;
+}
+
+async function sendQueuedUpdates() {
+    const updates = await outbox('readonly', (store) => store.getAll());
+    for (const { tg_id } of updates) {
+        // Re-read each entry: an online edit since getAll() may have dropped it
+        const queued = await outbox('readonly', (store) => store.get(tg_id));
+        if (!queued) {
+            continue;
+        }
+        const { url, queued_at, ...update } = queued;
+        // A network error leaves the update queued and fails the sync so it is retried
+        const response = await fetch(url, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(update)
+        });
+        if (response.ok || (response.status >= 400 && response.status < 500)) {
+            await outbox('readwrite', (store) => {
+                // Keep an edit queued while this one was in flight
+                const current = store.get(tg_id);
+                current.onsuccess = () => {
+                    if (current.result && current.result.queued_at === queued_at) {
+                        store.delete(tg_id);
+                    }
+                };
+                return current;
+            });
+        }
+    }
+}
+
+function outbox(mode, operation) {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open(OUTBOX_DB, 1);
+        open.onupgradeneeded = () => open.result.createObjectStore(OUTBOX_STORE, { keyPath: 'tg_id' });
+        open.onerror = () => reject(open.error);
+        open.onsuccess = () => {
+            const db = open.result;
+            const transaction = db.transaction(OUTBOX_STORE, mode);
+            const request = operation(transaction.objectStore(OUTBOX_STORE));
+            transaction.oncomplete = () => {
+                db.close();
+                resolve(request.result);
+            };
+            transaction.onerror = () => {
+                db.close();
+                reject(transaction.error);
+            };
+        };
+    });
+}